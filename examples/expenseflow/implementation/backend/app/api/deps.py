@@ -1,20 +1,40 @@
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, HTTPException, Query, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from sqlalchemy.orm import Session
+from typing import Optional
 from ..core.database import get_db
 from ..core.security import verify_token
 from ..models.user import User
 
 security = HTTPBearer()
+optional_security = HTTPBearer(auto_error=False)
 
 def get_current_user(
     db: Session = Depends(get_db),
     credentials: HTTPAuthorizationCredentials = Depends(security)
 ) -> User:
     """Get current authenticated user"""
+    return authenticate_token(db, credentials.credentials)
+
+def get_stream_user(
+    access_token: Optional[str] = Query(None),
+    db: Session = Depends(get_db),
+    credentials: Optional[HTTPAuthorizationCredentials] = Depends(optional_security)
+) -> User:
+    """Get current user from a bearer header or ?access_token= (EventSource can't set headers)"""
+    token = credentials.credentials if credentials else access_token
+    if token is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Not authenticated"
+        )
+    return authenticate_token(db, token)
+
+def authenticate_token(db: Session, token: str) -> User:
+    """Resolve a JWT to an active user"""
     try:
         # Verify the token
-        payload = verify_token(credentials.credentials)
+        payload = verify_token(token)
         email: str = payload.get("sub")
         if email is None:
             raise HTTPException(
@@ -0,0 +1,64 @@
+from functools import lru_cache
+from typing import Any, List, Optional, Tuple, Type
+
+from fastapi import HTTPException, Response, status
+from pydantic import BaseModel, ConfigDict, create_model
+from sqlalchemy.orm import load_only, raiseload, selectinload
+
+from ..core.encoding import NegotiatedResponse
+
+# Response fields computed from other columns
+DERIVED_COLUMNS = {"amount": ("amount_minor", "currency")}
+
+def parse_fields(fields: Optional[str], schema: Type[BaseModel]) -> Optional[Tuple[str, ...]]:
+    """Parse ?fields=a,b,c against schema; None means the full representation"""
+    if fields is None:
+        return None
+    requested = {name.strip() for name in fields.split(",") if name.strip()}
+    unknown = requested - set(schema.model_fields)
+    if unknown:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unknown fields: {', '.join(sorted(unknown))}"
+        )
+    # The id is always returned so clients can follow up on a row
+    return tuple(sorted(requested | {"id"}))
+
+def load_options(model, fields: Tuple[str, ...]) -> List[Any]:
+    """Loader options that fetch only the columns and relationships behind fields"""
+    relationships = model.__mapper__.relationships
+    columns = []
+    options = []
+    for name in fields:
+        if name in relationships:
+            options.append(selectinload(getattr(model, name)))
+        else:
+            columns.extend(DERIVED_COLUMNS.get(name, (name,)))
+    # Anything not requested raises instead of lazy loading behind our back
+    return [load_only(*[getattr(model, column) for column in columns], raiseload=True), raiseload("*")] + options
+
+@lru_cache(maxsize=256)
+def sparse_schema(schema: Type[BaseModel], fields: Tuple[str, ...]) -> Type[BaseModel]:
+    """schema reduced to fields, built once per distinct field set"""
+    return create_model(
+        f"{schema.__name__}Fields",
+        __config__=ConfigDict(from_attributes=True),
+        **{name: (schema.model_fields[name].annotation, schema.model_fields[name]) for name in fields}
+    )
+
+def sparse_response(content, schema: Type[BaseModel], fields: Tuple[str, ...], response: Response) -> Response:
+    """Serialize a row or list of rows with the reduced schema.
+
+    The reduced schema doesn't match the route's response_model, so the
+    response is built here, carrying over headers already set on response.
+    """
+    model = sparse_schema(schema, fields)
+    if isinstance(content, list):
+        data = [model.model_validate(item).model_dump(mode="json") for item in content]
+    else:
+        data = model.model_validate(content).model_dump(mode="json")
+    return NegotiatedResponse(data, headers=dict(response.headers))
+
+def fields_version(fields: Optional[Tuple[str, ...]]) -> list:
+    """Extra ETag input so each field set of a resource gets its own validator"""
+    return [] if fields is None else [("fields:" + ",".join(fields), None)]
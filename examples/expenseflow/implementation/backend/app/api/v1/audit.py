@@ -0,0 +1,48 @@
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy.orm import Session
+from typing import List, Optional
+
+from ...core.database import get_db
+from ...api.deps import get_current_user
+from ...models.user import User
+from ...models.audit import AuditEntry
+from ...schemas.audit import AuditEntryResponse
+
+router = APIRouter()
+
+@router.get("/audit", response_model=List[AuditEntryResponse])
+def get_audit_entries(
+    entity_type: Optional[str] = None,
+    entity_id: Optional[int] = None,
+    actor_id: Optional[int] = None,
+    before_id: Optional[int] = None,
+    limit: int = Query(100, ge=1, le=500),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Audit entries for an entity or actor, newest first (admins, or your own actions)"""
+    if not current_user.is_admin and actor_id != current_user.id:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Not enough permissions"
+        )
+    
+    if entity_id is not None and entity_type is None:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="entity_id requires entity_type"
+        )
+    
+    # Filters line up with the (entity_type, entity_id, id) and (actor_id, id) indexes;
+    # page backwards with before_id set to the last id of the previous page
+    query = db.query(AuditEntry)
+    if entity_type is not None:
+        query = query.filter(AuditEntry.entity_type == entity_type)
+    if entity_id is not None:
+        query = query.filter(AuditEntry.entity_id == entity_id)
+    if actor_id is not None:
+        query = query.filter(AuditEntry.actor_id == actor_id)
+    if before_id is not None:
+        query = query.filter(AuditEntry.id < before_id)
+    
+    return query.order_by(AuditEntry.id.desc()).limit(limit).all()
@@ -7,7 +7,11 @@ from ...core.database import get_db
 from ...core.security import verify_password, create_access_token, get_password_hash
 from ...core.config import settings
 from ...models.user import User
-from ...schemas.user import UserCreate, UserResponse, Token
+from ...schemas.user import UserCreate, UserResponse, Token, RefreshTokenRequest
+from ...services.tokens import (
+    RefreshTokenError, issue_refresh_token, rotate_refresh_token, revoke_user_tokens
+)
+from ..deps import get_current_user
 
 router = APIRouter()
 
@@ -66,10 +70,47 @@ def login(
             detail="Inactive user"
         )
     
+    refresh_token, _ = issue_refresh_token(db, user)
+    db.commit()
+    
+    return issue_tokens(user, refresh_token)
+
+@router.post("/refresh", response_model=Token)
+def refresh(token_data: RefreshTokenRequest, db: Session = Depends(get_db)):
+    """Exchange a refresh token for a new access token and refresh token"""
+    try:
+        refresh_token, user = rotate_refresh_token(db, token_data.refresh_token)
+    except RefreshTokenError as exc:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail=str(exc),
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    
+    if not user.is_active:
+        db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Inactive user"
+        )
+    
+    db.commit()
+    return issue_tokens(user, refresh_token)
+
+@router.post("/logout-all", status_code=status.HTTP_204_NO_CONTENT)
+def logout_all(
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Revoke every refresh token of the current user"""
+    revoke_user_tokens(db, current_user.id)
+    db.commit()
+
+def issue_tokens(user: User, refresh_token: str) -> dict:
     # Create access token
     access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = create_access_token(
         data={"sub": user.email}, expires_delta=access_token_expires
     )
     
-    return {"access_token": access_token, "token_type": "bearer"}
\ No newline at end of file
+    return {"access_token": access_token, "token_type": "bearer", "refresh_token": refresh_token}
\ No newline at end of file
@@ -1,22 +1,67 @@
-from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Request, Response
+from sqlalchemy import select, literal, union_all
+from sqlalchemy.orm import Session, selectinload
 from typing import List, Optional
 from datetime import datetime
 
+from ...core.config import settings
 from ...core.database import get_db
+from ...core.money import to_minor_units
+from ...core.http_cache import make_etag, is_not_modified, not_modified, set_validators
 from ...api.deps import get_current_user
+from ...api.fields import fields_version, load_options, parse_fields, sparse_response
 from ...models.user import User
 from ...models.expense import Expense, Category, Approval
+from ...models.archive import ArchivedExpense
+from ...services.outbox import record_event
+from ...services.audit import audit_log
+from ...services.duplicates import find_duplicates, record_duplicates
+from ...services.receipts import delete_receipt, receipt_hasher, store_receipt
+from ...services.policy import check_expense
 from ...schemas.expense import (
-    ExpenseCreate, ExpenseUpdate, ExpenseResponse, ExpenseWithApprovals,
+    ExpenseCreate, ExpenseUpdate, ExpenseResponse, ExpenseCreateResponse, ExpenseWithApprovals,
+    DuplicateCandidate,
     CategoryCreate, CategoryResponse,
     ApprovalCreate, ApprovalResponse
 )
 
 router = APIRouter()
 
+def conditional_update(db: Session, model, row, values: dict, **expected) -> None:
+    """Apply values to row only if its version and expected columns are unchanged.
+    
+    Issues a single UPDATE ... WHERE id=... AND version=... AND <expected>, so
+    concurrent transitions are detected without holding row locks. The loser
+    gets a 409 and its transaction is rolled back.
+    """
+    conditions = [model.id == row.id, model.version == row.version]
+    conditions += [getattr(model, column) == value for column, value in expected.items()]
+    
+    updated = db.query(model).filter(*conditions).update(
+        {**values, "version": model.version + 1, "updated_at": datetime.utcnow()},
+        synchronize_session=False
+    )
+    if updated != 1:
+        db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"{model.__name__} was modified concurrently, please reload and retry"
+        )
+
+def to_candidates(matches) -> List[DuplicateCandidate]:
+    return [
+        DuplicateCandidate(
+            expense_id=match.id,
+            status=match.status,
+            description=match.description,
+            expense_date=match.expense_date,
+            score=round(score, 3)
+        )
+        for match, score in matches
+    ]
+
 # Expense endpoints
-@router.post("/expenses", response_model=ExpenseResponse)
+@router.post("/expenses", response_model=ExpenseCreateResponse)
 def create_expense(
     expense_data: ExpenseCreate,
     db: Session = Depends(get_db),
@@ -40,45 +85,107 @@ def create_expense(
     db.add(db_expense)
     db.commit()
     db.refresh(db_expense)
-    
-    return db_expense
+    audit_log.record(current_user.id, "expense.created", db_expense, {
+        "amount": db_expense.amount,
+        "currency": db_expense.currency
+    })
+    
+    response = ExpenseCreateResponse.model_validate(db_expense)
+    response.possible_duplicates = to_candidates(find_duplicates(db, db_expense))
+    return response
 
 @router.get("/expenses", response_model=List[ExpenseResponse])
 def get_expenses(
+    request: Request,
+    response: Response,
     skip: int = 0,
     limit: int = 100,
     status: Optional[str] = None,
+    include_archived: bool = False,
+    fields: Optional[str] = None,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    """Get user's expenses"""
-    query = db.query(Expense).filter(Expense.employee_id == current_user.id)
-    
-    if status:
-        query = query.filter(Expense.status == status)
-    
-    expenses = query.offset(skip).limit(limit).all()
+    """Get user's expenses.
+
+    Archived history is included with include_archived=true, and fields=a,b
+    returns only those fields.
+    """
+    fields = parse_fields(fields, ExpenseResponse)
+    tiers = [Expense, ArchivedExpense] if include_archived else [Expense]
+    selects = []
+    for model in tiers:
+        stmt = select(
+            model.id, model.updated_at, literal(model is ArchivedExpense).label("archived")
+        ).where(model.employee_id == current_user.id)
+        if status:
+            stmt = stmt.where(model.status == status)
+        selects.append(stmt)
+    page = union_all(*selects) if len(selects) > 1 else selects[0]
+    
+    # Validate the page from (id, updated_at) alone before loading full rows
+    versions = db.execute(page.order_by("id").offset(skip).limit(limit)).all()
+    etag = make_etag(
+        [(version.id, version.updated_at) for version in versions] + fields_version(fields)
+    )
+    last_modified = max((version.updated_at for version in versions), default=None)
+    if is_not_modified(request, etag, last_modified):
+        return not_modified(etag, last_modified)
+    
+    rows = {}
+    for model in tiers:
+        ids = [version.id for version in versions if version.archived == (model is ArchivedExpense)]
+        if ids:
+            query = db.query(model).filter(model.id.in_(ids))
+            if fields:
+                query = query.options(*load_options(model, fields))
+            rows.update((row.id, row) for row in query)
+    # Rows the archiver moved since the page was read are left out, and the
+    # page isn't cacheable under validators that no longer describe it
+    expenses = [rows[version.id] for version in versions if version.id in rows]
+    if len(expenses) == len(versions):
+        set_validators(response, etag, last_modified)
+    if fields:
+        return sparse_response(expenses, ExpenseResponse, fields, response)
     return expenses
 
 @router.get("/expenses/{expense_id}", response_model=ExpenseWithApprovals)
 def get_expense(
     expense_id: int,
+    request: Request,
+    response: Response,
+    include_archived: bool = False,
+    fields: Optional[str] = None,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    """Get a specific expense"""
-    expense = db.query(Expense).filter(
-        Expense.id == expense_id,
-        Expense.employee_id == current_user.id
-    ).first()
-    
-    if not expense:
+    """Get a specific expense (falls back to the archive with include_archived=true)"""
+    fields = parse_fields(fields, ExpenseWithApprovals)
+    tiers = [Expense, ArchivedExpense] if include_archived else [Expense]
+    for model in tiers:
+        version = db.query(model.id, model.updated_at).filter(
+            model.id == expense_id,
+            model.employee_id == current_user.id
+        ).first()
+        if version:
+            break
+    
+    if not version:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Expense not found"
         )
     
-    return expense
+    etag = make_etag([version] + fields_version(fields))
+    if is_not_modified(request, etag, version.updated_at):
+        return not_modified(etag, version.updated_at)
+    set_validators(response, etag, version.updated_at)
+    
+    query = db.query(model).filter(model.id == expense_id)
+    if fields:
+        expense = query.options(*load_options(model, fields)).first()
+        return sparse_response(expense, ExpenseWithApprovals, fields, response)
+    return query.first()
 
 @router.put("/expenses/{expense_id}", response_model=ExpenseResponse)
 def update_expense(
@@ -105,14 +212,85 @@ def update_expense(
             detail="Can only update draft expenses"
         )
     
-    # Update fields
     update_data = expense_data.dict(exclude_unset=True)
-    for field, value in update_data.items():
-        setattr(expense, field, value)
+    expected_version = update_data.pop("version", None)
+    if expected_version is not None and expected_version != expense.version:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Expense was modified concurrently, please reload and retry"
+        )
+    
+    if "amount" in update_data:
+        update_data["amount_minor"] = to_minor_units(update_data.pop("amount"), expense.currency)
     
-    expense.updated_at = datetime.utcnow()
+    # Update fields
+    conditional_update(db, Expense, expense, update_data, status="draft")
     db.commit()
+    audit_log.record(current_user.id, "expense.updated", expense, {"fields": sorted(update_data)})
+    db.refresh(expense)
+    
+    return expense
+
+@router.post("/expenses/{expense_id}/receipt", response_model=ExpenseResponse)
+def upload_receipt(
+    expense_id: int,
+    file: UploadFile = File(...),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Attach a receipt image to a draft expense (sync: disk and DB work run in the threadpool)"""
+    expense = db.query(Expense).filter(
+        Expense.id == expense_id,
+        Expense.employee_id == current_user.id
+    ).first()
+    
+    if not expense:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Expense not found"
+        )
+    
+    if expense.status != "draft":
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Can only attach receipts to draft expenses"
+        )
+    
+    if not (file.content_type or "").startswith("image/"):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Receipt must be an image"
+        )
+    
+    content = file.file.read(settings.RECEIPT_MAX_BYTES + 1)
+    if len(content) > settings.RECEIPT_MAX_BYTES:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail="Receipt is too large"
+        )
+    
+    # The hash is computed by the receipt hasher, off the request path
+    previous_key = expense.receipt_url
+    key = store_receipt(expense.id, file.filename, content)
+    try:
+        conditional_update(db, Expense, expense, {
+            "receipt_url": key,
+            "receipt_filename": file.filename,
+            "receipt_hash": None,
+            "receipt_hashed_at": None
+        }, status="draft")
+        db.commit()
+    except Exception:
+        # Lost the version check (409) or the commit: don't leave the file behind
+        delete_receipt(key)
+        raise
+    if previous_key:
+        delete_receipt(previous_key)
+    audit_log.record(
+        current_user.id, "expense.receipt_attached", expense, {"filename": file.filename}
+    )
     db.refresh(expense)
+    receipt_hasher.wake()
     
     return expense
 
@@ -140,10 +318,14 @@ def submit_expense(
             detail="Can only submit draft expenses"
         )
     
-    expense.status = "submitted"
-    expense.submitted_at = datetime.utcnow()
+    conditional_update(
+        db, Expense, expense,
+        {"status": "submitted", "submitted_at": datetime.utcnow()},
+        status="draft"
+    )
     
     # Create approval record (simplified - in reality would create based on approval workflow)
+    approval = None
     if current_user.manager_id:
         approval = Approval(
             expense_id=expense.id,
@@ -151,10 +333,33 @@ def submit_expense(
             status="pending"
         )
         db.add(approval)
-    
+        db.flush()
+    
+    # Flag likely double submissions for the approver
+    duplicates = find_duplicates(db, expense)
+    record_duplicates(db, [(expense.id, match.id, score) for match, score in duplicates])
+    violations = check_expense(db, expense)
+    
+    record_event(db, "expense.submitted", expense, {
+        "expense_id": expense.id,
+        "employee_id": expense.employee_id,
+        "approval_id": approval.id if approval else None,
+        "approver_id": approval.approver_id if approval else None,
+        "amount": expense.amount,
+        "currency": expense.currency
+    })
+    approval_id = approval.id if approval else None
     db.commit()
-    
-    return {"message": "Expense submitted for approval"}
+    audit_log.record(current_user.id, "expense.submitted", expense, {
+        "approval_id": approval_id,
+        "policy_violations": [violation["rule"] for violation in violations]
+    })
+    
+    return {
+        "message": "Expense submitted for approval",
+        "possible_duplicates": to_candidates(duplicates),
+        "policy_violations": violations
+    }
 
 # Category endpoints
 @router.get("/categories", response_model=List[CategoryResponse])
@@ -191,23 +396,30 @@ def create_category(
     db.add(db_category)
     db.commit()
     db.refresh(db_category)
+    audit_log.record(current_user.id, "category.created", db_category, {"name": db_category.name})
     
     return db_category
 
 # Approval endpoints (for managers)
 @router.get("/approvals/pending", response_model=List[ExpenseWithApprovals])
 def get_pending_approvals(
+    response: Response,
+    fields: Optional[str] = None,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
     """Get expenses pending approval by current user"""
-    approvals = db.query(Approval).filter(
+    fields = parse_fields(fields, ExpenseWithApprovals)
+    pending = select(Approval.expense_id).where(
         Approval.approver_id == current_user.id,
         Approval.status == "pending"
-    ).all()
+    )
+    query = db.query(Expense).filter(Expense.id.in_(pending)).order_by(Expense.id)
     
-    expenses = [approval.expense for approval in approvals]
-    return expenses
+    if fields:
+        expenses = query.options(*load_options(Expense, fields)).all()
+        return sparse_response(expenses, ExpenseWithApprovals, fields, response)
+    return query.options(selectinload(Expense.category), selectinload(Expense.approvals)).all()
 
 @router.post("/approvals/{approval_id}/approve")
 def approve_expense(
@@ -234,17 +446,35 @@ def approve_expense(
             detail="Approval already processed"
         )
     
+    now = datetime.utcnow()
+    expense = approval.expense
+    
     # Update approval
-    approval.status = "approved"
-    approval.comments = comments
-    approval.approved_at = datetime.utcnow()
+    conditional_update(
+        db, Approval, approval,
+        {"status": "approved", "comments": comments, "approved_at": now},
+        status="pending"
+    )
     
     # Update expense status
-    expense = approval.expense
-    expense.status = "approved"
-    expense.approved_at = datetime.utcnow()
+    conditional_update(
+        db, Expense, expense,
+        {"status": "approved", "approved_at": now},
+        status="submitted"
+    )
     
+    record_event(db, "expense.approved", expense, {
+        "expense_id": expense.id,
+        "employee_id": expense.employee_id,
+        "approval_id": approval.id,
+        "approver_id": approval.approver_id,
+        "comments": comments
+    })
     db.commit()
+    audit_log.record(current_user.id, "expense.approved", expense, {
+        "approval_id": approval_id,
+        "comments": comments
+    })
     
     return {"message": "Expense approved"}
 
@@ -273,17 +503,34 @@ def reject_expense(
             detail="Approval already processed"
         )
     
+    now = datetime.utcnow()
+    expense = approval.expense
+    
     # Update approval
-    approval.status = "rejected"
-    approval.comments = comments
-    approval.approved_at = datetime.utcnow()
+    conditional_update(
+        db, Approval, approval,
+        {"status": "rejected", "comments": comments, "approved_at": now},
+        status="pending"
+    )
     
     # Update expense status
-    expense = approval.expense
-    expense.status = "rejected"
-    expense.rejected_at = datetime.utcnow()
-    expense.rejection_reason = comments
+    conditional_update(
+        db, Expense, expense,
+        {"status": "rejected", "rejected_at": now, "rejection_reason": comments},
+        status="submitted"
+    )
     
+    record_event(db, "expense.rejected", expense, {
+        "expense_id": expense.id,
+        "employee_id": expense.employee_id,
+        "approval_id": approval.id,
+        "approver_id": approval.approver_id,
+        "comments": comments
+    })
     db.commit()
+    audit_log.record(current_user.id, "expense.rejected", expense, {
+        "approval_id": approval_id,
+        "comments": comments
+    })
     
     return {"message": "Expense rejected"}
\ No newline at end of file
@@ -0,0 +1,53 @@
+import asyncio
+import json
+
+from fastapi import APIRouter, Depends, Request
+from fastapi.responses import StreamingResponse
+from sqlalchemy.orm import Session
+
+from ...core.config import settings
+from ...core.database import get_db
+from ...api.deps import get_stream_user
+from ...models.user import User
+from ...services.notifications import NotificationHub, notification_hub
+
+router = APIRouter()
+
+def format_event(message: dict) -> str:
+    """Serialize an outbox message as a server-sent event"""
+    return f"id: {message['id']}\nevent: {message['type']}\ndata: {json.dumps(message)}\n\n"
+
+async def event_stream(request: Request, hub: NotificationHub, user_id: int):
+    queue = hub.connect(user_id)
+    try:
+        # Tell the client how long to wait before reconnecting
+        yield f"retry: {settings.NOTIFICATION_RETRY_MS}\n\n"
+        while not await request.is_disconnected():
+            try:
+                message = await asyncio.wait_for(
+                    queue.get(), timeout=settings.NOTIFICATION_HEARTBEAT_SECONDS
+                )
+            except asyncio.TimeoutError:
+                # Comment line keeps proxies from closing an idle connection
+                yield ": keepalive\n\n"
+                continue
+            yield format_event(message)
+    finally:
+        hub.disconnect(user_id, queue)
+
+@router.get("/notifications/stream")
+def stream_notifications(
+    request: Request,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_stream_user)
+):
+    """Server-sent events for expenses the current user submitted or must approve"""
+    user_id = current_user.id
+    # Don't hold a pooled connection open for the lifetime of the stream
+    db.close()
+    
+    return StreamingResponse(
+        event_stream(request, notification_hub, user_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
@@ -0,0 +1,125 @@
+from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy.orm import Session
+from typing import List, Optional
+
+from ...core.config import settings
+from ...core.database import get_db
+from ...core.money import from_minor_units, to_minor_units
+from ...api.deps import get_admin_user, get_current_user
+from ...models.user import User
+from ...models.archive import ArchivedExpense, ArchivedPolicyViolation
+from ...models.expense import Expense, Category
+from ...models.policy import CategoryPolicy, Holiday, PolicyViolation
+from ...schemas.policy import (
+    CategoryPolicyUpdate, CategoryPolicyResponse, HolidayCreate, HolidayResponse, PolicyViolationResponse
+)
+
+router = APIRouter()
+
+def to_major(amount_minor: Optional[int]) -> Optional[float]:
+    if amount_minor is None:
+        return None
+    return float(from_minor_units(amount_minor, settings.FX_BASE_CURRENCY))
+
+def to_minor(amount: Optional[float]) -> Optional[int]:
+    if amount is None:
+        return None
+    return to_minor_units(amount, settings.FX_BASE_CURRENCY)
+
+def to_policy_response(policy: CategoryPolicy) -> CategoryPolicyResponse:
+    return CategoryPolicyResponse(
+        category_id=policy.category_id,
+        currency=settings.FX_BASE_CURRENCY,
+        max_amount=to_major(policy.max_amount_minor),
+        daily_cap=to_major(policy.daily_cap_minor),
+        allow_weekends=policy.allow_weekends,
+        allow_holidays=policy.allow_holidays,
+        updated_at=policy.updated_at
+    )
+
+@router.get("/policies/categories", response_model=List[CategoryPolicyResponse])
+def get_category_policies(
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Get the spending rules of every category that has them"""
+    return [to_policy_response(policy) for policy in db.query(CategoryPolicy).order_by(CategoryPolicy.category_id)]
+
+@router.put("/policies/categories/{category_id}", response_model=CategoryPolicyResponse)
+def set_category_policy(
+    category_id: int,
+    policy_data: CategoryPolicyUpdate,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_admin_user)
+):
+    """Set the spending rules of a category (admin only)"""
+    if not db.query(Category).filter(Category.id == category_id).first():
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Category not found"
+        )
+    
+    policy = db.get(CategoryPolicy, category_id) or CategoryPolicy(category_id=category_id)
+    policy.max_amount_minor = to_minor(policy_data.max_amount)
+    policy.daily_cap_minor = to_minor(policy_data.daily_cap)
+    policy.allow_weekends = policy_data.allow_weekends
+    policy.allow_holidays = policy_data.allow_holidays
+    db.add(policy)
+    db.commit()
+    db.refresh(policy)
+    
+    return to_policy_response(policy)
+
+@router.get("/policies/holidays", response_model=List[HolidayResponse])
+def get_holidays(
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Get all holidays"""
+    return db.query(Holiday).order_by(Holiday.day).all()
+
+@router.post("/policies/holidays", response_model=HolidayResponse)
+def create_holiday(
+    holiday_data: HolidayCreate,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_admin_user)
+):
+    """Add a holiday (admin only)"""
+    if db.query(Holiday).filter(Holiday.day == holiday_data.day).first():
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Holiday already exists"
+        )
+    
+    holiday = Holiday(**holiday_data.dict())
+    db.add(holiday)
+    db.commit()
+    db.refresh(holiday)
+    
+    return holiday
+
+@router.get("/expenses/{expense_id}/violations", response_model=List[PolicyViolationResponse])
+def get_expense_violations(
+    expense_id: int,
+    include_archived: bool = False,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Get the policy violations found for an expense (archived ones too with include_archived=true)"""
+    tiers = [(Expense, PolicyViolation)]
+    if include_archived:
+        tiers.append((ArchivedExpense, ArchivedPolicyViolation))
+    for model, violation_model in tiers:
+        expense = db.query(model).filter(model.id == expense_id).first()
+        if expense:
+            break
+    
+    if not expense or not (current_user.is_admin or expense.employee_id == current_user.id):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Expense not found"
+        )
+    
+    return db.query(violation_model).filter(
+        violation_model.expense_id == expense_id
+    ).order_by(violation_model.id).all()
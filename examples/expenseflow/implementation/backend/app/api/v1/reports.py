@@ -0,0 +1,64 @@
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy.orm import Session
+from typing import Optional
+from datetime import datetime
+
+from ...core.database import get_db
+from ...core.money import from_minor_units
+from ...api.deps import get_current_user
+from ...models.user import User
+from ...schemas.report import ExpenseTotalsResponse, ReportGroupTotal
+from ...services.fx import FxRateNotFound, fx_rates
+from ...services.reports import GROUP_COLUMNS, expense_totals
+
+router = APIRouter()
+
+@router.get("/reports/totals", response_model=ExpenseTotalsResponse)
+def get_expense_totals(
+    currency: str = "USD",
+    group_by: str = Query("status", enum=list(GROUP_COLUMNS)),
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    include_archived: bool = False,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Expense totals converted to one currency (all expenses for admins, own otherwise).
+
+    Archived expenses are counted only with include_archived=true.
+    """
+    currency = currency.upper()
+    try:
+        totals = expense_totals(
+            db,
+            currency,
+            fx_rates.get(),
+            group_by=group_by,
+            employee_id=None if current_user.is_admin else current_user.id,
+            start_date=start_date,
+            end_date=end_date,
+            include_archived=include_archived
+        )
+    except FxRateNotFound as exc:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=str(exc)
+        )
+    
+    groups = [
+        ReportGroupTotal(
+            group=group,
+            total=float(from_minor_units(entry["total_minor"], currency)),
+            count=entry["count"]
+        )
+        for group, entry in sorted(totals.items())
+    ]
+    total_minor = sum(entry["total_minor"] for entry in totals.values())
+    
+    return ExpenseTotalsResponse(
+        currency=currency,
+        group_by=group_by,
+        total=float(from_minor_units(total_minor, currency)),
+        count=sum(group.count for group in groups),
+        groups=groups
+    )
@@ -1,8 +1,18 @@
 from fastapi import APIRouter
+from .audit import router as audit_router
 from .auth import router as auth_router
 from .expenses import router as expenses_router
+from .notifications import router as notifications_router
+from .policies import router as policies_router
+from .reports import router as reports_router
+from .users import router as users_router
 
 api_router = APIRouter()
 
 api_router.include_router(auth_router, prefix="/auth", tags=["authentication"])
-api_router.include_router(expenses_router, prefix="", tags=["expenses"])
\ No newline at end of file
+api_router.include_router(expenses_router, prefix="", tags=["expenses"])
+api_router.include_router(notifications_router, prefix="", tags=["notifications"])
+api_router.include_router(reports_router, prefix="", tags=["reports"])
+api_router.include_router(policies_router, prefix="", tags=["policies"])
+api_router.include_router(audit_router, prefix="", tags=["audit"])
+api_router.include_router(users_router, prefix="", tags=["users"])
\ No newline at end of file
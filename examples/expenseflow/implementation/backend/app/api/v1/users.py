@@ -0,0 +1,36 @@
+from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy.orm import Session
+
+from ...core.database import get_db
+from ...api.deps import get_current_user
+from ...models.user import User
+from ...schemas.user import DirectorySnapshot, DirectorySyncResult
+from ...services.audit import audit_log
+from ...services.directory import DirectorySyncError, sync_directory
+
+router = APIRouter()
+
+@router.post("/users/sync", response_model=DirectorySyncResult)
+def sync_users(
+    snapshot: DirectorySnapshot,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Create, update and deactivate users to match an HR directory snapshot (admin only)"""
+    if not current_user.is_admin:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Not enough permissions"
+        )
+    
+    try:
+        result = sync_directory(db, snapshot.users, snapshot.deactivate_missing)
+    except DirectorySyncError as exc:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=exc.problems
+        )
+    db.commit()
+    audit_log.record(current_user.id, "directory.synced", current_user, result)
+    
+    return result
@@ -12,17 +12,117 @@ class Settings(BaseSettings):
     SECRET_KEY: str = "your-secret-key-change-in-production"
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
+    REFRESH_TOKEN_EXPIRE_DAYS: int = 30
     
     # Database
     DATABASE_URL: Optional[str] = None
     SQLITE_URL: str = "sqlite:///./expenseflow.db"
+    DATABASE_REPLICA_URLS: list = []
+    READ_YOUR_WRITES_SECONDS: int = 5
+    READ_YOUR_WRITES_MAX_SUBJECTS: int = 100000
     
     # Redis
     REDIS_URL: str = "redis://localhost:6379"
+    REDIS_CONNECT_TIMEOUT: float = 0.5
+    
+    # Rate limiting (token bucket sizes, refilled continuously over a minute)
+    RATE_LIMIT_ENABLED: bool = True
+    RATE_LIMIT_AUTH_PER_MINUTE: int = 10
+    RATE_LIMIT_READ_PER_MINUTE: int = 300
+    RATE_LIMIT_WRITE_PER_MINUTE: int = 60
+    RATE_LIMIT_IP_PER_MINUTE: int = 600
+    RATE_LIMIT_TRUST_PROXY_HEADERS: bool = False
+    
+    # Load shedding
+    MAX_CONCURRENT_REQUESTS: int = 100
+    LOAD_SHED_RETRY_AFTER: int = 1
+    
+    # Response compression
+    COMPRESSION_MINIMUM_SIZE: int = 1024
+    GZIP_LEVEL: int = 6
+    BROTLI_QUALITY: int = 4
+    
+    # Idempotency keys for write requests
+    IDEMPOTENCY_TTL_SECONDS: int = 86400
+    IDEMPOTENCY_LOCK_SECONDS: int = 60
+    IDEMPOTENCY_WAIT_SECONDS: float = 10.0
+    IDEMPOTENCY_MAX_BODY_BYTES: int = 1024 * 1024
+    IDEMPOTENCY_MEMORY_MAX_KEYS: int = 10000
     
     # CORS
     BACKEND_CORS_ORIGINS: list = ["http://localhost:3000", "http://localhost:8080"]
     
+    # Transactional outbox relay
+    OUTBOX_RELAY_ENABLED: bool = True
+    OUTBOX_BATCH_SIZE: int = 100
+    OUTBOX_POLL_INTERVAL: float = 1.0
+    OUTBOX_STREAM: str = "expenseflow:events"
+    OUTBOX_STREAM_MAXLEN: int = 100000
+    OUTBOX_CLAIM_SECONDS: int = 60
+    OUTBOX_RETENTION_HOURS: int = 168
+    OUTBOX_PRUNE_INTERVAL_SECONDS: int = 3600
+    
+    # Push notifications (server-sent events)
+    NOTIFICATION_CHANNEL: str = "expenseflow:notifications"
+    NOTIFICATION_QUEUE_SIZE: int = 100
+    NOTIFICATION_HEARTBEAT_SECONDS: float = 15.0
+    NOTIFICATION_RETRY_MS: int = 3000
+    
+    # Currency conversion (CSV files with date,currency,rate per FX_BASE_CURRENCY)
+    FX_RATES_DIR: str = "./data/fx"
+    FX_BASE_CURRENCY: str = "USD"
+    REPORT_CHUNK_SIZE: int = 50000
+    
+    # Hot/cold tiering: finalized expenses older than this move to the archive tables
+    ARCHIVE_AFTER_DAYS: int = 365
+    ARCHIVE_BATCH_SIZE: int = 1000
+    # Run the archiver from the scheduler instead of an external cron
+    ARCHIVE_SCHEDULE_ENABLED: bool = False
+    ARCHIVE_INTERVAL_SECONDS: int = 86400
+    
+    # Duplicate detection: same employee and amount within a date window, similar description
+    DUPLICATE_DATE_WINDOW_DAYS: int = 3
+    DUPLICATE_SIMILARITY_THRESHOLD: float = 0.5
+    DUPLICATE_SCAN_BATCH_SIZE: int = 1000
+    
+    # Policy compliance sweep over submitted expenses
+    POLICY_SWEEP_CHUNK_SIZE: int = 50000
+    POLICY_SWEEP_SCHEDULE_ENABLED: bool = False
+    POLICY_SWEEP_INTERVAL_SECONDS: int = 3600
+    
+    # Audit log: buffered in memory, overflow spilled to a JSONL file and replayed
+    AUDIT_BUFFER_SIZE: int = 10000
+    AUDIT_FLUSH_BATCH_SIZE: int = 500
+    AUDIT_FLUSH_INTERVAL: float = 1.0
+    AUDIT_SPILL_PATH: str = "./data/audit-spill.jsonl"
+    
+    # HR directory sync
+    DIRECTORY_SYNC_BATCH_SIZE: int = 1000
+    DIRECTORY_SYNC_HASH_WORKERS: int = 4
+    
+    # Scheduler: one worker holds the lease and runs recurring jobs
+    SCHEDULER_ENABLED: bool = True
+    SCHEDULER_TICK_SECONDS: float = 15.0
+    SCHEDULER_LEASE_SECONDS: int = 60
+    SCHEDULER_CHUNK_PAUSE: float = 0.1
+    
+    # Stale approvals move up the manager chain; top-level approvers get reminders
+    APPROVAL_ESCALATION_INTERVAL_SECONDS: int = 900
+    APPROVAL_ESCALATE_AFTER_HOURS: int = 48
+    APPROVAL_REMINDER_INTERVAL_HOURS: int = 24
+    APPROVAL_ESCALATION_CHUNK_SIZE: int = 200
+    APPROVAL_ESCALATION_MAX_CHUNKS: int = 50
+    
+    # Receipt images and the perceptual hash index used to spot reused photos
+    RECEIPT_STORAGE_DIR: str = "./data/receipts"
+    RECEIPT_MAX_BYTES: int = 10 * 1024 * 1024
+    RECEIPT_INDEX_PATH: str = "./data/receipt-hashes.bin"
+    RECEIPT_HASH_MAX_DISTANCE: int = 6
+    RECEIPT_HASHER_ENABLED: bool = True
+    RECEIPT_HASHER_BATCH_SIZE: int = 50
+    RECEIPT_HASHER_POLL_INTERVAL: float = 5.0
+    RECEIPT_HASHER_CLAIM_SECONDS: int = 300
+    
     # File Storage
     AWS_ACCESS_KEY_ID: Optional[str] = None
     AWS_SECRET_ACCESS_KEY: Optional[str] = None
@@ -1,13 +1,26 @@
-from sqlalchemy import create_engine
+import itertools
+import threading
+import time
+from collections import OrderedDict
+from typing import List, Optional
+
+import redis
+from fastapi import Request
+from sqlalchemy import create_engine, event
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import Session, sessionmaker
 from .config import settings
+from .redis import get_redis, mark_redis_failed
+from .rate_limit import get_token_subject
+
+def _create_engine(url: str):
+    return create_engine(
+        url,
+        connect_args={"check_same_thread": False} if "sqlite" in url else {}
+    )
 
 # Create engine
-engine = create_engine(
-    settings.database_url,
-    connect_args={"check_same_thread": False} if "sqlite" in settings.database_url else {}
-)
+engine = _create_engine(settings.database_url)
 
 # Create session factory
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
@@ -15,10 +28,118 @@ SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 # Create base class for models
 Base = declarative_base()
 
-def get_db():
-    """Database dependency for FastAPI"""
-    db = SessionLocal()
+class DatabaseRouter:
+    """Route read-only requests to replicas, writes to the primary.
+
+    A user who has just written is pinned to the primary for
+    READ_YOUR_WRITES_SECONDS so they never read a replica that hasn't caught
+    up with their own change. The pin lives in Redis so it holds across
+    workers, with an in-process fallback that remembers at most
+    READ_YOUR_WRITES_MAX_SUBJECTS users. Only committed writes pin.
+    """
+
+    def __init__(
+        self,
+        primary: sessionmaker,
+        replicas: List[sessionmaker],
+        sticky_seconds: Optional[int] = None,
+        prefix: str = "read-your-writes",
+    ):
+        self.primary = primary
+        self.replicas = replicas
+        self.sticky_seconds = (
+            settings.READ_YOUR_WRITES_SECONDS if sticky_seconds is None else sticky_seconds
+        )
+        self.prefix = prefix
+        self._next_replica = itertools.cycle(replicas) if replicas else None
+        self._replica_lock = threading.Lock()
+        self._sticky: "OrderedDict[str, float]" = OrderedDict()
+        self._sticky_lock = threading.Lock()
+
+    def session(self, read_only: bool, subject: Optional[str] = None) -> Session:
+        if read_only and self._next_replica is not None and not self.is_sticky(subject):
+            with self._replica_lock:
+                factory = next(self._next_replica)
+            return factory()
+        db = self.primary()
+        if subject and self.replicas:
+            db.info[ROUTER_KEY] = (self, subject)
+        return db
+
+    def mark_write(self, subject: str) -> None:
+        client = get_redis()
+        if client is not None:
+            try:
+                client.set(f"{self.prefix}:{subject}", 1, ex=self.sticky_seconds)
+                return
+            except redis.RedisError:
+                mark_redis_failed()
+        with self._sticky_lock:
+            self._sticky[subject] = time.monotonic() + self.sticky_seconds
+            self._sticky.move_to_end(subject)
+            # Forgetting the oldest pin early only means one early replica read
+            while len(self._sticky) > settings.READ_YOUR_WRITES_MAX_SUBJECTS:
+                self._sticky.popitem(last=False)
+
+    def is_sticky(self, subject: Optional[str]) -> bool:
+        if not subject:
+            return False
+        client = get_redis()
+        if client is not None:
+            try:
+                return bool(client.exists(f"{self.prefix}:{subject}"))
+            except redis.RedisError:
+                mark_redis_failed()
+        with self._sticky_lock:
+            expires_at = self._sticky.get(subject)
+            if expires_at is None:
+                return False
+            if expires_at < time.monotonic():
+                del self._sticky[subject]
+                return False
+            return True
+
+# Session.info keys: the router and subject of a primary session, and whether it wrote
+ROUTER_KEY = "read_your_writes"
+WROTE_KEY = "read_your_writes_pending"
+
+# Registered once on Session so routers never stack listeners on a sessionmaker
+@event.listens_for(Session, "after_flush")
+def _note_flush(db: Session, flush_context) -> None:
+    if ROUTER_KEY in db.info:
+        db.info[WROTE_KEY] = True
+
+@event.listens_for(Session, "do_orm_execute")
+def _note_bulk_write(orm_execute_state) -> None:
+    if ROUTER_KEY in orm_execute_state.session.info and (
+        orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete
+    ):
+        orm_execute_state.session.info[WROTE_KEY] = True
+
+@event.listens_for(Session, "after_commit")
+def _pin_writer(db: Session) -> None:
+    if db.info.pop(WROTE_KEY, False):
+        router, subject = db.info[ROUTER_KEY]
+        router.mark_write(subject)
+
+@event.listens_for(Session, "after_rollback")
+def _forget_write(db: Session) -> None:
+    db.info.pop(WROTE_KEY, None)
+
+replica_sessions = [
+    sessionmaker(autocommit=False, autoflush=False, bind=_create_engine(url))
+    for url in settings.DATABASE_REPLICA_URLS
+]
+
+db_router = DatabaseRouter(SessionLocal, replica_sessions)
+
+def get_db(request: Request):
+    """Database dependency for FastAPI; GET/HEAD requests may use a replica"""
+    db = db_router.session(
+        read_only=request.method in ("GET", "HEAD"),
+        subject=get_token_subject(request.scope),
+    )
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
@@ -0,0 +1,200 @@
+import zlib
+from contextvars import ContextVar
+from typing import Any, Optional
+
+from fastapi.responses import JSONResponse
+from starlette.datastructures import MutableHeaders
+
+from .config import settings
+from .rate_limit import get_header
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - brotli is optional
+    brotli = None
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover - msgpack is optional
+    msgpack = None
+
+JSON_MEDIA_TYPE = "application/json"
+MSGPACK_MEDIA_TYPE = "application/msgpack"
+MSGPACK_MEDIA_TYPES = (MSGPACK_MEDIA_TYPE, "application/x-msgpack")
+
+COMPRESSIBLE_TYPES = (
+    "text/",
+    "application/json",
+    "application/msgpack",
+    "application/javascript",
+    "image/svg+xml",
+)
+# Server-sent events must reach the client as each event is written
+UNCOMPRESSED_TYPES = ("text/event-stream",)
+
+# Media type negotiated for the current request, read by NegotiatedResponse
+response_media_type: ContextVar[str] = ContextVar("response_media_type", default=JSON_MEDIA_TYPE)
+
+def _parse_accept(header: Optional[str]) -> dict:
+    """Parse an Accept or Accept-Encoding header into {value: q}"""
+    preferences = {}
+    if not header:
+        return preferences
+    for item in header.split(","):
+        value, _, params = item.strip().partition(";")
+        q = 1.0
+        for param in params.split(";"):
+            name, _, raw = param.strip().partition("=")
+            if name == "q":
+                try:
+                    q = float(raw)
+                except ValueError:
+                    q = 0.0
+        if value:
+            preferences[value.strip().lower()] = q
+    return preferences
+
+def negotiate_media_type(accept: Optional[str]) -> str:
+    """Pick msgpack only when the client asks for it over JSON"""
+    if msgpack is None:
+        return JSON_MEDIA_TYPE
+    preferences = _parse_accept(accept)
+    msgpack_q = max((preferences.get(media_type, 0.0) for media_type in MSGPACK_MEDIA_TYPES))
+    json_q = preferences.get(JSON_MEDIA_TYPE, 0.0)
+    if msgpack_q > 0 and msgpack_q >= json_q:
+        return MSGPACK_MEDIA_TYPE
+    return JSON_MEDIA_TYPE
+
+def negotiate_encoding(accept_encoding: Optional[str]) -> Optional[str]:
+    """Pick brotli, then gzip, from the encodings the client accepts"""
+    preferences = _parse_accept(accept_encoding)
+    wildcard = preferences.get("*", 0.0)
+    candidates = ["br", "gzip"] if brotli is not None else ["gzip"]
+    best, best_q = None, 0.0
+    for encoding in candidates:
+        q = preferences.get(encoding, wildcard)
+        if q > best_q:
+            best, best_q = encoding, q
+    return best
+
+class NegotiatedResponse(JSONResponse):
+    """JSON response that renders as msgpack when the client negotiated it"""
+
+    def __init__(self, content: Any, *args, **kwargs):
+        self.media_type = response_media_type.get()
+        super().__init__(content, *args, **kwargs)
+        self.headers.add_vary_header("Accept")
+
+    def render(self, content: Any) -> bytes:
+        if self.media_type == MSGPACK_MEDIA_TYPE:
+            return msgpack.packb(content, use_bin_type=True)
+        return super().render(content)
+
+class _Compressor:
+    """Incremental gzip/brotli compressor that can flush between chunks"""
+
+    def __init__(self, encoding: str):
+        self.encoding = encoding
+        if encoding == "br":
+            self._brotli = brotli.Compressor(quality=settings.BROTLI_QUALITY)
+        else:
+            self._gzip = zlib.compressobj(settings.GZIP_LEVEL, zlib.DEFLATED, zlib.MAX_WBITS | 16)
+
+    def compress(self, data: bytes, final: bool) -> bytes:
+        if self.encoding == "br":
+            out = self._brotli.process(data)
+            return out + (self._brotli.finish() if final else self._brotli.flush())
+        out = self._gzip.compress(data)
+        return out + self._gzip.flush(zlib.Z_FINISH if final else zlib.Z_SYNC_FLUSH)
+
+class _EncodingResponder:
+    """Wraps send() to compress the response body once it is worth it.
+
+    Small single-chunk bodies are sent as-is. Streaming bodies are compressed
+    chunk by chunk and flushed after each one, so they are never buffered.
+    """
+
+    def __init__(self, send, encoding: Optional[str], minimum_size: int):
+        self.send = send
+        self.encoding = encoding
+        self.minimum_size = minimum_size
+        self.start_message = None
+        self.compressor: Optional[_Compressor] = None
+        self.started = False
+
+    async def __call__(self, message):
+        message_type = message["type"]
+        if message_type == "http.response.start":
+            # Hold the headers until the first body chunk shows the response size
+            self.start_message = message
+            return
+        if message_type != "http.response.body" or self.started:
+            if self.compressor is not None and message_type == "http.response.body":
+                message = {
+                    "type": "http.response.body",
+                    "body": self.compressor.compress(
+                        message.get("body", b""), final=not message.get("more_body", False)
+                    ),
+                    "more_body": message.get("more_body", False),
+                }
+            await self.send(message)
+            return
+
+        self.started = True
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+        headers = MutableHeaders(scope=self.start_message)
+        content_type = headers.get("content-type", "")
+        compressible = (
+            content_type.startswith(COMPRESSIBLE_TYPES)
+            and not content_type.startswith(UNCOMPRESSED_TYPES)
+            and "content-encoding" not in headers
+            and self.start_message["status"] not in (204, 304)
+        )
+        if compressible:
+            headers.add_vary_header("Accept-Encoding")
+
+        if (
+            not compressible
+            or self.encoding is None
+            or (not more_body and len(body) < self.minimum_size)
+        ):
+            await self.send(self.start_message)
+            await self.send(message)
+            return
+
+        self.compressor = _Compressor(self.encoding)
+        body = self.compressor.compress(body, final=not more_body)
+        headers["Content-Encoding"] = self.encoding
+        # The encoded bytes differ from the identity representation
+        etag = headers.get("etag")
+        if etag and not etag.startswith("W/"):
+            headers["ETag"] = f"W/{etag}"
+        if more_body:
+            del headers["Content-Length"]
+        else:
+            headers["Content-Length"] = str(len(body))
+
+        await self.send(self.start_message)
+        await self.send({"type": "http.response.body", "body": body, "more_body": more_body})
+
+class ContentNegotiationMiddleware:
+    """Negotiate the response format (JSON/msgpack) and encoding (br/gzip)"""
+
+    def __init__(self, app, minimum_size: Optional[int] = None):
+        self.app = app
+        self.minimum_size = (
+            settings.COMPRESSION_MINIMUM_SIZE if minimum_size is None else minimum_size
+        )
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        token = response_media_type.set(negotiate_media_type(get_header(scope, b"accept")))
+        encoding = negotiate_encoding(get_header(scope, b"accept-encoding"))
+        try:
+            await self.app(scope, receive, _EncodingResponder(send, encoding, self.minimum_size))
+        finally:
+            response_media_type.reset(token)
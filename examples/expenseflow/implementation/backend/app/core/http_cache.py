@@ -0,0 +1,66 @@
+import hashlib
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Iterable, Optional
+
+from fastapi import Request, Response, status
+
+from .encoding import response_media_type
+
+CACHE_CONTROL = "private, no-cache"
+# Representations differ by format and encoding, so 304s vary on both too
+VARY = "Accept, Accept-Encoding"
+
+def make_etag(versions: Iterable, media_type: Optional[str] = None) -> str:
+    """Build a strong ETag from (id, updated_at) pairs and the negotiated media type"""
+    digest = hashlib.sha256()
+    # JSON and msgpack bodies of the same rows must not validate each other
+    digest.update(f"{media_type or response_media_type.get()};".encode())
+    for resource_id, updated_at in versions:
+        digest.update(f"{resource_id}:{updated_at.isoformat() if updated_at else ''};".encode())
+    return f'"{digest.hexdigest()[:32]}"'
+
+def http_date(value: datetime) -> str:
+    """Format a naive UTC datetime as an HTTP date"""
+    return format_datetime(value.replace(tzinfo=timezone.utc, microsecond=0), usegmt=True)
+
+def _etag_matches(header: str, etag: str) -> bool:
+    if header.strip() == "*":
+        return True
+    # If-None-Match uses weak comparison, so ignore any W/ prefix
+    for tag in header.split(","):
+        tag = tag.strip()
+        if tag.startswith("W/"):
+            tag = tag[2:]
+        if tag == etag:
+            return True
+    return False
+
+def is_not_modified(request: Request, etag: str, last_modified: Optional[datetime]) -> bool:
+    """Evaluate If-None-Match / If-Modified-Since against the current validators"""
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        return _etag_matches(if_none_match, etag)
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since and last_modified is not None:
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        if since.tzinfo is None:
+            since = since.replace(tzinfo=timezone.utc)
+        return last_modified.replace(tzinfo=timezone.utc, microsecond=0) <= since
+    return False
+
+def set_validators(response: Response, etag: str, last_modified: Optional[datetime]) -> None:
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = CACHE_CONTROL
+    if last_modified is not None:
+        response.headers["Last-Modified"] = http_date(last_modified)
+
+def not_modified(etag: str, last_modified: Optional[datetime]) -> Response:
+    response = Response(status_code=status.HTTP_304_NOT_MODIFIED)
+    set_validators(response, etag, last_modified)
+    response.headers["Vary"] = VARY
+    return response
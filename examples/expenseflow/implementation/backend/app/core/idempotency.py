@@ -0,0 +1,293 @@
+import asyncio
+import base64
+import hashlib
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+import redis
+
+from .config import settings
+from .redis import get_async_redis, mark_redis_failed
+from .rate_limit import get_client_ip, get_header, get_token_subject
+
+logger = logging.getLogger(__name__)
+
+IDEMPOTENCY_HEADER = b"idempotency-key"
+UNSAFE_METHODS = ("POST", "PUT", "PATCH", "DELETE")
+MAX_KEY_LENGTH = 255
+# Responses carry access and refresh tokens, which must not be cached and replayed
+EXCLUDED_PREFIXES = ("/api/v1/auth/",)
+
+class RequestTooLarge(Exception):
+    pass
+
+class MemoryIdempotencyStore:
+    """In-process idempotency records used when Redis is unavailable"""
+
+    def __init__(self, max_keys: Optional[int] = None):
+        self.max_keys = max_keys or settings.IDEMPOTENCY_MEMORY_MAX_KEYS
+        self._records: "OrderedDict[str, Tuple[float, dict]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _get_live(self, key: str) -> Optional[dict]:
+        entry = self._records.get(key)
+        if entry is None:
+            return None
+        expires_at, record = entry
+        if expires_at < time.monotonic():
+            del self._records[key]
+            return None
+        self._records.move_to_end(key)
+        return record
+
+    def _put(self, key: str, record: dict, ttl: int) -> None:
+        self._records[key] = (time.monotonic() + ttl, record)
+        self._records.move_to_end(key)
+        # Evict least recently used records; an evicted key is simply new again
+        while len(self._records) > self.max_keys:
+            self._records.popitem(last=False)
+
+    def reserve(self, key: str, record: dict, ttl: int) -> Optional[dict]:
+        with self._lock:
+            existing = self._get_live(key)
+            if existing is not None:
+                return existing
+            self._put(key, record, ttl)
+            return None
+
+    def get(self, key: str) -> Optional[dict]:
+        with self._lock:
+            return self._get_live(key)
+
+    def set(self, key: str, record: dict, ttl: int) -> None:
+        with self._lock:
+            self._put(key, record, ttl)
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._records.pop(key, None)
+
+    def reset(self) -> None:
+        with self._lock:
+            self._records.clear()
+
+class IdempotencyStore:
+    """Stores the first response for each idempotency key in Redis or in-process.
+
+    Redis is awaited through redis.asyncio so the middleware never blocks the
+    event loop. The in-process fallback only deduplicates within one worker:
+    while Redis is down, a retry that lands on another worker runs the
+    handler again. That is logged as a warning every FALLBACK_WARN_INTERVAL.
+    """
+
+    FALLBACK_WARN_INTERVAL = 60.0
+
+    def __init__(self, prefix: str = "idempotency"):
+        self.prefix = prefix
+        self.memory = MemoryIdempotencyStore()
+        self._warned_at: Optional[float] = None
+
+    async def _redis_call(self, method: str, key: str, *args, **kwargs):
+        client = await get_async_redis()
+        if client is not None:
+            try:
+                return True, await getattr(client, method)(f"{self.prefix}:{key}", *args, **kwargs)
+            except redis.RedisError:
+                mark_redis_failed()
+        self._warn_fallback()
+        return False, None
+
+    def _warn_fallback(self) -> None:
+        now = time.monotonic()
+        if self._warned_at is not None and now - self._warned_at < self.FALLBACK_WARN_INTERVAL:
+            return
+        self._warned_at = now
+        logger.warning(
+            "Redis unavailable: Idempotency-Key records are kept per worker process, "
+            "so retries reaching another worker are not deduplicated"
+        )
+
+    async def reserve(self, key: str, fingerprint: str) -> Optional[dict]:
+        """Claim key for a new request; returns the existing record if already claimed"""
+        record = {"state": "pending", "fingerprint": fingerprint}
+        ttl = settings.IDEMPOTENCY_LOCK_SECONDS
+        ok, created = await self._redis_call("set", key, json.dumps(record), nx=True, ex=ttl)
+        if not ok:
+            return self.memory.reserve(key, record, ttl)
+        if created:
+            return None
+        # The record may have expired since SET NX failed; try to claim it again
+        return await self.get(key) or await self.reserve(key, fingerprint)
+
+    async def get(self, key: str) -> Optional[dict]:
+        ok, raw = await self._redis_call("get", key)
+        if not ok:
+            return self.memory.get(key)
+        return json.loads(raw) if raw else None
+
+    async def complete(self, key: str, record: dict) -> None:
+        ttl = settings.IDEMPOTENCY_TTL_SECONDS
+        ok, _ = await self._redis_call("set", key, json.dumps(record), ex=ttl)
+        if not ok:
+            self.memory.set(key, record, ttl)
+
+    async def release(self, key: str) -> None:
+        ok, _ = await self._redis_call("delete", key)
+        if not ok:
+            self.memory.delete(key)
+
+idempotency_store = IdempotencyStore()
+
+class IdempotencyMiddleware:
+    """Replay the stored response for write requests carrying an Idempotency-Key.
+
+    The first request with a key runs the handler and its response is stored
+    for IDEMPOTENCY_TTL_SECONDS. Retries get the stored response without
+    re-running the handler; retries that arrive while the first request is
+    still running wait for it to finish. Keys are scoped per user (or per IP
+    for unauthenticated calls) and bound to the method, path and body, so
+    reusing a key for a different request is rejected with 422. Server errors
+    are not stored, so a retry after a 5xx runs the handler again. Auth
+    routes are left alone so tokens are never stored, and bodies over
+    IDEMPOTENCY_MAX_BODY_BYTES are refused with 413 instead of buffered.
+    """
+
+    def __init__(self, app, store: IdempotencyStore = idempotency_store):
+        self.app = app
+        self.store = store
+
+    async def __call__(self, scope, receive, send):
+        if (
+            scope["type"] != "http"
+            or scope["method"] not in UNSAFE_METHODS
+            or scope["path"].startswith(EXCLUDED_PREFIXES)
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        idempotency_key = get_header(scope, IDEMPOTENCY_HEADER)
+        if idempotency_key is None:
+            await self.app(scope, receive, send)
+            return
+        if not idempotency_key or len(idempotency_key) > MAX_KEY_LENGTH:
+            await self._send_error(send, 400, "Invalid Idempotency-Key header")
+            return
+
+        try:
+            body = await self._read_body(scope, receive)
+        except RequestTooLarge:
+            await self._send_error(send, 413, "Request body too large for an Idempotency-Key")
+            return
+        owner = get_token_subject(scope) or f"ip:{get_client_ip(scope)}"
+        key = f"{owner}:{idempotency_key}"
+        fingerprint = hashlib.sha256(
+            b"\n".join([scope["method"].encode(), scope["path"].encode(),
+                        scope.get("query_string", b""), body])
+        ).hexdigest()
+
+        existing = await self.store.reserve(key, fingerprint)
+        if existing is not None:
+            await self._replay(key, existing, fingerprint, send)
+            return
+
+        response = {"status": 500, "headers": [], "body": b""}
+
+        body_sent = False
+
+        async def replay_receive():
+            nonlocal body_sent
+            if body_sent:
+                return await receive()
+            body_sent = True
+            return {"type": "http.request", "body": body, "more_body": False}
+
+        async def capture_send(message):
+            if message["type"] == "http.response.start":
+                response["status"] = message["status"]
+                response["headers"] = message.get("headers", [])
+            elif message["type"] == "http.response.body":
+                response["body"] += message.get("body", b"")
+            await send(message)
+
+        try:
+            await self.app(scope, replay_receive, capture_send)
+        except Exception:
+            await self.store.release(key)
+            raise
+
+        if response["status"] >= 500:
+            await self.store.release(key)
+            return
+        await self.store.complete(key, {
+            "state": "done",
+            "fingerprint": fingerprint,
+            "status": response["status"],
+            "headers": [
+                [name.decode("latin-1"), value.decode("latin-1")]
+                for name, value in response["headers"]
+            ],
+            "body": base64.b64encode(response["body"]).decode(),
+        })
+
+    async def _replay(self, key: str, record: dict, fingerprint: str, send):
+        if record["fingerprint"] != fingerprint:
+            await self._send_error(
+                send, 422, "Idempotency-Key was already used for a different request"
+            )
+            return
+
+        # Wait for an in-flight request with the same key instead of racing it
+        deadline = time.monotonic() + settings.IDEMPOTENCY_WAIT_SECONDS
+        while record is not None and record["state"] == "pending":
+            if time.monotonic() >= deadline:
+                await self._send_error(
+                    send, 409, "A request with this Idempotency-Key is still in progress"
+                )
+                return
+            await asyncio.sleep(0.05)
+            record = await self.store.get(key)
+
+        if record is None:
+            # The first request failed and released the key; let the client retry
+            await self._send_error(
+                send, 409, "The original request with this Idempotency-Key failed, please retry"
+            )
+            return
+
+        headers = [
+            (name.encode("latin-1"), value.encode("latin-1"))
+            for name, value in record["headers"]
+        ]
+        headers.append((b"idempotent-replayed", b"true"))
+        await send({"type": "http.response.start", "status": record["status"], "headers": headers})
+        await send({"type": "http.response.body", "body": base64.b64decode(record["body"])})
+
+    async def _read_body(self, scope, receive) -> bytes:
+        limit = settings.IDEMPOTENCY_MAX_BODY_BYTES
+        content_length = get_header(scope, b"content-length")
+        if content_length and content_length.isdigit() and int(content_length) > limit:
+            raise RequestTooLarge()
+        body = b""
+        while True:
+            message = await receive()
+            body += message.get("body", b"")
+            if len(body) > limit:
+                raise RequestTooLarge()
+            if not message.get("more_body", False):
+                return body
+
+    async def _send_error(self, send, status_code: int, detail: str):
+        body = json.dumps({"detail": detail}).encode()
+        await send({
+            "type": "http.response.start",
+            "status": status_code,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
@@ -0,0 +1,24 @@
+from decimal import Decimal, ROUND_HALF_UP
+from typing import Union
+
+DEFAULT_CURRENCY = "USD"
+
+# ISO 4217 minor unit exponents that differ from the usual 2
+CURRENCY_EXPONENTS = {
+    "BIF": 0, "CLP": 0, "DJF": 0, "GNF": 0, "ISK": 0, "JPY": 0, "KMF": 0, "KRW": 0,
+    "PYG": 0, "RWF": 0, "UGX": 0, "VND": 0, "VUV": 0, "XAF": 0, "XOF": 0, "XPF": 0,
+    "BHD": 3, "IQD": 3, "JOD": 3, "KWD": 3, "LYD": 3, "OMR": 3, "TND": 3,
+}
+
+def currency_exponent(currency: str) -> int:
+    """Number of decimal places in the currency's minor unit"""
+    return CURRENCY_EXPONENTS.get((currency or DEFAULT_CURRENCY).upper(), 2)
+
+def to_minor_units(amount: Union[float, int, str, Decimal], currency: str) -> int:
+    """Convert a major-unit amount to exact integer minor units (e.g. cents)"""
+    scaled = Decimal(str(amount)).scaleb(currency_exponent(currency))
+    return int(scaled.quantize(Decimal(1), rounding=ROUND_HALF_UP))
+
+def from_minor_units(amount_minor: int, currency: str) -> Decimal:
+    """Convert integer minor units back to an exact major-unit Decimal"""
+    return Decimal(amount_minor).scaleb(-currency_exponent(currency))
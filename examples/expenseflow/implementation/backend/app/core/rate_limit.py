@@ -0,0 +1,224 @@
+import json
+import math
+import threading
+import time
+from collections import Counter, OrderedDict
+from typing import Optional, Tuple
+
+import redis
+from jose import JWTError, jwt
+
+from .config import settings
+from .redis import get_async_redis, mark_redis_failed
+
+# Atomic token bucket: refill based on elapsed time, then try to take one token.
+# Returns {allowed, retry_after_seconds}; retry_after is a string because Redis
+# truncates Lua numbers to integers in replies.
+TOKEN_BUCKET_SCRIPT = """
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local now = tonumber(ARGV[3])
+local data = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(data[1]) or capacity
+local ts = tonumber(data[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+local allowed = 0
+local retry_after = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+    allowed = 1
+else
+    retry_after = (1 - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'ts', now)
+redis.call('PEXPIRE', KEYS[1], math.ceil(capacity / rate * 1000))
+return {allowed, tostring(retry_after)}
+"""
+
+class MemoryTokenBuckets:
+    """In-process token buckets used when Redis is unavailable"""
+
+    def __init__(self, max_keys: int = 100_000):
+        self.max_keys = max_keys
+        self._buckets: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def hit(self, key: str, capacity: int, rate: float) -> Tuple[bool, float]:
+        now = time.monotonic()
+        with self._lock:
+            tokens, ts = self._buckets.pop(key, (capacity, now))
+            tokens = min(capacity, tokens + max(0.0, now - ts) * rate)
+            if tokens >= 1:
+                allowed, retry_after = True, 0.0
+                tokens -= 1
+            else:
+                allowed, retry_after = False, (1 - tokens) / rate
+            self._buckets[key] = (tokens, now)
+            # Evict least recently used buckets; an evicted bucket is simply full again
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        return allowed, retry_after
+
+    def reset(self) -> None:
+        with self._lock:
+            self._buckets.clear()
+
+class RateLimiter:
+    """Token bucket rate limiter backed by Redis with an in-process fallback"""
+
+    def __init__(self, prefix: str = "ratelimit"):
+        self.prefix = prefix
+        self.memory = MemoryTokenBuckets()
+        self.stats: Counter = Counter()
+        self._script = None
+
+    async def hit(self, key: str, per_minute: int) -> Tuple[bool, float]:
+        """Take one token from the bucket for key; returns (allowed, retry_after)"""
+        rate = per_minute / 60.0
+        client = await get_async_redis()
+        if client is not None:
+            try:
+                if self._script is None or self._script.registered_client is not client:
+                    self._script = client.register_script(TOKEN_BUCKET_SCRIPT)
+                allowed, retry_after = await self._script(
+                    keys=[f"{self.prefix}:{key}"],
+                    args=[per_minute, rate, time.time()],
+                )
+                self.stats["backend_redis"] += 1
+                return bool(int(allowed)), float(retry_after)
+            except redis.RedisError:
+                mark_redis_failed()
+                self._script = None
+        self.stats["backend_memory"] += 1
+        return self.memory.hit(key, per_minute, rate)
+
+    def reset(self) -> None:
+        self.memory.reset()
+        self.stats.clear()
+
+rate_limiter = RateLimiter()
+
+def get_route_class(method: str, path: str) -> str:
+    """Classify a request into the route class its limits are drawn from"""
+    # Refreshing skips bcrypt, so it doesn't need the strict login budget
+    if path.startswith("/api/v1/auth/") and path != "/api/v1/auth/refresh":
+        return "auth"
+    if method in ("GET", "HEAD", "OPTIONS"):
+        return "read"
+    return "write"
+
+def get_route_class_limit(route_class: str) -> int:
+    return {
+        "auth": settings.RATE_LIMIT_AUTH_PER_MINUTE,
+        "read": settings.RATE_LIMIT_READ_PER_MINUTE,
+        "write": settings.RATE_LIMIT_WRITE_PER_MINUTE,
+    }[route_class]
+
+def get_header(scope, name: bytes) -> Optional[str]:
+    for key, value in scope.get("headers", []):
+        if key == name:
+            return value.decode("latin-1")
+    return None
+
+def get_client_ip(scope) -> str:
+    if settings.RATE_LIMIT_TRUST_PROXY_HEADERS:
+        real_ip = get_header(scope, b"x-real-ip")
+        if real_ip:
+            return real_ip.strip()
+    client = scope.get("client")
+    return client[0] if client else "unknown"
+
+def get_token_subject(scope) -> Optional[str]:
+    """Return the subject of a valid bearer token, without touching the database"""
+    authorization = get_header(scope, b"authorization")
+    if not authorization or not authorization.lower().startswith("bearer "):
+        return None
+    try:
+        payload = jwt.decode(
+            authorization[7:], settings.SECRET_KEY, algorithms=[settings.ALGORITHM]
+        )
+    except JWTError:
+        return None
+    return payload.get("sub")
+
+class LoadSheddingMiddleware:
+    """Rate limit per IP, user and route class, and cap in-flight requests.
+
+    Requests over a rate limit get 429 and requests arriving while
+    MAX_CONCURRENT_REQUESTS are already in flight get 503, both with a
+    Retry-After header, so overload is pushed back to clients instead of
+    queueing in the worker.
+    """
+
+    EXEMPT_PATHS = ("/", "/health", "/metrics")
+    # Long-lived streams are rate limited on connect but not counted as in flight
+    STREAMING_PATHS = ("/api/v1/notifications/stream",)
+
+    def __init__(self, app, limiter: RateLimiter = rate_limiter):
+        self.app = app
+        self.limiter = limiter
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] in self.EXEMPT_PATHS:
+            await self.app(scope, receive, send)
+            return
+
+        stats = self.limiter.stats
+        if stats["in_flight"] >= settings.MAX_CONCURRENT_REQUESTS:
+            stats["shed"] += 1
+            await self._reject(
+                send, 503, "Server is overloaded, please retry", settings.LOAD_SHED_RETRY_AFTER
+            )
+            return
+
+        if settings.RATE_LIMIT_ENABLED:
+            retry_after = await self._check_limits(scope)
+            if retry_after is not None:
+                await self._reject(
+                    send, 429, "Rate limit exceeded", max(1, math.ceil(retry_after))
+                )
+                return
+
+        stats["allowed"] += 1
+        if scope["path"] in self.STREAMING_PATHS:
+            await self.app(scope, receive, send)
+            return
+        stats["in_flight"] += 1
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            stats["in_flight"] -= 1
+
+    async def _check_limits(self, scope) -> Optional[float]:
+        """Return seconds to wait if any bucket is empty, otherwise None"""
+        route_class = get_route_class(scope["method"], scope["path"])
+        limit = get_route_class_limit(route_class)
+        ip = get_client_ip(scope)
+
+        if route_class == "auth":
+            checks = [(f"ip:auth:{ip}", limit)]
+        else:
+            checks = [(f"ip:{ip}", settings.RATE_LIMIT_IP_PER_MINUTE)]
+            subject = get_token_subject(scope)
+            if subject:
+                checks.append((f"user:{route_class}:{subject}", limit))
+
+        for key, per_minute in checks:
+            allowed, retry_after = await self.limiter.hit(key, per_minute)
+            if not allowed:
+                self.limiter.stats[f"limited_{route_class}"] += 1
+                return retry_after
+        return None
+
+    async def _reject(self, send, status_code: int, detail: str, retry_after: int):
+        body = json.dumps({"detail": detail}).encode()
+        await send({
+            "type": "http.response.start",
+            "status": status_code,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                (b"retry-after", str(retry_after).encode()),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
@@ -0,0 +1,101 @@
+import asyncio
+import logging
+import threading
+import time
+import weakref
+from typing import Optional
+
+import redis
+import redis.asyncio as aioredis
+
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+# Seconds to wait before trying Redis again after a failed connection
+RECONNECT_INTERVAL = 30.0
+
+_client: Optional[redis.Redis] = None
+_last_failure: float = 0.0
+_lock = threading.Lock()
+# redis.asyncio clients belong to the event loop that created them
+_async_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, aioredis.Redis]" = weakref.WeakKeyDictionary()
+_async_locks: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Lock]" = weakref.WeakKeyDictionary()
+
+def get_redis() -> Optional[redis.Redis]:
+    """Return a shared Redis client, or None when Redis is unavailable.
+
+    Callers are expected to fall back to an in-process implementation when
+    this returns None. A failed connection is remembered for
+    RECONNECT_INTERVAL seconds so requests don't pay a connect timeout each.
+    """
+    global _client, _last_failure
+
+    if _client is not None:
+        return _client
+    if not settings.REDIS_URL:
+        return None
+    if time.monotonic() - _last_failure < RECONNECT_INTERVAL:
+        return None
+
+    with _lock:
+        if _client is not None:
+            return _client
+        try:
+            client = redis.Redis.from_url(
+                settings.REDIS_URL,
+                socket_connect_timeout=settings.REDIS_CONNECT_TIMEOUT,
+                socket_timeout=settings.REDIS_CONNECT_TIMEOUT,
+            )
+            client.ping()
+        except redis.RedisError as exc:
+            logger.warning("Redis unavailable, using in-process fallback: %s", exc)
+            _last_failure = time.monotonic()
+            return None
+        _client = client
+        return _client
+
+async def get_async_redis() -> Optional[aioredis.Redis]:
+    """Async counterpart of get_redis() for middleware running on the event loop.
+
+    Connecting and every command are awaited, so a slow or unreachable Redis
+    never blocks the loop. Shares get_redis()'s failure back-off.
+    """
+    global _last_failure
+
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is not None:
+        return client
+    if not settings.REDIS_URL:
+        return None
+    if time.monotonic() - _last_failure < RECONNECT_INTERVAL:
+        return None
+
+    lock = _async_locks.setdefault(loop, asyncio.Lock())
+    async with lock:
+        client = _async_clients.get(loop)
+        if client is not None:
+            return client
+        client = aioredis.Redis.from_url(
+            settings.REDIS_URL,
+            socket_connect_timeout=settings.REDIS_CONNECT_TIMEOUT,
+            socket_timeout=settings.REDIS_CONNECT_TIMEOUT,
+        )
+        try:
+            await client.ping()
+        except redis.RedisError as exc:
+            logger.warning("Redis unavailable, using in-process fallback: %s", exc)
+            _last_failure = time.monotonic()
+            await client.aclose()
+            return None
+        _async_clients[loop] = client
+        return client
+
+def mark_redis_failed() -> None:
+    """Drop the shared clients after an error so the next call reconnects later"""
+    global _client, _last_failure
+    with _lock:
+        _client = None
+        _async_clients.clear()
+        _last_failure = time.monotonic()
@@ -1,4 +1,6 @@
 from datetime import datetime, timedelta
+import hashlib
+import secrets
 from typing import Optional, Any
 from jose import JWTError, jwt
 from passlib.context import CryptContext
@@ -28,6 +30,14 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
     encoded_jwt = jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
     return encoded_jwt
 
+def generate_refresh_token() -> str:
+    """Create an opaque, high-entropy refresh token"""
+    return secrets.token_urlsafe(32)
+
+def hash_refresh_token(token: str) -> str:
+    """Hash a refresh token for storage; a fast hash is enough for 256 random bits"""
+    return hashlib.sha256(token.encode()).hexdigest()
+
 def verify_token(token: str) -> dict:
     """Verify and decode JWT token"""
     try:
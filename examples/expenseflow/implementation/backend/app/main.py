@@ -1,8 +1,18 @@
-from fastapi import FastAPI
+from fastapi import Depends, FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from .core.config import settings
 from .core.database import engine, Base
+from .core.encoding import ContentNegotiationMiddleware, NegotiatedResponse
+from .core.idempotency import IdempotencyMiddleware
+from .core.rate_limit import LoadSheddingMiddleware, rate_limiter
+from .models.user import User
+from .api.deps import get_admin_user
 from .api.v1.router import api_router
+from .services.audit import audit_log
+from .services.notifications import notification_hub
+from .services.outbox import outbox_relay
+from .services.receipts import receipt_hasher
+from .services.scheduler import scheduler
 
 # Create database tables
 Base.metadata.create_all(bind=engine)
@@ -10,9 +20,19 @@ Base.metadata.create_all(bind=engine)
 app = FastAPI(
     title=settings.APP_NAME,
     version=settings.VERSION,
-    description="ExpenseFlow API - Complete expense management system"
+    description="ExpenseFlow API - Complete expense management system",
+    default_response_class=NegotiatedResponse
 )
 
+# Replay responses for retried writes carrying an Idempotency-Key
+app.add_middleware(IdempotencyMiddleware)
+
+# Rate limiting and load shedding (added first so CORS headers wrap its 429/503s)
+app.add_middleware(LoadSheddingMiddleware)
+
+# msgpack/JSON negotiation and gzip/brotli compression
+app.add_middleware(ContentNegotiationMiddleware)
+
 # CORS middleware
 app.add_middleware(
     CORSMiddleware,
@@ -25,6 +45,25 @@ app.add_middleware(
 # Include routers
 app.include_router(api_router, prefix="/api/v1")
 
+@app.on_event("startup")
+def start_background_workers():
+    audit_log.start()
+    notification_hub.start()
+    if settings.OUTBOX_RELAY_ENABLED:
+        outbox_relay.start()
+    if settings.RECEIPT_HASHER_ENABLED:
+        receipt_hasher.start()
+    if settings.SCHEDULER_ENABLED:
+        scheduler.start()
+
+@app.on_event("shutdown")
+def stop_background_workers():
+    scheduler.stop()
+    receipt_hasher.stop()
+    outbox_relay.stop()
+    notification_hub.stop()
+    audit_log.stop()
+
 @app.get("/")
 def root():
     """Health check endpoint"""
@@ -41,4 +80,14 @@ def health_check():
         "status": "healthy",
         "version": settings.VERSION,
         "database": "connected"
-    }
\ No newline at end of file
+    }
+
+@app.get("/metrics")
+def metrics(admin: User = Depends(get_admin_user)):
+    """Rate limiter and load shedding counters for this worker (admins only)"""
+    return {
+        "rate_limit": dict(rate_limiter.stats),
+        "max_concurrent_requests": settings.MAX_CONCURRENT_REQUESTS,
+        "notification_connections": notification_hub.connection_count(),
+        "audit_pending": audit_log.pending(),
+    }
@@ -0,0 +1,50 @@
+from sqlalchemy import Column, Integer, DateTime, ForeignKey, UniqueConstraint, func
+from sqlalchemy.orm import relationship
+
+from ..core.database import Base
+from .duplicate import ExpenseDuplicateColumns
+from .expense import ExpenseColumns, ApprovalColumns
+from .policy import PolicyViolationColumns
+
+class ArchivedExpense(ExpenseColumns, Base):
+    """Cold tier: finalized expenses moved out of the hot expenses table"""
+    __tablename__ = "expenses_archive"
+    
+    archived_at = Column(DateTime, server_default=func.now(), nullable=False)
+    
+    # Relationships
+    category = relationship("Category", viewonly=True)
+    approvals = relationship("ArchivedApproval", back_populates="expense", viewonly=True)
+
+class ArchivedApproval(ApprovalColumns, Base):
+    __tablename__ = "approvals_archive"
+    
+    # Foreign keys
+    expense_id = Column(Integer, ForeignKey("expenses_archive.id"), index=True, nullable=False)
+    
+    # Relationships
+    expense = relationship("ArchivedExpense", back_populates="approvals", viewonly=True)
+
+class ArchivedExpenseDuplicate(ExpenseDuplicateColumns, Base):
+    __tablename__ = "expense_duplicates_archive"
+    __table_args__ = (UniqueConstraint("expense_id", "duplicate_of_id", "reason"),)
+    
+    # Either side may still be in the hot table, so these are plain ids
+    expense_id = Column(Integer, index=True, nullable=False)
+    duplicate_of_id = Column(Integer, index=True, nullable=False)
+
+class ArchivedReceiptDuplicate(ExpenseDuplicateColumns, Base):
+    """Receipts reused from an expense that was already archived when the match was found"""
+    __tablename__ = "receipt_duplicates_archive"
+    __table_args__ = (UniqueConstraint("expense_id", "duplicate_of_id", "reason"),)
+    
+    # The archived side has no row in expenses, so these are plain ids
+    expense_id = Column(Integer, index=True, nullable=False)
+    duplicate_of_id = Column(Integer, index=True, nullable=False)
+
+class ArchivedPolicyViolation(PolicyViolationColumns, Base):
+    __tablename__ = "policy_violations_archive"
+    __table_args__ = (UniqueConstraint("expense_id", "rule"),)
+    
+    # Foreign keys
+    expense_id = Column(Integer, ForeignKey("expenses_archive.id"), index=True, nullable=False)
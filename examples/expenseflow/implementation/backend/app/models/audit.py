@@ -0,0 +1,22 @@
+from sqlalchemy import Column, Integer, String, DateTime, Text, Index
+from datetime import datetime
+
+from ..core.database import Base
+
+class AuditEntry(Base):
+    """Append-only record of who did what to which entity"""
+    __tablename__ = "audit_log"
+    __table_args__ = (
+        Index("ix_audit_log_entity", "entity_type", "entity_id", "id"),
+        Index("ix_audit_log_actor", "actor_id", "id"),
+    )
+    
+    id = Column(Integer, primary_key=True)
+    occurred_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    # Not a foreign key: entries must outlive the users and expenses they mention
+    actor_id = Column(Integer, nullable=True)
+    action = Column(String(50), nullable=False)
+    entity_type = Column(String(30), nullable=False)
+    entity_id = Column(Integer, nullable=False)
+    # JSON
+    details = Column(Text, nullable=True)
@@ -0,0 +1,39 @@
+from sqlalchemy import Column, Integer, Float, String, DateTime, ForeignKey, UniqueConstraint
+from sqlalchemy.orm import relationship
+from datetime import datetime
+
+from ..core.database import Base
+
+class ExpenseDuplicateColumns:
+    """Columns shared by the hot expense_duplicates table and its archive"""
+    
+    id = Column(Integer, primary_key=True, index=True)
+    # "description" (Jaccard over hashed shingles) or "receipt" (perceptual hash distance)
+    reason = Column(String(20), default="description", nullable=False)
+    # Similarity, 0..1
+    score = Column(Float, nullable=False)
+    detected_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+class ExpenseDuplicate(ExpenseDuplicateColumns, Base):
+    __tablename__ = "expense_duplicates"
+    __table_args__ = (
+        UniqueConstraint("expense_id", "duplicate_of_id", "reason"),
+        # Never reuse ids, since archived rows keep theirs
+        {"sqlite_autoincrement": True},
+    )
+    
+    # Foreign keys: the later expense and the earlier one it appears to repeat
+    expense_id = Column(Integer, ForeignKey("expenses.id"), index=True, nullable=False)
+    duplicate_of_id = Column(Integer, ForeignKey("expenses.id"), index=True, nullable=False)
+    
+    # Relationships
+    expense = relationship("Expense", foreign_keys=[expense_id])
+    duplicate_of = relationship("Expense", foreign_keys=[duplicate_of_id])
+
+class ScanCheckpoint(Base):
+    """How far an incremental background scan has progressed through a table"""
+    __tablename__ = "scan_checkpoints"
+    
+    name = Column(String(50), primary_key=True)
+    last_id = Column(Integer, default=0, nullable=False)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
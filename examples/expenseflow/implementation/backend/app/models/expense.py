@@ -0,0 +1,125 @@
+from sqlalchemy import Column, Integer, BigInteger, String, Boolean, DateTime, Text, ForeignKey, Index, case
+from sqlalchemy.ext.hybrid import hybrid_property
+from sqlalchemy.orm import relationship, validates
+from datetime import datetime
+
+from ..core.database import Base
+from ..core.money import (
+    CURRENCY_EXPONENTS, DEFAULT_CURRENCY, currency_exponent, from_minor_units, to_minor_units
+)
+
+class Category(Base):
+    __tablename__ = "categories"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    name = Column(String(100), unique=True, index=True, nullable=False)
+    description = Column(Text, nullable=True)
+    is_active = Column(Boolean, default=True, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    
+    # Relationships
+    expenses = relationship("Expense", back_populates="category")
+
+class ExpenseColumns:
+    """Columns shared by the hot expenses table and its archive"""
+    
+    id = Column(Integer, primary_key=True, index=True)
+    # Exact amount in the currency's minor units (cents for USD, yen for JPY)
+    amount_minor = Column(BigInteger, nullable=False)
+    currency = Column(String(3), default="USD", nullable=False)
+    description = Column(Text, nullable=False)
+    expense_date = Column(DateTime, nullable=False)
+    project_code = Column(String(50), nullable=True)
+    business_purpose = Column(Text, nullable=True)
+    status = Column(String(20), default="draft", index=True, nullable=False)
+    receipt_url = Column(String(500), nullable=True)
+    receipt_filename = Column(String(255), nullable=True)
+    # 64-bit perceptual hash of the receipt image (signed), set by the receipt hasher
+    receipt_hash = Column(BigInteger, nullable=True)
+    receipt_hashed_at = Column(DateTime, nullable=True)
+    submitted_at = Column(DateTime, nullable=True)
+    approved_at = Column(DateTime, nullable=True)
+    rejected_at = Column(DateTime, nullable=True)
+    rejection_reason = Column(Text, nullable=True)
+    version = Column(Integer, default=1, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
+    
+    # Foreign keys
+    employee_id = Column(Integer, ForeignKey("users.id"), index=True, nullable=False)
+    category_id = Column(Integer, ForeignKey("categories.id"), nullable=False)
+    
+    @hybrid_property
+    def amount(self):
+        """Amount in major units, as exposed by the API"""
+        if self.amount_minor is None:
+            return None
+        return float(from_minor_units(self.amount_minor, self.currency))
+    
+    @amount.setter
+    def amount(self, value):
+        self.amount_minor = to_minor_units(value, self.currency or DEFAULT_CURRENCY)
+    
+    @amount.expression
+    def amount(cls):
+        divisors = {code: 10.0 ** exponent for code, exponent in CURRENCY_EXPONENTS.items()}
+        return cls.amount_minor / case(divisors, value=cls.currency, else_=100.0)
+    
+    @validates("currency")
+    def validate_currency(self, key, currency):
+        # Keep the same major-unit amount if the minor unit size changes
+        currency = currency.upper()
+        if self.amount_minor is not None and \
+                currency_exponent(currency) != currency_exponent(self.currency):
+            self.amount_minor = to_minor_units(from_minor_units(self.amount_minor, self.currency), currency)
+        return currency
+
+class Expense(ExpenseColumns, Base):
+    __tablename__ = "expenses"
+    __table_args__ = (
+        # Blocking index for duplicate detection: same employee, same amount, nearby date
+        Index("ix_expenses_duplicate_block", "employee_id", "amount_minor", "expense_date"),
+        # Keyset order of the policy sweep, which reads an employee's days together
+        Index("ix_expenses_employee_date", "employee_id", "expense_date", "id"),
+        # Never reuse ids, since archived rows keep theirs
+        {"sqlite_autoincrement": True},
+    )
+    
+    # Claim of a receipt hasher working on this receipt; hot table only
+    receipt_claimed_until = Column(DateTime, nullable=True)
+    
+    # Relationships
+    employee = relationship("User", back_populates="expenses")
+    category = relationship("Category", back_populates="expenses")
+    approvals = relationship("Approval", back_populates="expense", cascade="all, delete-orphan")
+
+class ApprovalColumns:
+    """Columns shared by the hot approvals table and its archive"""
+    
+    id = Column(Integer, primary_key=True, index=True)
+    status = Column(String(20), default="pending", index=True, nullable=False)
+    comments = Column(Text, nullable=True)
+    approved_at = Column(DateTime, nullable=True)
+    # Last reminder sent for an approval that had nobody left to escalate to
+    reminded_at = Column(DateTime, nullable=True)
+    version = Column(Integer, default=1, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
+    
+    # Foreign keys
+    approver_id = Column(Integer, ForeignKey("users.id"), index=True, nullable=False)
+
+class Approval(ApprovalColumns, Base):
+    __tablename__ = "approvals"
+    __table_args__ = (
+        # Stale pending approvals are found oldest first with this index
+        Index("ix_approvals_status_created", "status", "created_at"),
+        {"sqlite_autoincrement": True},
+    )
+    
+    # Foreign keys
+    expense_id = Column(Integer, ForeignKey("expenses.id"), index=True, nullable=False)
+    
+    # Relationships
+    expense = relationship("Expense", back_populates="approvals")
+    approver = relationship("User", foreign_keys="Approval.approver_id")
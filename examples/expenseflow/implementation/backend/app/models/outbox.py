@@ -0,0 +1,19 @@
+from sqlalchemy import Column, Integer, String, DateTime, Text
+from datetime import datetime
+
+from ..core.database import Base
+
+class OutboxEvent(Base):
+    __tablename__ = "outbox_events"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    event_type = Column(String(100), nullable=False)
+    aggregate_type = Column(String(50), nullable=False)
+    aggregate_id = Column(Integer, nullable=False)
+    payload = Column(Text, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    # NULL until the relay has published the event
+    published_at = Column(DateTime, index=True, nullable=True)
+    # Relay currently publishing the event; the claim lapses at claimed_until
+    claimed_by = Column(String(100), nullable=True)
+    claimed_until = Column(DateTime, nullable=True)
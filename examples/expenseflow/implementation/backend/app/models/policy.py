@@ -0,0 +1,48 @@
+from sqlalchemy import Column, Integer, BigInteger, String, Boolean, Date, DateTime, Text, ForeignKey, UniqueConstraint
+from sqlalchemy.orm import relationship
+from datetime import datetime
+
+from ..core.database import Base
+
+class CategoryPolicy(Base):
+    """Spending rules for a category; amounts are minor units of FX_BASE_CURRENCY"""
+    __tablename__ = "category_policies"
+    
+    category_id = Column(Integer, ForeignKey("categories.id"), primary_key=True)
+    # Largest single expense allowed
+    max_amount_minor = Column(BigInteger, nullable=True)
+    # Largest total an employee may claim in this category per calendar day
+    daily_cap_minor = Column(BigInteger, nullable=True)
+    allow_weekends = Column(Boolean, default=True, nullable=False)
+    allow_holidays = Column(Boolean, default=True, nullable=False)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
+    
+    # Relationships
+    category = relationship("Category")
+
+class Holiday(Base):
+    __tablename__ = "holidays"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    day = Column(Date, unique=True, nullable=False)
+    name = Column(String(100), nullable=False)
+
+class PolicyViolationColumns:
+    """Columns shared by the hot policy_violations table and its archive"""
+    
+    id = Column(Integer, primary_key=True, index=True)
+    # category_limit, per_diem, weekend or holiday
+    rule = Column(String(30), nullable=False)
+    message = Column(Text, nullable=False)
+    detected_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+class PolicyViolation(PolicyViolationColumns, Base):
+    __tablename__ = "policy_violations"
+    __table_args__ = (
+        UniqueConstraint("expense_id", "rule"),
+        # Never reuse ids, since archived rows keep theirs
+        {"sqlite_autoincrement": True},
+    )
+    
+    # Foreign keys
+    expense_id = Column(Integer, ForeignKey("expenses.id"), index=True, nullable=False)
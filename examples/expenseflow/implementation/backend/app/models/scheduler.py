@@ -0,0 +1,19 @@
+from sqlalchemy import Column, String, DateTime
+from datetime import datetime
+
+from ..core.database import Base
+
+class SchedulerLease(Base):
+    """Leader lease: the worker named in holder runs scheduled jobs until expires_at"""
+    __tablename__ = "scheduler_leases"
+    
+    name = Column(String(50), primary_key=True)
+    holder = Column(String(100), nullable=False)
+    expires_at = Column(DateTime, nullable=False)
+
+class JobRun(Base):
+    """When each scheduled job last ran, so a new leader doesn't rerun it early"""
+    __tablename__ = "job_runs"
+    
+    name = Column(String(50), primary_key=True)
+    last_run_at = Column(DateTime, default=datetime.utcnow, nullable=False)
@@ -0,0 +1,20 @@
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey
+from datetime import datetime
+
+from ..core.database import Base
+
+class RefreshToken(Base):
+    __tablename__ = "refresh_tokens"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    # SHA-256 of the opaque token; the token itself is never stored
+    token_hash = Column(String(64), unique=True, index=True, nullable=False)
+    # All tokens rotated from the same login share a family
+    family_id = Column(String(32), index=True, nullable=False)
+    expires_at = Column(DateTime, nullable=False)
+    revoked_at = Column(DateTime, nullable=True)
+    replaced_by_id = Column(Integer, ForeignKey("refresh_tokens.id"), nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    
+    # Foreign keys
+    user_id = Column(Integer, ForeignKey("users.id"), index=True, nullable=False)
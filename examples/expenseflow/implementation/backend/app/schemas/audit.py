@@ -0,0 +1,21 @@
+import json
+from pydantic import BaseModel, field_validator
+from typing import Any, Optional
+from datetime import datetime
+
+class AuditEntryResponse(BaseModel):
+    id: int
+    occurred_at: datetime
+    actor_id: Optional[int]
+    action: str
+    entity_type: str
+    entity_id: int
+    details: Optional[Any] = None
+    
+    @field_validator("details", mode="before")
+    @classmethod
+    def parse_details(cls, value):
+        return json.loads(value) if isinstance(value, str) else value
+    
+    class Config:
+        from_attributes = True
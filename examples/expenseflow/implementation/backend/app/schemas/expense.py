@@ -36,6 +36,8 @@ class ExpenseUpdate(BaseModel):
     category_id: Optional[int] = None
     project_code: Optional[str] = None
     business_purpose: Optional[str] = None
+    # Version the client last read; the update is rejected with 409 if it changed
+    version: Optional[int] = None
 
 class ExpenseResponse(ExpenseBase):
     id: int
@@ -47,6 +49,7 @@ class ExpenseResponse(ExpenseBase):
     approved_at: Optional[datetime]
     rejected_at: Optional[datetime]
     rejection_reason: Optional[str]
+    version: int
     created_at: datetime
     updated_at: datetime
     
@@ -56,6 +59,18 @@ class ExpenseResponse(ExpenseBase):
     class Config:
         from_attributes = True
 
+class DuplicateCandidate(BaseModel):
+    expense_id: int
+    status: str
+    description: str
+    expense_date: datetime
+    # Description similarity, 0..1
+    score: float
+
+class ExpenseCreateResponse(ExpenseResponse):
+    # Earlier expenses that look like the same receipt
+    possible_duplicates: List[DuplicateCandidate] = []
+
 class ApprovalBase(BaseModel):
     status: str
     comments: Optional[str] = None
@@ -68,6 +83,7 @@ class ApprovalResponse(ApprovalBase):
     expense_id: int
     approver_id: int
     approved_at: Optional[datetime]
+    version: int
     created_at: datetime
     updated_at: datetime
     
@@ -0,0 +1,35 @@
+from pydantic import BaseModel
+from typing import Optional
+from datetime import date, datetime
+
+class CategoryPolicyUpdate(BaseModel):
+    # Amounts are in FX_BASE_CURRENCY; None means no limit
+    max_amount: Optional[float] = None
+    daily_cap: Optional[float] = None
+    allow_weekends: bool = True
+    allow_holidays: bool = True
+
+class CategoryPolicyResponse(CategoryPolicyUpdate):
+    category_id: int
+    currency: str
+    updated_at: datetime
+
+class HolidayCreate(BaseModel):
+    day: date
+    name: str
+
+class HolidayResponse(HolidayCreate):
+    id: int
+    
+    class Config:
+        from_attributes = True
+
+class PolicyViolationResponse(BaseModel):
+    id: int
+    expense_id: int
+    rule: str
+    message: str
+    detected_at: datetime
+    
+    class Config:
+        from_attributes = True
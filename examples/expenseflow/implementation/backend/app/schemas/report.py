@@ -0,0 +1,14 @@
+from pydantic import BaseModel
+from typing import List
+
+class ReportGroupTotal(BaseModel):
+    group: str
+    total: float
+    count: int
+
+class ExpenseTotalsResponse(BaseModel):
+    currency: str
+    group_by: str
+    total: float
+    count: int
+    groups: List[ReportGroupTotal]
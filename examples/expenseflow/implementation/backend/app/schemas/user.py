@@ -1,5 +1,5 @@
 from pydantic import BaseModel, EmailStr
-from typing import Optional
+from typing import List, Optional
 from datetime import datetime
 
 class UserBase(BaseModel):
@@ -22,6 +22,28 @@ class UserUpdate(BaseModel):
     is_active: Optional[bool] = None
     manager_id: Optional[int] = None
 
+class DirectoryEntry(UserUpdate):
+    """One person in an HR directory snapshot, matched to users by email"""
+    email: EmailStr
+    username: str
+    full_name: str
+    # Managers are referenced by email since HR doesn't know our ids
+    manager_email: Optional[EmailStr] = None
+    # Initial password for new accounts; a random one is set when omitted
+    password: Optional[str] = None
+
+class DirectorySnapshot(BaseModel):
+    users: List[DirectoryEntry]
+    # Deactivate active non-admin users missing from the snapshot
+    deactivate_missing: bool = True
+
+class DirectorySyncResult(BaseModel):
+    created: int
+    updated: int
+    deactivated: int
+    unchanged: int
+    managers_changed: int
+
 class UserResponse(UserBase):
     id: int
     is_active: bool
@@ -40,6 +62,10 @@ class UserLogin(BaseModel):
 class Token(BaseModel):
     access_token: str
     token_type: str = "bearer"
+    refresh_token: Optional[str] = None
+
+class RefreshTokenRequest(BaseModel):
+    refresh_token: str
 
 class TokenData(BaseModel):
     email: Optional[str] = None
\ No newline at end of file
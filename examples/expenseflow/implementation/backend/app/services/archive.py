@@ -0,0 +1,109 @@
+import argparse
+import logging
+from datetime import datetime, timedelta
+from typing import Callable, Optional
+
+from sqlalchemy import delete, insert, or_, select
+from sqlalchemy.orm import Session, sessionmaker
+
+from ..core.config import settings
+from ..core.database import SessionLocal
+from ..models.expense import Expense, Approval
+from ..models.archive import ArchivedExpense, ArchivedApproval, ArchivedExpenseDuplicate, ArchivedPolicyViolation
+from ..models.duplicate import ExpenseDuplicate
+from ..models.policy import PolicyViolation
+
+logger = logging.getLogger(__name__)
+
+# Only finalized expenses move to the cold tier
+FINAL_STATUSES = ("approved", "rejected")
+
+# Columns copied verbatim from the hot tables; archived_at takes its default
+EXPENSE_COLUMNS = [c.name for c in ArchivedExpense.__table__.columns if c.name != "archived_at"]
+APPROVAL_COLUMNS = [c.name for c in ArchivedApproval.__table__.columns]
+DUPLICATE_COLUMNS = [c.name for c in ArchivedExpenseDuplicate.__table__.columns]
+VIOLATION_COLUMNS = [c.name for c in ArchivedPolicyViolation.__table__.columns]
+
+def archive_batch(db: Session, cutoff: datetime, batch_size: int) -> int:
+    """Move one batch of finalized expenses dated before cutoff to the archive.
+
+    Rows are copied with INSERT ... SELECT and deleted by id in the same
+    transaction, dependent rows first, so a batch is either fully moved or
+    not moved at all. Approvals, policy violations and duplicate pairs that
+    involve a moved expense go to their own archive tables. Returns the
+    number of expenses moved.
+    """
+    ids = db.execute(
+        select(Expense.id)
+        .where(Expense.status.in_(FINAL_STATUSES), Expense.expense_date < cutoff)
+        .order_by(Expense.id)
+        .limit(batch_size)
+    ).scalars().all()
+    if not ids:
+        return 0
+
+    db.execute(insert(ArchivedExpense).from_select(
+        EXPENSE_COLUMNS,
+        select(*[getattr(Expense, name) for name in EXPENSE_COLUMNS]).where(Expense.id.in_(ids))
+    ))
+    db.execute(insert(ArchivedApproval).from_select(
+        APPROVAL_COLUMNS,
+        select(*[getattr(Approval, name) for name in APPROVAL_COLUMNS]).where(Approval.expense_id.in_(ids))
+    ))
+    db.execute(insert(ArchivedPolicyViolation).from_select(
+        VIOLATION_COLUMNS,
+        select(*[getattr(PolicyViolation, name) for name in VIOLATION_COLUMNS])
+        .where(PolicyViolation.expense_id.in_(ids))
+    ))
+    involved = or_(ExpenseDuplicate.expense_id.in_(ids), ExpenseDuplicate.duplicate_of_id.in_(ids))
+    db.execute(insert(ArchivedExpenseDuplicate).from_select(
+        DUPLICATE_COLUMNS,
+        select(*[getattr(ExpenseDuplicate, name) for name in DUPLICATE_COLUMNS]).where(involved)
+    ))
+    db.execute(delete(ExpenseDuplicate).where(involved))
+    db.execute(delete(PolicyViolation).where(PolicyViolation.expense_id.in_(ids)))
+    db.execute(delete(Approval).where(Approval.expense_id.in_(ids)))
+    db.execute(delete(Expense).where(Expense.id.in_(ids)))
+    db.commit()
+    return len(ids)
+
+def archive_expenses(
+    session_factory: sessionmaker = SessionLocal,
+    should_continue: Optional[Callable[[], bool]] = None,
+    older_than_days: Optional[int] = None,
+    batch_size: Optional[int] = None,
+    max_batches: Optional[int] = None
+) -> int:
+    """Move finalized expenses older than older_than_days to the archive in batches"""
+    older_than_days = settings.ARCHIVE_AFTER_DAYS if older_than_days is None else older_than_days
+    batch_size = batch_size or settings.ARCHIVE_BATCH_SIZE
+    cutoff = datetime.utcnow() - timedelta(days=older_than_days)
+
+    moved = 0
+    batches = 0
+    while max_batches is None or batches < max_batches:
+        if should_continue is not None and not should_continue():
+            break
+        db = session_factory()
+        try:
+            count = archive_batch(db, cutoff, batch_size)
+        finally:
+            db.close()
+        moved += count
+        batches += 1
+        if count < batch_size:
+            break
+    logger.info("Archived %d expenses dated before %s", moved, cutoff.date())
+    return moved
+
+def main():
+    parser = argparse.ArgumentParser(description="Move old finalized expenses to the archive tables")
+    parser.add_argument("--older-than-days", type=int, default=settings.ARCHIVE_AFTER_DAYS)
+    parser.add_argument("--batch-size", type=int, default=settings.ARCHIVE_BATCH_SIZE)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    archive_expenses(older_than_days=args.older_than_days, batch_size=args.batch_size)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,201 @@
+import fcntl
+import json
+import logging
+import os
+import queue
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import List, Optional
+
+from sqlalchemy import insert, inspect
+from sqlalchemy.orm import sessionmaker
+
+from ..core.config import settings
+from ..core.database import SessionLocal
+from ..models.audit import AuditEntry
+
+logger = logging.getLogger(__name__)
+
+class AuditLog:
+    """Buffered writer for the audit_log table.
+
+    record() never waits on the database: entries go into a bounded
+    in-memory queue that a background thread flushes in batches with one
+    multi-row INSERT. When the queue is full, or a flush fails, entries are
+    appended to a JSONL spill file instead of being dropped or blocking the
+    request, and the spill file is replayed into the table on the next flush.
+    Every worker shares the spill file, so appends and the rename are done
+    under an exclusive file lock, and only one worker replays at a time.
+    """
+
+    def __init__(
+        self,
+        session_factory: sessionmaker = SessionLocal,
+        spill_path: Optional[str] = None,
+        buffer_size: Optional[int] = None,
+        batch_size: Optional[int] = None
+    ):
+        self.session_factory = session_factory
+        self.spill_path = Path(spill_path or settings.AUDIT_SPILL_PATH)
+        self.batch_size = batch_size or settings.AUDIT_FLUSH_BATCH_SIZE
+        self._buffer: "queue.Queue[dict]" = queue.Queue(maxsize=buffer_size or settings.AUDIT_BUFFER_SIZE)
+        self._spill_lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def record(self, actor_id: Optional[int], action: str, entity, details: Optional[dict] = None) -> None:
+        """Queue an entry for action on entity (a model instance) by actor_id"""
+        entry = {
+            "occurred_at": datetime.utcnow(),
+            "actor_id": actor_id,
+            "action": action,
+            "entity_type": type(entity).__name__.lower(),
+            # The identity key doesn't trigger a reload of an expired instance
+            "entity_id": inspect(entity).identity[0],
+            "details": json.dumps(details, default=str) if details else None,
+        }
+        try:
+            self._buffer.put_nowait(entry)
+        except queue.Full:
+            self._spill([entry])
+            return
+        if self._buffer.qsize() >= self.batch_size:
+            self._wake.set()
+
+    def pending(self) -> int:
+        return self._buffer.qsize()
+
+    def flush(self) -> int:
+        """Write spilled and buffered entries to the table; returns how many were written"""
+        with self._flush_lock:
+            written = self._replay_spill()
+            while True:
+                batch = self._take(self.batch_size)
+                if not batch:
+                    return written
+                try:
+                    self._insert(batch)
+                except Exception:
+                    logger.exception("Audit flush failed, spilling %d entries", len(batch))
+                    self._spill(batch)
+                    return written
+                written += len(batch)
+
+    def clear(self) -> None:
+        """Drop buffered entries without writing them"""
+        self._take(None)
+
+    def _take(self, limit: Optional[int]) -> List[dict]:
+        batch = []
+        while limit is None or len(batch) < limit:
+            try:
+                batch.append(self._buffer.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _insert(self, entries: List[dict]) -> None:
+        """Insert entries in one transaction, batch_size rows per statement"""
+        db = self.session_factory()
+        try:
+            for start in range(0, len(entries), self.batch_size):
+                db.execute(insert(AuditEntry), entries[start:start + self.batch_size])
+            db.commit()
+        finally:
+            db.close()
+
+    @contextmanager
+    def _file_lock(self, suffix: str, blocking: bool = True):
+        """Hold an exclusive lock shared with other processes; yields whether we got it"""
+        self.spill_path.parent.mkdir(parents=True, exist_ok=True)
+        with self.spill_path.with_suffix(suffix).open("a") as handle:
+            try:
+                fcntl.flock(handle.fileno(), fcntl.LOCK_EX | (0 if blocking else fcntl.LOCK_NB))
+            except BlockingIOError:
+                yield False
+                return
+            try:
+                yield True
+            finally:
+                fcntl.flock(handle.fileno(), fcntl.LOCK_UN)
+
+    def _spill(self, entries: List[dict]) -> None:
+        lines = "".join(json.dumps(entry, default=str) + "\n" for entry in entries)
+        with self._spill_lock, self._file_lock(".lock"):
+            with self.spill_path.open("a") as handle:
+                handle.write(lines)
+                handle.flush()
+                os.fsync(handle.fileno())
+
+    def _replay_spill(self) -> int:
+        replay_path = self.spill_path.with_suffix(".replay")
+        if not self.spill_path.exists() and not replay_path.exists():
+            return 0
+        # Another worker is replaying; whatever it renamed is its to write
+        with self._file_lock(".replay.lock", blocking=False) as locked:
+            if not locked:
+                return 0
+            return self._replay_locked()
+
+    def _replay_locked(self) -> int:
+        replay_path = self.spill_path.with_suffix(".replay")
+        # A leftover .replay file is from a replay that failed; retry it first
+        if not replay_path.exists():
+            with self._spill_lock, self._file_lock(".lock"):
+                if not self.spill_path.exists():
+                    return 0
+                # Rename so new spills go to a fresh file while we replay
+                self.spill_path.replace(replay_path)
+
+        entries = []
+        with replay_path.open() as handle:
+            for line in handle:
+                if not line.strip():
+                    continue
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # Torn last line from a crash mid-write
+                    logger.warning("Skipping unreadable audit spill line")
+                    continue
+                entry["occurred_at"] = datetime.fromisoformat(entry["occurred_at"])
+                entries.append(entry)
+        try:
+            if entries:
+                self._insert(entries)
+        except Exception:
+            logger.exception("Audit spill replay failed, will retry")
+            return 0
+        replay_path.unlink()
+        return len(entries)
+
+    def run(self) -> None:
+        while not self._stop.is_set():
+            self._wake.wait(settings.AUDIT_FLUSH_INTERVAL)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("Audit flush failed")
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self.run, name="audit-log", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+        # Don't lose what's still buffered on a clean shutdown
+        self.flush()
+
+audit_log = AuditLog()
@@ -0,0 +1,227 @@
+import argparse
+import json
+import logging
+import secrets
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from sqlalchemy import insert, select, update
+from sqlalchemy.orm import Session
+
+from ..core.config import settings
+from ..core.database import SessionLocal
+from ..core.security import get_password_hash
+from ..models.token import RefreshToken
+from ..models.user import User
+from ..schemas.user import DirectoryEntry, DirectorySnapshot
+
+logger = logging.getLogger(__name__)
+
+# Profile fields copied from the snapshot when they are present in an entry
+PROFILE_FIELDS = ("username", "full_name", "department", "position", "phone", "is_active")
+# Placeholder username held by a user while renames are applied
+RENAME_PREFIX = "~directory-sync-"
+
+class DirectorySyncError(Exception):
+    """The snapshot can't be applied; nothing was changed"""
+
+    def __init__(self, problems: List[str]):
+        self.problems = problems
+        super().__init__("; ".join(problems))
+
+def hash_passwords(passwords: List[str], workers: Optional[int] = None) -> List[str]:
+    """bcrypt a list of passwords in a thread pool (bcrypt releases the GIL)"""
+    if not passwords:
+        return []
+    with ThreadPoolExecutor(max_workers=workers or settings.DIRECTORY_SYNC_HASH_WORKERS) as pool:
+        return list(pool.map(get_password_hash, passwords))
+
+def provided_fields(entry: DirectoryEntry) -> Dict[str, object]:
+    """Profile fields present in the entry (is_active: null counts as absent)"""
+    fields = {field: getattr(entry, field) for field in PROFILE_FIELDS if field in entry.model_fields_set}
+    if fields.get("is_active", False) is None:
+        del fields["is_active"]
+    return fields
+
+def chunks(items: list, size: int):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+def find_cycle(managers: Dict[str, Optional[str]]) -> Optional[str]:
+    """Return an email that is its own (indirect) manager, if any"""
+    for start in managers:
+        seen = set()
+        email = start
+        while email is not None and email in managers:
+            if email in seen:
+                return email
+            seen.add(email)
+            email = managers[email]
+    return None
+
+def sync_directory(
+    db: Session,
+    entries: List[DirectoryEntry],
+    deactivate_missing: bool = True,
+    batch_size: Optional[int] = None,
+    hash_workers: Optional[int] = None
+) -> Dict[str, int]:
+    """Make users match an HR directory snapshot.
+
+    Existing users are read once, diffed against the snapshot in memory, and
+    the differences applied as batched INSERTs, executemany UPDATEs and one
+    deactivation UPDATE per batch. Manager links are resolved by email after
+    the inserts and rewired in a single pass. Only new accounts are bcrypt
+    hashed, in a worker pool. Renamed users pass through a placeholder
+    username, so usernames can be swapped within one snapshot. Fields missing
+    from an entry are left as they are. The caller commits; on DirectorySyncError nothing has been written.
+    """
+    batch_size = batch_size or settings.DIRECTORY_SYNC_BATCH_SIZE
+    snapshot = {entry.email.lower(): entry for entry in entries}
+    current = {
+        row.email.lower(): row
+        for row in db.execute(select(
+            User.id, User.email, User.username, User.full_name, User.department, User.position,
+            User.phone, User.is_active, User.is_admin, User.manager_id
+        )).all()
+    }
+    emails_by_id = {row.id: email for email, row in current.items()}
+
+    problems = []
+    if len(snapshot) != len(entries):
+        problems.append("Snapshot lists an email more than once")
+    # Users missing from the snapshot keep their usernames
+    usernames = {row.username: email for email, row in current.items() if email not in snapshot}
+    for email, entry in snapshot.items():
+        if usernames.setdefault(entry.username, email) != email:
+            problems.append(f"Username {entry.username} of {entry.email} is already taken")
+
+    # Desired manager of every user, by email
+    managers = {email: emails_by_id.get(row.manager_id) for email, row in current.items()}
+    for email, entry in snapshot.items():
+        fields = entry.model_fields_set
+        if "manager_email" in fields:
+            manager = entry.manager_email.lower() if entry.manager_email else None
+            if manager is not None and manager not in snapshot and manager not in current:
+                problems.append(f"Manager {entry.manager_email} of {entry.email} is unknown")
+                continue
+            managers[email] = manager
+        elif "manager_id" in fields:
+            if entry.manager_id is not None and entry.manager_id not in emails_by_id:
+                problems.append(f"Manager id {entry.manager_id} of {entry.email} is unknown")
+                continue
+            managers[email] = emails_by_id.get(entry.manager_id)
+        elif email not in current:
+            managers[email] = None
+    cycle = find_cycle(managers)
+    if cycle is not None:
+        problems.append(f"Manager chain of {cycle} loops back to itself")
+    if problems:
+        raise DirectorySyncError(problems)
+
+    # Updates: only users whose provided fields differ
+    updates = []
+    unchanged = 0
+    for email, row in current.items():
+        entry = snapshot.get(email)
+        if entry is None:
+            continue
+        changes = {
+            field: value
+            for field, value in provided_fields(entry).items()
+            if value != getattr(row, field)
+        }
+        if changes:
+            updates.append({"id": row.id, **changes})
+        elif managers[email] == emails_by_id.get(row.manager_id):
+            unchanged += 1
+    # Park renamed users on a placeholder first, so swapped usernames (or a new
+    # account taking a freed one) never collide with a row not yet renamed
+    renames = [
+        {"id": change["id"], "username": f"{RENAME_PREFIX}{change['id']}"}
+        for change in updates if "username" in change
+    ]
+    for batch in chunks(renames, batch_size):
+        db.execute(update(User), batch)
+
+    # Inserts: only new accounts pay for bcrypt
+    new_emails = [email for email in snapshot if email not in current]
+    hashes = hash_passwords(
+        [snapshot[email].password or secrets.token_urlsafe(24) for email in new_emails],
+        hash_workers
+    )
+    new_rows = []
+    for email, hashed_password in zip(new_emails, hashes):
+        entry = snapshot[email]
+        new_rows.append({
+            "email": entry.email,
+            "hashed_password": hashed_password,
+            "is_active": True,
+            **provided_fields(entry)
+        })
+    for batch in chunks(new_rows, batch_size):
+        db.execute(insert(User), batch)
+    for batch in chunks(new_emails, batch_size):
+        for user_id, email in db.execute(select(User.id, User.email).where(User.email.in_(
+            [snapshot[email].email for email in batch]
+        ))):
+            emails_by_id[user_id] = email.lower()
+    ids = {email: user_id for user_id, email in emails_by_id.items()}
+
+    for batch in chunks(updates, batch_size):
+        db.execute(update(User), batch)
+
+    missing = [
+        row.id for email, row in current.items()
+        if deactivate_missing and email not in snapshot and row.is_active and not row.is_admin
+    ]
+    for batch in chunks(missing, batch_size):
+        db.execute(update(User).where(User.id.in_(batch)).values(is_active=False, updated_at=datetime.utcnow()))
+    # Deactivated users lose their sessions too
+    revoked = missing + [change["id"] for change in updates if change.get("is_active") is False]
+    for batch in chunks(revoked, batch_size):
+        db.execute(
+            update(RefreshToken)
+            .where(RefreshToken.user_id.in_(batch), RefreshToken.revoked_at.is_(None))
+            .values(revoked_at=datetime.utcnow())
+        )
+
+    # Manager links, now that every user has an id
+    links = []
+    for email, manager in managers.items():
+        user_id = ids[email]
+        manager_id = ids[manager] if manager is not None else None
+        existing = current.get(email)
+        if (existing.manager_id if existing else None) != manager_id:
+            links.append({"id": user_id, "manager_id": manager_id})
+    for batch in chunks(links, batch_size):
+        db.execute(update(User), batch)
+
+    result = {
+        "created": len(new_rows),
+        "updated": len(updates),
+        "deactivated": len(missing),
+        "unchanged": unchanged,
+        "managers_changed": len(links),
+    }
+    logger.info("Directory sync: %s", result)
+    return result
+
+def main():
+    parser = argparse.ArgumentParser(description="Sync users with an HR directory snapshot (JSON)")
+    parser.add_argument("snapshot", help='File with {"users": [...], "deactivate_missing": true}')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    with open(args.snapshot) as handle:
+        snapshot = DirectorySnapshot.model_validate(json.load(handle))
+    db = SessionLocal()
+    try:
+        sync_directory(db, snapshot.users, snapshot.deactivate_missing)
+        db.commit()
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,229 @@
+import argparse
+import logging
+import re
+import unicodedata
+import zlib
+from collections import defaultdict
+from datetime import timedelta
+from typing import FrozenSet, List, Optional, Tuple
+
+from sqlalchemy import insert, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session, sessionmaker
+
+from ..core.config import settings
+from ..core.database import SessionLocal
+from ..models.expense import Expense
+from ..models.duplicate import ExpenseDuplicate, ScanCheckpoint
+
+logger = logging.getLogger(__name__)
+
+# Character shingles cope with short descriptions ("Uber SFO") better than word shingles
+SHINGLE_SIZE = 4
+CHECKPOINT_NAME = "expense_duplicates"
+
+# Rejected expenses are expected to be resubmitted, so they never count as the original
+IGNORED_STATUSES = ("rejected",)
+
+def normalize_description(text: str) -> str:
+    """Lowercase, strip accents and punctuation, collapse whitespace"""
+    text = unicodedata.normalize("NFKD", text or "")
+    text = "".join(char for char in text if not unicodedata.combining(char)).lower()
+    return " ".join(re.sub(r"[^a-z0-9]+", " ", text).split())
+
+def shingle_hashes(text: str) -> FrozenSet[int]:
+    """Hashed character shingles of the normalized description"""
+    text = normalize_description(text)
+    if len(text) <= SHINGLE_SIZE:
+        return frozenset([zlib.crc32(text.encode())]) if text else frozenset()
+    return frozenset(
+        zlib.crc32(text[i:i + SHINGLE_SIZE].encode())
+        for i in range(len(text) - SHINGLE_SIZE + 1)
+    )
+
+def similarity(a: FrozenSet[int], b: FrozenSet[int]) -> float:
+    """Jaccard similarity of two shingle sets"""
+    if not a and not b:
+        return 1.0
+    return len(a & b) / len(a | b)
+
+def find_duplicates(
+    db: Session,
+    expense: Expense,
+    window_days: Optional[int] = None,
+    threshold: Optional[float] = None
+) -> List[Tuple[Expense, float]]:
+    """Other expenses of the same employee that look like the same receipt.
+
+    Candidates are narrowed with the (employee_id, amount_minor, expense_date)
+    blocking index, so only a handful of rows are ever compared. Returns
+    (expense, score) pairs, most similar first.
+    """
+    window = timedelta(days=settings.DUPLICATE_DATE_WINDOW_DAYS if window_days is None else window_days)
+    threshold = settings.DUPLICATE_SIMILARITY_THRESHOLD if threshold is None else threshold
+
+    query = db.query(Expense).filter(
+        Expense.employee_id == expense.employee_id,
+        Expense.amount_minor == expense.amount_minor,
+        Expense.expense_date.between(expense.expense_date - window, expense.expense_date + window),
+        Expense.currency == expense.currency,
+        Expense.status.notin_(IGNORED_STATUSES)
+    )
+    if expense.id is not None:
+        query = query.filter(Expense.id != expense.id)
+
+    shingles = shingle_hashes(expense.description)
+    matches = []
+    for candidate in query:
+        score = similarity(shingles, shingle_hashes(candidate.description))
+        if score >= threshold:
+            matches.append((candidate, score))
+    matches.sort(key=lambda match: (-match[1], match[0].id))
+    return matches
+
+def record_duplicates(
+    db: Session,
+    pairs: List[Tuple[int, int, float]],
+    reason: str = "description",
+    model=ExpenseDuplicate
+) -> int:
+    """Store (expense_id, other_id, score) pairs that aren't already known in model.
+
+    Pairs are stored once, as the later expense pointing at the earlier one.
+    Pairs that already exist, including ones a concurrent request stored a
+    moment ago, are skipped by the insert itself rather than a prior
+    SELECT. Returns the number of new pairs.
+    """
+    ordered = {}
+    for expense_id, other_id, score in pairs:
+        key = (max(expense_id, other_id), min(expense_id, other_id))
+        ordered[key] = max(score, ordered.get(key, 0.0))
+    if not ordered:
+        return 0
+
+    rows = [
+        {"expense_id": expense_id, "duplicate_of_id": other_id, "reason": reason, "score": score}
+        for (expense_id, other_id), score in ordered.items()
+    ]
+    dialect = {"sqlite": sqlite, "postgresql": postgresql}.get(db.get_bind().dialect.name)
+    if dialect is not None:
+        return len(db.execute(
+            dialect.insert(model)
+            .values(rows)
+            .on_conflict_do_nothing(index_elements=["expense_id", "duplicate_of_id", "reason"])
+            .returning(model.id)
+        ).all())
+
+    # Other databases: one savepoint per pair so a conflict only skips that pair
+    created = 0
+    for row in rows:
+        try:
+            with db.begin_nested():
+                db.execute(insert(model), [row])
+            created += 1
+        except IntegrityError:
+            pass
+    return created
+
+def scan_batch(
+    db: Session,
+    after_id: int,
+    batch_size: int,
+    window_days: Optional[int] = None,
+    threshold: Optional[float] = None
+) -> Tuple[int, int, int]:
+    """Check the next batch of expenses after after_id against earlier ones.
+
+    All candidates for the batch are fetched with a single blocking query and
+    grouped in memory. Returns (last_id, scanned, new_pairs).
+    """
+    window = timedelta(days=settings.DUPLICATE_DATE_WINDOW_DAYS if window_days is None else window_days)
+    threshold = settings.DUPLICATE_SIMILARITY_THRESHOLD if threshold is None else threshold
+
+    columns = (Expense.id, Expense.employee_id, Expense.amount_minor, Expense.currency,
+               Expense.expense_date, Expense.description)
+    batch = db.execute(
+        select(*columns)
+        .where(Expense.id > after_id, Expense.status.notin_(IGNORED_STATUSES))
+        .order_by(Expense.id)
+        .limit(batch_size)
+    ).all()
+    if not batch:
+        return after_id, 0, 0
+
+    last_id = batch[-1].id
+    candidates = db.execute(
+        select(*columns).where(
+            Expense.employee_id.in_({row.employee_id for row in batch}),
+            Expense.amount_minor.in_({row.amount_minor for row in batch}),
+            Expense.expense_date.between(
+                min(row.expense_date for row in batch) - window,
+                max(row.expense_date for row in batch) + window
+            ),
+            Expense.id < last_id,
+            Expense.status.notin_(IGNORED_STATUSES)
+        )
+    ).all()
+    blocks = defaultdict(list)
+    for row in candidates:
+        blocks[(row.employee_id, row.currency, row.amount_minor)].append(row)
+
+    shingles = {}
+    def get_shingles(row):
+        if row.id not in shingles:
+            shingles[row.id] = shingle_hashes(row.description)
+        return shingles[row.id]
+
+    pairs = []
+    for row in batch:
+        for other in blocks.get((row.employee_id, row.currency, row.amount_minor), ()):
+            if other.id >= row.id or abs(other.expense_date - row.expense_date) > window:
+                continue
+            score = similarity(get_shingles(row), get_shingles(other))
+            if score >= threshold:
+                pairs.append((row.id, other.id, score))
+    return last_id, len(batch), record_duplicates(db, pairs)
+
+def scan_duplicates(
+    session_factory: sessionmaker = SessionLocal,
+    batch_size: Optional[int] = None,
+    max_batches: Optional[int] = None
+) -> int:
+    """Incrementally scan expenses added since the last run for duplicates.
+
+    Progress is checkpointed after every batch, so an interrupted scan
+    resumes where it stopped. Returns the number of new duplicate pairs.
+    """
+    batch_size = batch_size or settings.DUPLICATE_SCAN_BATCH_SIZE
+    found = 0
+    batches = 0
+    while max_batches is None or batches < max_batches:
+        db = session_factory()
+        try:
+            checkpoint = db.get(ScanCheckpoint, CHECKPOINT_NAME)
+            if checkpoint is None:
+                checkpoint = ScanCheckpoint(name=CHECKPOINT_NAME, last_id=0)
+                db.add(checkpoint)
+            last_id, scanned, new_pairs = scan_batch(db, checkpoint.last_id, batch_size)
+            checkpoint.last_id = last_id
+            db.commit()
+        finally:
+            db.close()
+        found += new_pairs
+        batches += 1
+        if scanned < batch_size:
+            break
+    logger.info("Duplicate scan found %d new pairs", found)
+    return found
+
+def main():
+    parser = argparse.ArgumentParser(description="Scan expenses added since the last run for likely duplicates")
+    parser.add_argument("--batch-size", type=int, default=settings.DUPLICATE_SCAN_BATCH_SIZE)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    scan_duplicates(batch_size=args.batch_size)
+
+if __name__ == "__main__":
+    main()
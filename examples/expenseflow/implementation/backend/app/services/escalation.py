@@ -0,0 +1,204 @@
+import logging
+import time
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Iterable, Optional, Tuple
+
+from sqlalchemy import or_, select, update
+from sqlalchemy.orm import Session, sessionmaker
+
+from ..core.config import settings
+from ..core.database import SessionLocal
+from ..models.expense import Approval, Expense
+from ..models.user import User
+from .audit import audit_log
+from .outbox import record_events
+
+logger = logging.getLogger(__name__)
+
+def load_chain(db: Session, manager_ids: Iterable[int]) -> Dict[int, Tuple[Optional[int], bool]]:
+    """Map user id -> (manager_id, is_active) for manager_ids and, past inactive
+    managers, their managers in turn. One query per level of the hierarchy."""
+    users: Dict[int, Tuple[Optional[int], bool]] = {}
+    wanted = set(manager_ids)
+    while wanted:
+        rows = db.execute(select(User.id, User.manager_id, User.is_active).where(User.id.in_(wanted))).all()
+        for row in rows:
+            users[row.id] = (row.manager_id, row.is_active)
+        wanted = {
+            row.manager_id for row in rows
+            if not row.is_active and row.manager_id is not None and row.manager_id not in users
+        }
+    return users
+
+def escalation_target(
+    users: Dict[int, Tuple[Optional[int], bool]],
+    manager_id: Optional[int],
+    employee_id: int
+) -> Optional[int]:
+    """First active manager up the chain who isn't the employee themselves"""
+    seen = set()
+    while manager_id is not None and manager_id in users and manager_id not in seen:
+        seen.add(manager_id)
+        next_manager_id, is_active = users[manager_id]
+        if is_active and manager_id != employee_id:
+            return manager_id
+        manager_id = next_manager_id
+    return None
+
+def escalate_stale_approvals(
+    session_factory: sessionmaker = SessionLocal,
+    should_continue: Optional[Callable[[], bool]] = None,
+    now: Optional[datetime] = None,
+    chunk_size: Optional[int] = None,
+    max_chunks: Optional[int] = None,
+    pause: Optional[float] = None
+) -> Dict[str, int]:
+    """Escalate approvals left pending for APPROVAL_ESCALATE_AFTER_HOURS.
+
+    Stale approvals are read oldest first, a chunk at a time, with one query
+    on the (status, created_at) index that also brings along the approver's
+    manager. Each is marked "escalated" and a new pending approval is created
+    for the next active manager up the chain; approvers with nobody above
+    them get a reminder instead, at most once per
+    APPROVAL_REMINDER_INTERVAL_HOURS. Notifications go through the outbox.
+    Every chunk is its own short transaction followed by a pause, so the job
+    never holds locks that request traffic waits on for long. should_continue
+    is checked between chunks (the scheduler passes "still the leader").
+    """
+    now = now or datetime.utcnow()
+    chunk_size = chunk_size or settings.APPROVAL_ESCALATION_CHUNK_SIZE
+    max_chunks = max_chunks or settings.APPROVAL_ESCALATION_MAX_CHUNKS
+    pause = settings.SCHEDULER_CHUNK_PAUSE if pause is None else pause
+    stale_before = now - timedelta(hours=settings.APPROVAL_ESCALATE_AFTER_HOURS)
+    remind_before = now - timedelta(hours=settings.APPROVAL_REMINDER_INTERVAL_HOURS)
+
+    result = {"escalated": 0, "reminded": 0}
+    db = session_factory()
+    try:
+        for chunk in range(max_chunks):
+            if should_continue is not None and not should_continue():
+                break
+            if chunk and pause:
+                time.sleep(pause)
+            rows = db.execute(
+                select(
+                    Approval.id, Approval.expense_id, Approval.approver_id, Approval.created_at,
+                    Expense.employee_id, User.manager_id
+                )
+                .join(Expense, Expense.id == Approval.expense_id)
+                .join(User, User.id == Approval.approver_id)
+                .where(
+                    Approval.status == "pending",
+                    Approval.created_at < stale_before,
+                    or_(Approval.reminded_at.is_(None), Approval.reminded_at < remind_before)
+                )
+                .order_by(Approval.created_at, Approval.id)
+                .limit(chunk_size)
+                .with_for_update(skip_locked=True, of=Approval)
+            ).all()
+            if not rows:
+                db.rollback()
+                break
+
+            users = load_chain(db, {row.manager_id for row in rows if row.manager_id is not None})
+            targets = {row.id: escalation_target(users, row.manager_id, row.employee_id) for row in rows}
+            escalated, reminded = escalate_chunk(db, rows, targets, now)
+            # Read while flushed; after the commit every access would reload the row
+            audited = [
+                (approval, {"expense_id": approval.expense_id, "escalated_from": previous_id})
+                for approval, previous_id in escalated
+            ]
+            db.commit()
+            result["escalated"] += len(escalated)
+            result["reminded"] += reminded
+            for approval, details in audited:
+                audit_log.record(None, "approval.escalated", approval, details)
+            if len(rows) < chunk_size:
+                break
+        if result["escalated"] or result["reminded"]:
+            logger.info("Approval escalation: %s", result)
+        return result
+    finally:
+        db.close()
+
+def escalate_chunk(db: Session, rows, targets: Dict[int, Optional[int]], now: datetime):
+    """Apply one chunk in bulk; returns ([(new approval, old approval id)], reminders sent)"""
+    by_id = {row.id: row for row in rows}
+
+    # Rows approved or rejected since they were read are skipped by the status guard
+    escalate_ids = [row.id for row in rows if targets[row.id] is not None]
+    escalated_ids = []
+    if escalate_ids:
+        escalated_ids = db.execute(
+            update(Approval)
+            .where(Approval.id.in_(escalate_ids), Approval.status == "pending")
+            .values(status="escalated", version=Approval.version + 1, updated_at=now)
+            .returning(Approval.id)
+        ).scalars().all()
+    if escalated_ids:
+        # The approvals list is part of the expense, so its validators must change too
+        db.execute(
+            update(Expense)
+            .where(Expense.id.in_({by_id[approval_id].expense_id for approval_id in escalated_ids}))
+            .values(version=Expense.version + 1, updated_at=now)
+        )
+
+    # Managers may already be approvers on the same expense
+    already_pending = set()
+    if escalated_ids:
+        already_pending = set(db.execute(
+            select(Approval.expense_id, Approval.approver_id).where(
+                Approval.expense_id.in_({by_id[approval_id].expense_id for approval_id in escalated_ids}),
+                Approval.status == "pending"
+            )
+        ).all())
+    created = []
+    for approval_id in escalated_ids:
+        row = by_id[approval_id]
+        key = (row.expense_id, targets[approval_id])
+        if key in already_pending:
+            continue
+        already_pending.add(key)
+        created.append((
+            Approval(
+                expense_id=row.expense_id,
+                approver_id=targets[approval_id],
+                status="pending",
+                comments=f"Escalated from approval {approval_id}"
+            ),
+            approval_id
+        ))
+    db.add_all([approval for approval, _ in created])
+    db.flush()
+    record_events(db, "approval.escalated", "approval", [
+        (approval.id, {
+            "expense_id": approval.expense_id,
+            "employee_id": by_id[previous_id].employee_id,
+            "approval_id": approval.id,
+            "approver_id": approval.approver_id,
+            "previous_approval_id": previous_id,
+            "previous_approver_id": by_id[previous_id].approver_id
+        })
+        for approval, previous_id in created
+    ])
+
+    remind_ids = [row.id for row in rows if targets[row.id] is None]
+    reminded_ids = []
+    if remind_ids:
+        # reminded_at doesn't change the approval, so the version stays put
+        reminded_ids = db.execute(
+            update(Approval)
+            .where(Approval.id.in_(remind_ids), Approval.status == "pending")
+            .values(reminded_at=now)
+            .returning(Approval.id)
+        ).scalars().all()
+    record_events(db, "approval.reminder", "approval", [
+        (approval_id, {
+            "expense_id": by_id[approval_id].expense_id,
+            "approval_id": approval_id,
+            "approver_id": by_id[approval_id].approver_id,
+            "pending_since": by_id[approval_id].created_at
+        })
+        for approval_id in reminded_ids
+    ])
+    return created, len(reminded_ids)
@@ -0,0 +1,107 @@
+import csv
+import threading
+from datetime import date, datetime
+from pathlib import Path
+from typing import Dict, Iterable, Optional, Tuple
+
+import numpy as np
+
+from ..core.config import settings
+
+class FxRateNotFound(Exception):
+    """No rate is known for a currency on or before the requested date"""
+
+    def __init__(self, currency: str, on: Optional[date] = None):
+        self.currency = currency
+        self.on = on
+        when = f" on or before {on}" if on else ""
+        super().__init__(f"No FX rate for {currency}{when}")
+
+def to_days(values) -> np.ndarray:
+    """Convert dates/datetimes to int64 days since the epoch"""
+    return np.asarray(values, dtype="datetime64[D]").astype(np.int64)
+
+class FxRateTable:
+    """Date-indexed FX rates held in memory.
+
+    Rates are quoted as units of currency per one unit of the base currency.
+    Each currency keeps a sorted array of effective dates, so the rate for any
+    date is the latest one on or before it, found with a binary search that
+    numpy runs over a whole column of dates at once.
+    """
+
+    def __init__(self, base_currency: str, rates: Dict[str, Tuple[np.ndarray, np.ndarray]]):
+        self.base_currency = base_currency
+        self._rates = rates
+
+    @classmethod
+    def from_rows(cls, base_currency: str, rows: Iterable[Tuple[date, str, float]]) -> "FxRateTable":
+        grouped: Dict[str, Dict[date, float]] = {}
+        for day, currency, rate in rows:
+            grouped.setdefault(currency.upper(), {})[day] = float(rate)
+        rates = {}
+        for currency, by_day in grouped.items():
+            days = sorted(by_day)
+            rates[currency] = (to_days(days), np.array([by_day[d] for d in days], dtype=np.float64))
+        return cls(base_currency.upper(), rates)
+
+    def rate(self, currency: str, on: date) -> float:
+        return float(self.rates_for(currency, to_days([on]))[0])
+
+    def rates_for(self, currency: str, days: np.ndarray) -> np.ndarray:
+        """Rates for one currency across an array of days"""
+        currency = currency.upper()
+        if currency == self.base_currency:
+            return np.ones(len(days), dtype=np.float64)
+        if currency not in self._rates:
+            raise FxRateNotFound(currency)
+        rate_days, rates = self._rates[currency]
+        index = np.searchsorted(rate_days, days, side="right") - 1
+        if len(index) and index.min() < 0:
+            earliest = days[index < 0].min()
+            raise FxRateNotFound(currency, np.datetime64(int(earliest), "D").item())
+        return rates[index]
+
+def load_rate_files(directory: Path, base_currency: str) -> FxRateTable:
+    """Read every CSV in directory with columns date,currency,rate"""
+    rows = []
+    for path in sorted(directory.glob("*.csv")):
+        with path.open(newline="") as handle:
+            for record in csv.DictReader(handle):
+                rows.append((
+                    datetime.strptime(record["date"], "%Y-%m-%d").date(),
+                    record["currency"].strip(),
+                    record["rate"]
+                ))
+    return FxRateTable.from_rows(base_currency, rows)
+
+class FxRateCache:
+    """Loads rate files once and reloads them only when a file changes"""
+
+    def __init__(self, directory: Optional[str] = None, base_currency: Optional[str] = None):
+        self.directory = Path(directory or settings.FX_RATES_DIR)
+        self.base_currency = base_currency or settings.FX_BASE_CURRENCY
+        self._table: Optional[FxRateTable] = None
+        self._signature = None
+        self._lock = threading.Lock()
+
+    def _current_signature(self):
+        if not self.directory.is_dir():
+            return ()
+        return tuple(
+            (path.name, path.stat().st_mtime_ns, path.stat().st_size)
+            for path in sorted(self.directory.glob("*.csv"))
+        )
+
+    def get(self) -> FxRateTable:
+        signature = self._current_signature()
+        with self._lock:
+            if self._table is None or signature != self._signature:
+                if signature:
+                    self._table = load_rate_files(self.directory, self.base_currency)
+                else:
+                    self._table = FxRateTable(self.base_currency, {})
+                self._signature = signature
+            return self._table
+
+fx_rates = FxRateCache()
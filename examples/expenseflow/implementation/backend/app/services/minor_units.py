@@ -0,0 +1,64 @@
+import argparse
+import logging
+from typing import Optional
+
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Engine
+
+from ..core.database import engine as default_engine
+from ..core.money import to_minor_units
+
+logger = logging.getLogger(__name__)
+
+def migrate_amounts(engine: Optional[Engine] = None, batch_size: int = 1000) -> int:
+    """Move expenses from the old float amount column to integer amount_minor.
+
+    Databases created before amounts were stored in minor units still have
+    expenses.amount (FLOAT NOT NULL) and no amount_minor, and create_all
+    doesn't alter existing tables. This adds amount_minor, fills it batch by
+    batch with each row's amount rounded half-up to its currency's minor
+    unit, then drops amount. Batches commit as they go, so an interrupted
+    run picks up where it stopped. Returns the number of rows converted.
+    """
+    engine = engine or default_engine
+    columns = {column["name"] for column in inspect(engine).get_columns("expenses")}
+    if "amount" not in columns:
+        logger.info("expenses.amount is already gone, nothing to migrate")
+        return 0
+    if "amount_minor" not in columns:
+        with engine.begin() as connection:
+            connection.execute(text("ALTER TABLE expenses ADD COLUMN amount_minor BIGINT"))
+
+    converted = 0
+    while True:
+        with engine.begin() as connection:
+            rows = connection.execute(text(
+                "SELECT id, amount, currency FROM expenses "
+                "WHERE amount_minor IS NULL ORDER BY id LIMIT :limit"
+            ), {"limit": batch_size}).all()
+            if not rows:
+                break
+            connection.execute(
+                text("UPDATE expenses SET amount_minor = :amount_minor WHERE id = :id"),
+                [{"id": row.id, "amount_minor": to_minor_units(row.amount, row.currency)} for row in rows]
+            )
+        converted += len(rows)
+
+    with engine.begin() as connection:
+        # New rows no longer set amount, so its NOT NULL would reject them
+        connection.execute(text("ALTER TABLE expenses DROP COLUMN amount"))
+        if engine.dialect.name != "sqlite":
+            connection.execute(text("ALTER TABLE expenses ALTER COLUMN amount_minor SET NOT NULL"))
+    logger.info("Converted %d expense amounts to minor units", converted)
+    return converted
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert expenses.amount (float) to amount_minor (integer minor units)")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    migrate_amounts(batch_size=args.batch_size)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+import asyncio
+import json
+import logging
+import threading
+from typing import Dict, Iterable, List, Set, Tuple
+
+import redis
+
+from ..core.config import settings
+from ..core.redis import RECONNECT_INTERVAL, get_redis, mark_redis_failed
+from . import outbox
+
+logger = logging.getLogger(__name__)
+
+Listener = Tuple[asyncio.AbstractEventLoop, asyncio.Queue]
+
+def get_recipients(message: dict) -> Set[int]:
+    """Users who should hear about an expense event: the employee and the approver"""
+    payload = message["payload"]
+    return {
+        user_id
+        for user_id in (payload.get("employee_id"), payload.get("approver_id"))
+        if user_id is not None
+    }
+
+class NotificationHub:
+    """Push expense events to the connected users they concern.
+
+    Relayed outbox events are published on a Redis pub/sub channel so every
+    worker can deliver them to its own connections. Without Redis, events are
+    delivered only to connections held by the worker that relayed them.
+    """
+
+    def __init__(self, channel: str = None):
+        self.channel = channel or settings.NOTIFICATION_CHANNEL
+        self._listeners: Dict[int, List[Listener]] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._subscribed = False
+
+    def connect(self, user_id: int) -> asyncio.Queue:
+        """Register a connection for user_id; events arrive on the returned queue"""
+        queue = asyncio.Queue(maxsize=settings.NOTIFICATION_QUEUE_SIZE)
+        with self._lock:
+            self._listeners.setdefault(user_id, []).append((asyncio.get_running_loop(), queue))
+        return queue
+
+    def disconnect(self, user_id: int, queue: asyncio.Queue) -> None:
+        with self._lock:
+            listeners = [entry for entry in self._listeners.get(user_id, []) if entry[1] is not queue]
+            if listeners:
+                self._listeners[user_id] = listeners
+            else:
+                self._listeners.pop(user_id, None)
+
+    def connection_count(self) -> int:
+        with self._lock:
+            return sum(len(listeners) for listeners in self._listeners.values())
+
+    def handle_event(self, message: dict) -> None:
+        """Outbox subscriber: fan the event out to its recipients"""
+        self.publish(get_recipients(message), message)
+
+    def publish(self, user_ids: Iterable[int], message: dict) -> None:
+        user_ids = sorted(user_ids)
+        if not user_ids:
+            return
+        # Only go through Redis when our own listener will hear the message back
+        client = get_redis() if self._subscribed else None
+        if client is not None:
+            try:
+                client.publish(self.channel, json.dumps({"user_ids": user_ids, "message": message}))
+                return
+            except redis.RedisError:
+                mark_redis_failed()
+        self.deliver(user_ids, message)
+
+    def deliver(self, user_ids: Iterable[int], message: dict) -> None:
+        """Hand message to this worker's connections for user_ids"""
+        with self._lock:
+            targets = [entry for user_id in user_ids for entry in self._listeners.get(user_id, [])]
+        for loop, queue in targets:
+            loop.call_soon_threadsafe(self._put, queue, message)
+
+    @staticmethod
+    def _put(queue: asyncio.Queue, message: dict) -> None:
+        try:
+            queue.put_nowait(message)
+        except asyncio.QueueFull:
+            # A slow client shouldn't hold memory; it can resync with a GET
+            logger.warning("Dropping notification for a slow client")
+
+    def _listen(self) -> None:
+        while not self._stop.is_set():
+            client = get_redis()
+            if client is None:
+                self._stop.wait(RECONNECT_INTERVAL)
+                continue
+            pubsub = client.pubsub(ignore_subscribe_messages=True)
+            try:
+                pubsub.subscribe(self.channel)
+                self._subscribed = True
+                while not self._stop.is_set():
+                    item = pubsub.get_message(timeout=1.0)
+                    if item is None:
+                        continue
+                    data = json.loads(item["data"])
+                    self.deliver(data["user_ids"], data["message"])
+            except redis.RedisError:
+                mark_redis_failed()
+            finally:
+                self._subscribed = False
+                pubsub.close()
+
+    def start(self) -> None:
+        outbox.subscribe(self.handle_event)
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._listen, name="notification-hub", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        outbox.unsubscribe(self.handle_event)
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+notification_hub = NotificationHub()
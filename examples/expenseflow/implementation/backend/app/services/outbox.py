@@ -0,0 +1,235 @@
+import json
+import logging
+import os
+import socket
+import threading
+import uuid
+from datetime import datetime, timedelta
+from typing import Callable, List, Optional, Tuple
+
+import redis
+from sqlalchemy import delete, insert, or_, select, update
+from sqlalchemy.orm import Session, sessionmaker
+
+from ..core.config import settings
+from ..core.database import SessionLocal
+from ..core.redis import get_redis, mark_redis_failed
+from ..models.outbox import OutboxEvent
+
+logger = logging.getLogger(__name__)
+
+EventHandler = Callable[[dict], None]
+
+_subscribers: List[EventHandler] = []
+
+def record_event(db: Session, event_type: str, aggregate, payload: dict) -> OutboxEvent:
+    """Add an event to the outbox in the caller's transaction.
+
+    The event is only visible to the relay once the caller commits, so it is
+    published if and only if the state change it describes was persisted.
+    """
+    event = OutboxEvent(
+        event_type=event_type,
+        aggregate_type=type(aggregate).__name__.lower(),
+        aggregate_id=aggregate.id,
+        payload=json.dumps(payload, default=str)
+    )
+    db.add(event)
+    return event
+
+def record_events(db: Session, event_type: str, aggregate_type: str, events: List[Tuple[int, dict]]) -> None:
+    """Add many (aggregate_id, payload) events to the outbox with one INSERT"""
+    if events:
+        db.execute(insert(OutboxEvent), [
+            {
+                "event_type": event_type,
+                "aggregate_type": aggregate_type,
+                "aggregate_id": aggregate_id,
+                "payload": json.dumps(payload, default=str),
+            }
+            for aggregate_id, payload in events
+        ])
+
+def subscribe(handler: EventHandler) -> None:
+    """Register an in-process consumer called for every relayed event"""
+    _subscribers.append(handler)
+
+def unsubscribe(handler: EventHandler) -> None:
+    if handler in _subscribers:
+        _subscribers.remove(handler)
+
+def to_message(event: OutboxEvent) -> dict:
+    return {
+        "id": event.id,
+        "type": event.event_type,
+        "aggregate_type": event.aggregate_type,
+        "aggregate_id": event.aggregate_id,
+        "created_at": event.created_at.isoformat(),
+        "payload": json.loads(event.payload),
+    }
+
+class OutboxRelay:
+    """Publish committed outbox events in batches.
+
+    Every worker runs a relay. A batch is claimed with a compare-and-set
+    UPDATE on claimed_by/claimed_until, which works on any database, so two
+    relays never publish the same event. A claim left by a crashed relay
+    lapses after OUTBOX_CLAIM_SECONDS. When Redis is configured, each batch is
+    first appended to the stream OUTBOX_STREAM for out-of-process consumers;
+    while Redis is unreachable nothing is published, and a batch whose XADD
+    fails is released for the next attempt, so no event is marked published
+    without reaching the stream. The batch is then dispatched to in-process
+    subscribers and marked published with one UPDATE. Delivery is at-least-once: a crash between publishing
+    and marking replays the batch, so consumers should de-duplicate on the
+    event id.
+    """
+
+    def __init__(self, session_factory: sessionmaker = SessionLocal, batch_size: Optional[int] = None):
+        self.session_factory = session_factory
+        self.batch_size = batch_size or settings.OUTBOX_BATCH_SIZE
+        self.relay_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def claim(self, db: Session) -> List[int]:
+        """Claim up to batch_size unpublished events; returns the ids we got"""
+        now = datetime.utcnow()
+        claimable = (
+            OutboxEvent.published_at.is_(None),
+            or_(OutboxEvent.claimed_until.is_(None), OutboxEvent.claimed_until < now),
+        )
+        candidates = db.execute(
+            select(OutboxEvent.id)
+            .where(*claimable)
+            .order_by(OutboxEvent.id)
+            .limit(self.batch_size)
+        ).scalars().all()
+        if not candidates:
+            return []
+        # Rows another relay claimed since the SELECT fail the WHERE and are skipped
+        claimed = db.execute(
+            update(OutboxEvent)
+            .where(OutboxEvent.id.in_(candidates), *claimable)
+            .values(
+                claimed_by=self.relay_id,
+                claimed_until=now + timedelta(seconds=settings.OUTBOX_CLAIM_SECONDS)
+            )
+            .returning(OutboxEvent.id)
+        ).scalars().all()
+        db.commit()
+        return claimed
+
+    def relay_once(self) -> int:
+        """Publish one batch of pending events; returns how many were published"""
+        stream = None
+        if settings.REDIS_URL and settings.OUTBOX_STREAM:
+            stream = get_redis()
+            if stream is None:
+                # Hold events back until they can reach the stream too
+                return 0
+        db = self.session_factory()
+        try:
+            ids = self.claim(db)
+            if not ids:
+                return 0
+            events = db.query(OutboxEvent).filter(OutboxEvent.id.in_(ids)).order_by(OutboxEvent.id).all()
+
+            messages = [to_message(event) for event in events]
+            if stream is not None:
+                try:
+                    self._publish_to_stream(stream, messages)
+                except redis.RedisError:
+                    mark_redis_failed()
+                    self.release(db, ids)
+                    raise
+            for message in messages:
+                for handler in list(_subscribers):
+                    try:
+                        handler(message)
+                    except Exception:
+                        logger.exception("Outbox subscriber failed for event %s", message["id"])
+
+            db.query(OutboxEvent).filter(
+                OutboxEvent.id.in_(ids),
+                OutboxEvent.claimed_by == self.relay_id
+            ).update({"published_at": datetime.utcnow()}, synchronize_session=False)
+            db.commit()
+            return len(events)
+        finally:
+            db.close()
+
+    def release(self, db: Session, ids: List[int]) -> None:
+        """Give up our claim on ids so the next attempt can take them straight away"""
+        db.rollback()
+        db.execute(
+            update(OutboxEvent)
+            .where(OutboxEvent.id.in_(ids), OutboxEvent.claimed_by == self.relay_id)
+            .values(claimed_by=None, claimed_until=None)
+        )
+        db.commit()
+
+    def _publish_to_stream(self, client: redis.Redis, messages: List[dict]) -> None:
+        pipeline = client.pipeline(transaction=False)
+        for message in messages:
+            pipeline.xadd(
+                settings.OUTBOX_STREAM,
+                {"event": json.dumps(message)},
+                maxlen=settings.OUTBOX_STREAM_MAXLEN,
+                approximate=True,
+            )
+        pipeline.execute()
+
+    def run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                published = self.relay_once()
+            except Exception:
+                logger.exception("Outbox relay batch failed, retrying")
+                published = 0
+            # Drain backlogs without waiting; sleep only when caught up
+            if published < self.batch_size:
+                self._stop.wait(settings.OUTBOX_POLL_INTERVAL)
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self.run, name="outbox-relay", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+def prune_published(
+    session_factory: sessionmaker = SessionLocal,
+    should_continue: Optional[Callable[[], bool]] = None,
+    batch_size: Optional[int] = None
+) -> int:
+    """Delete events published more than OUTBOX_RETENTION_HOURS ago, a batch per transaction"""
+    batch_size = batch_size or settings.OUTBOX_BATCH_SIZE
+    cutoff = datetime.utcnow() - timedelta(hours=settings.OUTBOX_RETENTION_HOURS)
+    deleted = 0
+    db = session_factory()
+    try:
+        while should_continue is None or should_continue():
+            ids = db.execute(
+                select(OutboxEvent.id)
+                .where(OutboxEvent.published_at < cutoff)
+                .order_by(OutboxEvent.id)
+                .limit(batch_size)
+            ).scalars().all()
+            if not ids:
+                break
+            db.execute(delete(OutboxEvent).where(OutboxEvent.id.in_(ids)))
+            db.commit()
+            deleted += len(ids)
+        if deleted:
+            logger.info("Pruned %d published outbox events", deleted)
+        return deleted
+    finally:
+        db.close()
+
+outbox_relay = OutboxRelay()
@@ -0,0 +1,266 @@
+import argparse
+import logging
+from datetime import date, timedelta
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+from sqlalchemy import delete, insert, or_, select, tuple_
+from sqlalchemy.orm import Session, sessionmaker
+
+from ..core.config import settings
+from ..core.database import SessionLocal
+from ..core.money import from_minor_units
+from ..models.expense import Expense
+from ..models.policy import CategoryPolicy, Holiday, PolicyViolation
+from .fx import FxRateNotFound, FxRateTable, fx_rates, to_days
+from .reports import convert_minor_units
+
+logger = logging.getLogger(__name__)
+
+# Expenses that count towards per-diem caps
+COUNTED_STATUSES = ("submitted", "approved")
+
+# Keep IN (...) lists well under database parameter limits
+WRITE_BATCH_SIZE = 5000
+
+Violation = Tuple[int, str, str]
+
+class PolicySet:
+    """Category rules and holidays laid out as arrays indexed by category id.
+
+    evaluate() checks every rule over whole columns at once, so the same code
+    serves a single expense at submit time and 50k-row chunks in the sweep.
+    """
+
+    def __init__(self, policies: Sequence[CategoryPolicy], holidays: Iterable[date], base_currency: str):
+        size = max([policy.category_id for policy in policies], default=0) + 1
+        # -1 means the category has no such limit
+        self.max_amount = np.full(size, -1, dtype=np.int64)
+        self.daily_cap = np.full(size, -1, dtype=np.int64)
+        self.allow_weekends = np.ones(size, dtype=bool)
+        self.allow_holidays = np.ones(size, dtype=bool)
+        for policy in policies:
+            if policy.max_amount_minor is not None:
+                self.max_amount[policy.category_id] = policy.max_amount_minor
+            if policy.daily_cap_minor is not None:
+                self.daily_cap[policy.category_id] = policy.daily_cap_minor
+            self.allow_weekends[policy.category_id] = policy.allow_weekends
+            self.allow_holidays[policy.category_id] = policy.allow_holidays
+        self.holidays = np.sort(to_days(list(holidays)))
+        self.base_currency = base_currency
+
+    @classmethod
+    def load(
+        cls,
+        db: Session,
+        category_ids: Optional[Iterable[int]] = None,
+        days: Optional[Tuple[date, date]] = None
+    ) -> "PolicySet":
+        """Load rules, optionally only those for category_ids and holidays within days"""
+        policies = db.query(CategoryPolicy)
+        if category_ids is not None:
+            policies = policies.filter(CategoryPolicy.category_id.in_(list(category_ids)))
+        holidays = db.query(Holiday.day)
+        if days is not None:
+            holidays = holidays.filter(Holiday.day.between(*days))
+        return cls(policies.all(), [day for day, in holidays], settings.FX_BASE_CURRENCY)
+
+    def _lookup(self, values: np.ndarray, category_ids: np.ndarray, default) -> np.ndarray:
+        known = category_ids < len(values)
+        result = np.full(len(category_ids), default, dtype=values.dtype)
+        result[known] = values[category_ids[known]]
+        return result
+
+    def evaluate(
+        self,
+        ids: np.ndarray,
+        employee_ids: np.ndarray,
+        category_ids: np.ndarray,
+        amounts: np.ndarray,
+        days: np.ndarray,
+        check: Optional[np.ndarray] = None
+    ) -> List[Violation]:
+        """Return (expense_id, rule, message) for every broken rule.
+
+        amounts are in base currency minor units, -1 where they couldn't be
+        converted (those rows skip the amount rules). All rows count towards
+        per-diem totals; only rows where check is true are reported.
+        """
+        check = np.ones(len(ids), dtype=bool) if check is None else check
+        priced = amounts >= 0
+        violations: List[Violation] = []
+
+        max_amount = self._lookup(self.max_amount, category_ids, -1)
+        over_limit = check & priced & (max_amount >= 0) & (amounts > max_amount)
+        for i in np.flatnonzero(over_limit):
+            violations.append((int(ids[i]), "category_limit",
+                               f"Amount {self._format(amounts[i])} exceeds the category limit of {self._format(max_amount[i])}"))
+
+        daily_cap = self._lookup(self.daily_cap, category_ids, -1)
+        capped = (daily_cap >= 0) & priced
+        if capped.any():
+            keys = np.stack([employee_ids[capped], category_ids[capped], days[capped]], axis=1)
+            _, group = np.unique(keys, axis=0, return_inverse=True)
+            group = group.reshape(-1)
+            totals = np.bincount(group, weights=amounts[capped]).astype(np.int64)
+            day_totals = np.full(len(ids), -1, dtype=np.int64)
+            day_totals[capped] = totals[group]
+            over_cap = check & capped & (day_totals > daily_cap)
+            for i in np.flatnonzero(over_cap):
+                violations.append((int(ids[i]), "per_diem",
+                                   f"Daily total {self._format(day_totals[i])} exceeds the per-diem cap of {self._format(daily_cap[i])}"))
+
+        # 1970-01-01 was a Thursday, so Monday is 0 and Saturday/Sunday are 5/6
+        weekend = (days + 3) % 7 >= 5
+        for i in np.flatnonzero(check & weekend & ~self._lookup(self.allow_weekends, category_ids, True)):
+            violations.append((int(ids[i]), "weekend", "Expenses in this category are not allowed on weekends"))
+
+        holiday = np.isin(days, self.holidays)
+        for i in np.flatnonzero(check & holiday & ~self._lookup(self.allow_holidays, category_ids, True)):
+            violations.append((int(ids[i]), "holiday", "Expenses in this category are not allowed on holidays"))
+
+        return violations
+
+    def _format(self, amount_minor) -> str:
+        return f"{from_minor_units(int(amount_minor), self.base_currency):.2f} {self.base_currency}"
+
+def to_base_currency(
+    amounts: np.ndarray,
+    currencies: np.ndarray,
+    days: np.ndarray,
+    base_currency: str,
+    rates: FxRateTable
+) -> np.ndarray:
+    """Convert minor-unit amounts to base_currency, -1 where no rate is known"""
+    converted = np.full(len(amounts), -1, dtype=np.int64)
+    for currency in np.unique(currencies):
+        mask = currencies == currency
+        try:
+            converted[mask] = convert_minor_units(amounts[mask], currencies[mask], days[mask], base_currency, rates)
+        except FxRateNotFound as exc:
+            logger.warning("Skipping amount rules: %s", exc)
+    return converted
+
+def write_violations(db: Session, expense_ids: Sequence[int], violations: List[Violation]) -> None:
+    """Replace the stored violations of expense_ids with violations, in bulk"""
+    expense_ids = list(expense_ids)
+    for start in range(0, len(expense_ids), WRITE_BATCH_SIZE):
+        db.execute(delete(PolicyViolation).where(
+            PolicyViolation.expense_id.in_(expense_ids[start:start + WRITE_BATCH_SIZE])
+        ))
+    if violations:
+        db.execute(insert(PolicyViolation), [
+            {"expense_id": expense_id, "rule": rule, "message": message}
+            for expense_id, rule, message in violations
+        ])
+
+def evaluate_rows(policies: PolicySet, rows, rates: FxRateTable, check_status: Optional[str] = None) -> List[Violation]:
+    """Evaluate rows of (id, employee_id, category_id, amount_minor, currency, expense_date, status)"""
+    ids, employee_ids, category_ids, amounts, currencies, dates, statuses = zip(*rows)
+    days = to_days(dates)
+    return policies.evaluate(
+        np.array(ids, dtype=np.int64),
+        np.array(employee_ids, dtype=np.int64),
+        np.array(category_ids, dtype=np.int64),
+        to_base_currency(np.array(amounts, dtype=np.int64), np.array(currencies), days, policies.base_currency, rates),
+        days,
+        None if check_status is None else np.array(statuses) == check_status
+    )
+
+ROW_COLUMNS = (Expense.id, Expense.employee_id, Expense.category_id, Expense.amount_minor,
+               Expense.currency, Expense.expense_date, Expense.status)
+
+def check_expense(db: Session, expense: Expense, rates: Optional[FxRateTable] = None) -> List[Dict[str, str]]:
+    """Evaluate the policy rules for one expense and store its violations.
+
+    Only the expense's category policy and the holidays on its date are
+    loaded; the employee's other expenses that day are included so the
+    per-diem cap sees the full daily total.
+    """
+    day = expense.expense_date.date()
+    policies = PolicySet.load(db, category_ids=[expense.category_id], days=(day, day))
+    rows = db.execute(select(*ROW_COLUMNS).where(
+        Expense.employee_id == expense.employee_id,
+        Expense.category_id == expense.category_id,
+        Expense.expense_date >= day,
+        Expense.expense_date < day + timedelta(days=1),
+        or_(Expense.status.in_(COUNTED_STATUSES), Expense.id == expense.id)
+    )).all()
+    violations = [
+        violation
+        for violation in evaluate_rows(policies, rows, rates or fx_rates.get())
+        if violation[0] == expense.id
+    ]
+    write_violations(db, [expense.id], violations)
+    return [{"rule": rule, "message": message} for _, rule, message in violations]
+
+def sweep(
+    session_factory: sessionmaker = SessionLocal,
+    should_continue: Optional[Callable[[], bool]] = None,
+    chunk_size: Optional[int] = None,
+    rates: Optional[FxRateTable] = None
+) -> int:
+    """Re-check every submitted expense against the current rules.
+
+    Rows are read in keyset-paginated chunks ordered by employee and date,
+    so all of an employee's expenses for a day arrive together and per-diem
+    totals are exact. A chunk's trailing employee-day is held back and
+    re-read at the start of the next chunk, or read in full when it is the
+    whole chunk. Each chunk's violations replace
+    the old ones in bulk and are committed before moving on, and
+    should_continue is checked between chunks. Returns the number of
+    violations found.
+    """
+    chunk_size = chunk_size or settings.POLICY_SWEEP_CHUNK_SIZE
+    rates = rates or fx_rates.get()
+    db = session_factory()
+    try:
+        policies = PolicySet.load(db)
+        after = None
+        found = 0
+        while should_continue is None or should_continue():
+            stmt = select(*ROW_COLUMNS).where(Expense.status.in_(COUNTED_STATUSES))
+            if after is not None:
+                stmt = stmt.where(tuple_(Expense.employee_id, Expense.expense_date, Expense.id) > tuple_(*after))
+            rows = db.execute(
+                stmt.order_by(Expense.employee_id, Expense.expense_date, Expense.id).limit(chunk_size)
+            ).all()
+            if not rows:
+                break
+
+            if len(rows) == chunk_size:
+                last = (rows[-1].employee_id, rows[-1].expense_date.date())
+                complete = [row for row in rows if (row.employee_id, row.expense_date.date()) != last]
+                if complete:
+                    rows = complete
+                else:
+                    # One employee-day fills the chunk: read the rest of that day too
+                    rows += db.execute(select(*ROW_COLUMNS).where(
+                        Expense.status.in_(COUNTED_STATUSES),
+                        Expense.employee_id == last[0],
+                        Expense.expense_date < last[1] + timedelta(days=1),
+                        tuple_(Expense.employee_id, Expense.expense_date, Expense.id) > tuple_(
+                            rows[-1].employee_id, rows[-1].expense_date, rows[-1].id
+                        )
+                    ).order_by(Expense.expense_date, Expense.id)).all()
+
+            violations = evaluate_rows(policies, rows, rates, check_status="submitted")
+            write_violations(db, [row.id for row in rows if row.status == "submitted"], violations)
+            db.commit()
+            found += len(violations)
+            after = (rows[-1].employee_id, rows[-1].expense_date, rows[-1].id)
+        logger.info("Policy sweep found %d violations", found)
+        return found
+    finally:
+        db.close()
+
+def main():
+    parser = argparse.ArgumentParser(description="Re-check all submitted expenses against the expense policy")
+    parser.add_argument("--chunk-size", type=int, default=settings.POLICY_SWEEP_CHUNK_SIZE)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    sweep(chunk_size=args.chunk_size)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+import itertools
+import os
+import threading
+from pathlib import Path
+from typing import Iterable, List, Tuple
+
+import numpy as np
+
+HASH_BITS = 64
+
+# On-disk record: the hash and the expense it belongs to, appended as they are computed
+RECORD = np.dtype([("hash", "<u8"), ("expense_id", "<i8")])
+
+# Popcount of every byte value, for vectorized Hamming distances
+POPCOUNT = np.array([bin(value).count("1") for value in range(256)], dtype=np.uint8)
+
+def hamming(hashes: np.ndarray, query: int) -> np.ndarray:
+    """Hamming distance from query to each 64-bit hash"""
+    xor = np.bitwise_xor(hashes, np.uint64(query))
+    return POPCOUNT[xor.view(np.uint8).reshape(-1, 8)].sum(axis=1)
+
+class MultiIndexHashIndex:
+    """Hamming-distance index over 64-bit perceptual hashes.
+
+    Each hash is split into `chunks` substrings, and each substring position
+    keeps the hashes sorted by that substring. Two hashes within distance r
+    must agree to within r // chunks bits on at least one substring
+    (pigeonhole), so a lookup only probes the few substring values near the
+    query's and verifies those candidates. Nothing is scanned linearly
+    except the small tail of records added since the last re-sort.
+
+    The index lives in an append-only file of (hash, expense_id) records.
+    Every process appends what it hashes and picks up what others appended
+    when the file grows, so the file is the only state shared between workers.
+    A file replaced by rebuild_index (a new inode) is loaded from scratch.
+    """
+
+    def __init__(self, path: str, chunks: int = 4, resort_threshold: int = 4096):
+        self.path = Path(path)
+        self.chunks = chunks
+        self.chunk_bits = HASH_BITS // chunks
+        self.resort_threshold = resort_threshold
+        self._lock = threading.Lock()
+        self._hashes = np.empty(0, dtype=np.uint64)
+        self._ids = np.empty(0, dtype=np.int64)
+        self._sorted_keys: List[np.ndarray] = []
+        self._sorted_order: List[np.ndarray] = []
+        self._indexed = 0
+        self._offset = 0
+        self._file_id = None
+
+    def __len__(self) -> int:
+        with self._lock:
+            self._refresh()
+            return len(self._hashes)
+
+    def add(self, hash_value: int, expense_id: int) -> None:
+        self.add_many([(hash_value, expense_id)])
+
+    def add_many(self, entries: Iterable[Tuple[int, int]]) -> None:
+        records = np.array(list(entries), dtype=RECORD)
+        if not len(records):
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self._lock:
+            # O_APPEND keeps concurrent writers from interleaving within a record
+            fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            try:
+                os.write(fd, records.tobytes())
+            finally:
+                os.close(fd)
+            self._refresh()
+
+    def search(self, hash_value: int, max_distance: int) -> List[Tuple[int, int]]:
+        """(expense_id, distance) of entries within max_distance, closest first"""
+        with self._lock:
+            self._refresh()
+            candidates = [self._probe(hash_value, max_distance)]
+            # Records added since the last re-sort are checked directly
+            candidates.append(np.arange(self._indexed, len(self._hashes)))
+            positions = np.unique(np.concatenate(candidates))
+            if not len(positions):
+                return []
+            distances = hamming(self._hashes[positions], hash_value)
+            keep = distances <= max_distance
+            ids, distances = self._ids[positions][keep], distances[keep]
+        order = np.lexsort((ids, distances))
+        return [(int(ids[i]), int(distances[i])) for i in order]
+
+    def _probe(self, hash_value: int, max_distance: int) -> np.ndarray:
+        if not self._indexed:
+            return np.empty(0, dtype=np.int64)
+        radius = min(max_distance // self.chunks, self.chunk_bits)
+        found = []
+        for chunk in range(self.chunks):
+            key = self._chunk(hash_value, chunk)
+            keys, order = self._sorted_keys[chunk], self._sorted_order[chunk]
+            for probe in self._neighbours(key, radius):
+                lo, hi = np.searchsorted(keys, [probe, probe + 1])
+                if hi > lo:
+                    found.append(order[lo:hi])
+        return np.concatenate(found) if found else np.empty(0, dtype=np.int64)
+
+    def _neighbours(self, key: int, radius: int):
+        yield key
+        for flips in range(1, radius + 1):
+            for bits in itertools.combinations(range(self.chunk_bits), flips):
+                mask = 0
+                for bit in bits:
+                    mask |= 1 << bit
+                yield key ^ mask
+
+    def _chunk(self, hash_value, chunk: int):
+        mask = (1 << self.chunk_bits) - 1
+        return (hash_value >> (chunk * self.chunk_bits)) & mask
+
+    def _refresh(self) -> None:
+        """Load records appended to the file since we last read it"""
+        try:
+            stat = self.path.stat()
+        except FileNotFoundError:
+            return
+        file_id = (stat.st_dev, stat.st_ino)
+        size = stat.st_size
+        if file_id != self._file_id or size < self._offset:
+            # Replaced or truncated: our offset means nothing in the new file
+            self._clear()
+            self._file_id = file_id
+        # Ignore a partially written trailing record; it is read once complete
+        size -= size % RECORD.itemsize
+        if size <= self._offset:
+            return
+        with self.path.open("rb") as handle:
+            handle.seek(self._offset)
+            records = np.frombuffer(handle.read(size - self._offset), dtype=RECORD)
+        self._offset = size
+        self._hashes = np.concatenate([self._hashes, records["hash"]])
+        self._ids = np.concatenate([self._ids, records["expense_id"]])
+        if len(self._hashes) - self._indexed > self.resort_threshold:
+            self._resort()
+
+    def _clear(self) -> None:
+        self._hashes = np.empty(0, dtype=np.uint64)
+        self._ids = np.empty(0, dtype=np.int64)
+        self._sorted_keys, self._sorted_order = [], []
+        self._indexed = 0
+        self._offset = 0
+
+    def _resort(self) -> None:
+        self._sorted_keys, self._sorted_order = [], []
+        mask = np.uint64((1 << self.chunk_bits) - 1)
+        for chunk in range(self.chunks):
+            keys = (self._hashes >> np.uint64(chunk * self.chunk_bits)) & mask
+            order = np.argsort(keys, kind="stable")
+            self._sorted_keys.append(keys[order].astype(np.int64))
+            self._sorted_order.append(order)
+        self._indexed = len(self._hashes)
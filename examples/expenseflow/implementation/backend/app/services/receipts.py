@@ -0,0 +1,284 @@
+import argparse
+import logging
+import threading
+import uuid
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+import numpy as np
+from PIL import Image, ImageOps
+from sqlalchemy import or_, select, union_all, update
+from sqlalchemy.orm import Session, sessionmaker
+
+from ..core.config import settings
+from ..core.database import SessionLocal
+from ..models.archive import ArchivedExpense, ArchivedReceiptDuplicate
+from ..models.expense import Expense
+from .duplicates import record_duplicates
+from .receipt_index import HASH_BITS, MultiIndexHashIndex
+
+logger = logging.getLogger(__name__)
+
+HASH_SIZE = 8
+
+def store_receipt(expense_id: int, filename: str, content: bytes) -> str:
+    """Write receipt bytes to storage; returns the storage key kept in receipt_url"""
+    suffix = Path(filename or "").suffix.lower()[:10]
+    key = f"{expense_id}-{uuid.uuid4().hex}{suffix}"
+    directory = Path(settings.RECEIPT_STORAGE_DIR)
+    directory.mkdir(parents=True, exist_ok=True)
+    (directory / key).write_bytes(content)
+    return key
+
+def receipt_path(key: str) -> Path:
+    return Path(settings.RECEIPT_STORAGE_DIR) / Path(key).name
+
+def delete_receipt(key: str) -> None:
+    """Remove a stored receipt; a missing file is fine"""
+    receipt_path(key).unlink(missing_ok=True)
+
+def perceptual_hash(image: Image.Image) -> int:
+    """64-bit difference hash: whether each pixel of a 9x8 thumbnail is brighter than its left neighbour.
+
+    Survives re-encoding, rescaling and small brightness changes, so the same
+    photo uploaded twice lands within a few bits of itself.
+    """
+    image = ImageOps.exif_transpose(image).convert("L").resize((HASH_SIZE + 1, HASH_SIZE), Image.LANCZOS)
+    pixels = np.asarray(image, dtype=np.int16)
+    bits = (pixels[:, 1:] > pixels[:, :-1]).flatten()
+    return int(np.packbits(bits).view(">u8")[0])
+
+def to_signed(hash_value: int) -> int:
+    """Store unsigned 64-bit hashes in a signed BIGINT column"""
+    return hash_value - (1 << HASH_BITS) if hash_value >= 1 << (HASH_BITS - 1) else hash_value
+
+def to_unsigned(hash_value: int) -> int:
+    return hash_value + (1 << HASH_BITS) if hash_value < 0 else hash_value
+
+class ReceiptHasher:
+    """Hash uploaded receipts in the background and index them for duplicate lookups.
+
+    The expenses table is the work queue: receipts with a receipt_url but no
+    receipt_hashed_at are claimed in batches with a compare-and-set UPDATE
+    on receipt_claimed_until, as the outbox relay does, and the images are
+    decoded with no transaction open, so no expense row stays locked while
+    Pillow works. A claim left by a crashed hasher expires after
+    RECEIPT_HASHER_CLAIM_SECONDS, so nothing is lost if the process dies
+    between the upload and the hash. Uploads call wake() to have them hashed
+    right away instead of on the next poll.
+    """
+
+    def __init__(
+        self,
+        session_factory: sessionmaker = SessionLocal,
+        index: Optional[MultiIndexHashIndex] = None,
+        batch_size: Optional[int] = None
+    ):
+        self.session_factory = session_factory
+        self.index = index if index is not None else MultiIndexHashIndex(settings.RECEIPT_INDEX_PATH)
+        self.batch_size = batch_size or settings.RECEIPT_HASHER_BATCH_SIZE
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def find_similar(self, hash_value: int, max_distance: Optional[int] = None) -> List[Tuple[int, int]]:
+        """(expense_id, distance) of indexed receipts near hash_value"""
+        max_distance = settings.RECEIPT_HASH_MAX_DISTANCE if max_distance is None else max_distance
+        return self.index.search(hash_value, max_distance)
+
+    def claim(self, db: Session) -> Tuple[datetime, List[Tuple[int, str]]]:
+        """Claim up to batch_size receipts waiting for a hash.
+
+        Returns (claimed_until, [(expense_id, receipt_url)]); claimed_until identifies our claim.
+        """
+        now = datetime.utcnow()
+        claimed_until = now + timedelta(seconds=settings.RECEIPT_HASHER_CLAIM_SECONDS)
+        claimable = (
+            Expense.receipt_url.isnot(None),
+            Expense.receipt_hashed_at.is_(None),
+            or_(Expense.receipt_claimed_until.is_(None), Expense.receipt_claimed_until < now),
+        )
+        candidates = db.execute(
+            select(Expense.id).where(*claimable).order_by(Expense.id).limit(self.batch_size)
+        ).scalars().all()
+        if not candidates:
+            db.rollback()
+            return claimed_until, []
+        # Rows another hasher claimed since the SELECT fail the WHERE and are skipped.
+        # Hashing isn't a change clients can see, so updated_at (the ETag) stays put.
+        claimed = db.execute(
+            update(Expense)
+            .where(Expense.id.in_(candidates), *claimable)
+            .values(receipt_claimed_until=claimed_until, updated_at=Expense.updated_at)
+            .returning(Expense.id, Expense.receipt_url)
+        ).all()
+        db.commit()
+        return claimed_until, [tuple(row) for row in claimed]
+
+    def hash_once(self) -> int:
+        """Hash one batch of pending receipts; returns how many were processed"""
+        db = self.session_factory()
+        try:
+            claimed_until, claimed = self.claim(db)
+            if not claimed:
+                return 0
+
+            hashes = {}
+            for expense_id, receipt_url in claimed:
+                try:
+                    with Image.open(receipt_path(receipt_url)) as image:
+                        hashes[expense_id] = perceptual_hash(image)
+                except (OSError, Image.DecompressionBombError):
+                    # Unreadable or not an image: don't retry it on every poll
+                    logger.warning("Could not hash receipt for expense %s", expense_id)
+                    hashes[expense_id] = None
+
+            hashed = []
+            for expense_id, receipt_url in claimed:
+                hash_value = hashes[expense_id]
+                # A receipt replaced since the claim is skipped; the upload queued it again
+                written = db.execute(
+                    update(Expense)
+                    .where(
+                        Expense.id == expense_id,
+                        Expense.receipt_url == receipt_url,
+                        Expense.receipt_claimed_until == claimed_until
+                    )
+                    .values(
+                        receipt_hash=None if hash_value is None else to_signed(hash_value),
+                        receipt_hashed_at=datetime.utcnow(),
+                        receipt_claimed_until=None,
+                        updated_at=Expense.updated_at
+                    )
+                    .returning(Expense.id)
+                ).first()
+                if written and hash_value is not None:
+                    hashed.append((hash_value, expense_id))
+            # Give up the claims on skipped rows so they are picked up straight away
+            db.execute(
+                update(Expense)
+                .where(
+                    Expense.id.in_([expense_id for expense_id, _ in claimed]),
+                    Expense.receipt_claimed_until == claimed_until
+                )
+                .values(receipt_claimed_until=None, updated_at=Expense.updated_at)
+            )
+
+            self._record_matches(db, hashed)
+            db.commit()
+            self.index.add_many(hashed)
+            return len(claimed)
+        finally:
+            db.close()
+
+    def _record_matches(self, db: Session, hashed: List[Tuple[int, int]]) -> None:
+        max_distance = settings.RECEIPT_HASH_MAX_DISTANCE
+        candidates = {
+            expense_id: [other_id for other_id, _ in self.find_similar(hash_value, max_distance)]
+            for hash_value, expense_id in hashed
+        }
+        # The index can hold stale hashes for replaced receipts, so distances
+        # are taken from the hashes currently stored on the expenses, hot or archived
+        other_ids = {other_id for ids in candidates.values() for other_id in ids}
+        current = {}
+        archived = set()
+        if other_ids:
+            for model in (Expense, ArchivedExpense):
+                rows = db.query(model.id, model.receipt_hash).filter(
+                    model.id.in_(other_ids), model.receipt_hash.isnot(None)
+                ).all()
+                current.update({other_id: to_unsigned(receipt_hash) for other_id, receipt_hash in rows})
+                if model is ArchivedExpense:
+                    archived = {other_id for other_id, _ in rows}
+        # Receipts in this batch aren't in the index yet
+        current.update({expense_id: hash_value for hash_value, expense_id in hashed})
+
+        pairs = []
+        for hash_value, expense_id in hashed:
+            for other_id in set(candidates[expense_id]) | {other for _, other in hashed}:
+                if other_id == expense_id or other_id not in current:
+                    continue
+                distance = bin(hash_value ^ current[other_id]).count("1")
+                if distance <= max_distance:
+                    pairs.append((expense_id, other_id, 1 - distance / HASH_BITS))
+        # expense_duplicates only points at hot expenses
+        record_duplicates(db, [pair for pair in pairs if pair[1] not in archived], reason="receipt")
+        record_duplicates(
+            db,
+            [pair for pair in pairs if pair[1] in archived],
+            reason="receipt",
+            model=ArchivedReceiptDuplicate
+        )
+
+    def run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                processed = self.hash_once()
+            except Exception:
+                logger.exception("Receipt hashing batch failed, retrying")
+                processed = 0
+            if processed < self.batch_size:
+                self._wake.wait(settings.RECEIPT_HASHER_POLL_INTERVAL)
+                self._wake.clear()
+
+    def wake(self) -> None:
+        self._wake.set()
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self.run, name="receipt-hasher", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+receipt_hasher = ReceiptHasher()
+
+def rebuild_index(session_factory: sessionmaker = SessionLocal, path: Optional[str] = None) -> int:
+    """Rewrite the index file from the hashes stored on expenses, hot and archived.
+
+    The new file replaces the old one, which running hashers notice (a new
+    inode) and reload from scratch.
+    """
+    path = Path(path or settings.RECEIPT_INDEX_PATH)
+    tmp_path = path.with_suffix(".tmp")
+    tmp_path.unlink(missing_ok=True)
+    index = MultiIndexHashIndex(str(tmp_path))
+    db = session_factory()
+    try:
+        rows = db.execute(union_all(*[
+            select(model.receipt_hash, model.id).where(model.receipt_hash.isnot(None))
+            for model in (Expense, ArchivedExpense)
+        ]).execution_options(yield_per=10000))
+        count = 0
+        batch = []
+        for receipt_hash, expense_id in rows:
+            batch.append((to_unsigned(receipt_hash), expense_id))
+            if len(batch) == 10000:
+                index.add_many(batch)
+                count += len(batch)
+                batch = []
+        index.add_many(batch)
+        count += len(batch)
+    finally:
+        db.close()
+    tmp_path.touch()
+    tmp_path.replace(path)
+    return count
+
+def main():
+    parser = argparse.ArgumentParser(description="Rebuild the receipt perceptual hash index from the database")
+    parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    logger.info("Indexed %d receipt hashes", rebuild_index())
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+from datetime import datetime
+from typing import Dict, Optional
+
+import numpy as np
+from sqlalchemy import select, union_all
+from sqlalchemy.orm import Session
+
+from ..core.config import settings
+from ..core.money import currency_exponent
+from ..models.archive import ArchivedExpense
+from ..models.expense import Expense
+from .fx import FxRateTable, to_days
+
+# Column names, so they apply to the hot and the archive table alike
+GROUP_COLUMNS = {
+    "status": "status",
+    "category": "category_id",
+    "currency": "currency",
+    "employee": "employee_id",
+}
+
+def convert_minor_units(
+    amounts: np.ndarray,
+    currencies: np.ndarray,
+    days: np.ndarray,
+    target_currency: str,
+    rates: FxRateTable
+) -> np.ndarray:
+    """Convert a column of minor-unit amounts into target minor units.
+    
+    Works a currency at a time over whole arrays, and rounds each converted
+    row to an integer so the totals are exact integer sums.
+    """
+    target_exponent = currency_exponent(target_currency)
+    target_rates = rates.rates_for(target_currency, days)
+    converted = np.empty(len(amounts), dtype=np.int64)
+    
+    codes, inverse = np.unique(currencies, return_inverse=True)
+    for index, currency in enumerate(codes):
+        mask = inverse == index
+        if currency == target_currency:
+            converted[mask] = amounts[mask]
+            continue
+        scale = 10.0 ** (target_exponent - currency_exponent(currency))
+        factor = target_rates[mask] / rates.rates_for(currency, days[mask])
+        converted[mask] = np.rint(amounts[mask] * scale * factor)
+    return converted
+
+def expense_totals(
+    db: Session,
+    target_currency: str,
+    rates: FxRateTable,
+    group_by: str = "status",
+    employee_id: Optional[int] = None,
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    include_archived: bool = False,
+    chunk_size: Optional[int] = None
+) -> Dict[str, Dict[str, int]]:
+    """Sum expenses in target_currency minor units, grouped by group_by.
+    
+    Only the four columns needed are fetched, in chunks of chunk_size rows,
+    so memory stays flat however large the result set is. Archived expenses
+    are counted only with include_archived.
+    """
+    selects = []
+    for model in [Expense, ArchivedExpense] if include_archived else [Expense]:
+        stmt = select(
+            model.amount_minor,
+            model.currency,
+            model.expense_date,
+            getattr(model, GROUP_COLUMNS[group_by])
+        )
+        if employee_id is not None:
+            stmt = stmt.where(model.employee_id == employee_id)
+        if start_date is not None:
+            stmt = stmt.where(model.expense_date >= start_date)
+        if end_date is not None:
+            stmt = stmt.where(model.expense_date < end_date)
+        selects.append(stmt)
+    stmt = union_all(*selects) if len(selects) > 1 else selects[0]
+    
+    chunk_size = chunk_size or settings.REPORT_CHUNK_SIZE
+    result = db.execute(stmt.execution_options(yield_per=chunk_size))
+    
+    totals: Dict[str, Dict[str, int]] = {}
+    for rows in result.partitions():
+        amounts, currencies, dates, groups = zip(*rows)
+        converted = convert_minor_units(
+            np.array(amounts, dtype=np.int64),
+            np.array(currencies),
+            to_days(dates),
+            target_currency,
+            rates
+        )
+        keys, inverse = np.unique(np.array([str(g) for g in groups]), return_inverse=True)
+        sums = np.zeros(len(keys), dtype=np.int64)
+        np.add.at(sums, inverse, converted)
+        counts = np.bincount(inverse, minlength=len(keys))
+        for key, total, count in zip(keys.tolist(), sums.tolist(), counts.tolist()):
+            entry = totals.setdefault(key, {"total_minor": 0, "count": 0})
+            entry["total_minor"] += total
+            entry["count"] += count
+    return totals
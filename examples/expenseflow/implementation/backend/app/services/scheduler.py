@@ -0,0 +1,174 @@
+import logging
+import os
+import socket
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy import delete, or_, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import sessionmaker
+
+from ..core.config import settings
+from ..core.database import SessionLocal
+from ..models.scheduler import JobRun, SchedulerLease
+from .archive import archive_expenses
+from .escalation import escalate_stale_approvals
+from .outbox import prune_published
+from .policy import sweep
+
+logger = logging.getLogger(__name__)
+
+# A job gets the scheduler's session factory and a "still the leader" check
+Job = Callable[[sessionmaker, Callable[[], bool]], object]
+
+class Scheduler:
+    """Run recurring jobs in exactly one worker.
+
+    Every worker runs the loop, but only the holder of the scheduler lease
+    (a row in scheduler_leases, taken and renewed with a conditional UPDATE)
+    runs jobs. A crashed leader's lease expires after SCHEDULER_LEASE_SECONDS
+    and another worker takes over. Job start times are kept in job_runs, so
+    a new leader doesn't rerun a job that just ran elsewhere.
+    """
+
+    def __init__(
+        self,
+        session_factory: sessionmaker = SessionLocal,
+        lease_seconds: Optional[int] = None,
+        name: str = "scheduler"
+    ):
+        self.session_factory = session_factory
+        self.lease_seconds = lease_seconds or settings.SCHEDULER_LEASE_SECONDS
+        self.name = name
+        self.holder = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.jobs: Dict[str, Tuple[float, Job]] = {}
+        # Monotonic time our lease runs out, None when we don't hold it
+        self._lease_deadline: Optional[float] = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def register(self, name: str, interval: float, job: Job) -> None:
+        """Run job every interval seconds"""
+        self.jobs[name] = (interval, job)
+
+    def is_leader(self) -> bool:
+        return self._lease_deadline is not None and time.monotonic() < self._lease_deadline
+
+    def acquire_lease(self) -> bool:
+        """Take or renew the lease; returns whether we hold it"""
+        started = time.monotonic()
+        now = datetime.utcnow()
+        expires_at = now + timedelta(seconds=self.lease_seconds)
+        db = self.session_factory()
+        try:
+            renewed = db.execute(
+                update(SchedulerLease)
+                .where(
+                    SchedulerLease.name == self.name,
+                    or_(SchedulerLease.holder == self.holder, SchedulerLease.expires_at < now)
+                )
+                .values(holder=self.holder, expires_at=expires_at)
+            ).rowcount
+            if not renewed:
+                db.add(SchedulerLease(name=self.name, holder=self.holder, expires_at=expires_at))
+            try:
+                db.commit()
+            except IntegrityError:
+                # Another worker holds the lease
+                db.rollback()
+                self._lease_deadline = None
+                return False
+        finally:
+            db.close()
+        # Counted from before the UPDATE, so we never outlive the row's expiry
+        self._lease_deadline = started + self.lease_seconds
+        return True
+
+    def release_lease(self) -> None:
+        if self._lease_deadline is None:
+            return
+        self._lease_deadline = None
+        db = self.session_factory()
+        try:
+            db.execute(delete(SchedulerLease).where(
+                SchedulerLease.name == self.name,
+                SchedulerLease.holder == self.holder
+            ))
+            db.commit()
+        finally:
+            db.close()
+
+    def _claim_due(self, name: str, interval: float) -> bool:
+        """Record that name starts now if its interval has passed since the last run"""
+        now = datetime.utcnow()
+        db = self.session_factory()
+        try:
+            last_run_at = db.execute(select(JobRun.last_run_at).where(JobRun.name == name)).scalar()
+            if last_run_at is not None and last_run_at + timedelta(seconds=interval) > now:
+                return False
+            if last_run_at is None:
+                db.add(JobRun(name=name, last_run_at=now))
+            else:
+                db.execute(update(JobRun).where(JobRun.name == name).values(last_run_at=now))
+            db.commit()
+            return True
+        finally:
+            db.close()
+
+    def run_pending(self) -> List[str]:
+        """Run the jobs that are due, if we are the leader; returns their names"""
+        ran = []
+        for name, (interval, job) in self.jobs.items():
+            # Renew before each job so a long run doesn't cost us the lease
+            if self._stop.is_set() or not self.acquire_lease():
+                break
+            if not self._claim_due(name, interval):
+                continue
+            try:
+                job(self.session_factory, self.is_leader)
+            except Exception:
+                logger.exception("Scheduled job %s failed", name)
+            ran.append(name)
+        return ran
+
+    def run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                self.run_pending()
+            except Exception:
+                logger.exception("Scheduler tick failed")
+            self._stop.wait(settings.SCHEDULER_TICK_SECONDS)
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self.run, name="scheduler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+        # Let another worker take over without waiting for the lease to expire
+        try:
+            self.release_lease()
+        except Exception:
+            logger.exception("Failed to release the scheduler lease")
+
+scheduler = Scheduler()
+scheduler.register(
+    "escalate_stale_approvals",
+    settings.APPROVAL_ESCALATION_INTERVAL_SECONDS,
+    lambda session_factory, should_continue: escalate_stale_approvals(session_factory, should_continue)
+)
+scheduler.register("prune_outbox", settings.OUTBOX_PRUNE_INTERVAL_SECONDS, prune_published)
+# Off by default: deployments already running these from cron keep doing so
+if settings.POLICY_SWEEP_SCHEDULE_ENABLED:
+    scheduler.register("policy_sweep", settings.POLICY_SWEEP_INTERVAL_SECONDS, sweep)
+if settings.ARCHIVE_SCHEDULE_ENABLED:
+    scheduler.register("archive_expenses", settings.ARCHIVE_INTERVAL_SECONDS, archive_expenses)
@@ -0,0 +1,70 @@
+import argparse
+import logging
+from typing import List, Optional
+
+from sqlalchemy import inspect, literal, text
+from sqlalchemy.engine import Engine
+
+from ..core.database import Base, engine as default_engine
+from .minor_units import migrate_amounts
+
+logger = logging.getLogger(__name__)
+
+def add_missing_columns(engine: Optional[Engine] = None) -> List[str]:
+    """Add model columns and indexes that existing tables lack.
+
+    create_all creates missing tables but never alters existing ones, so a
+    database from before expenses/approvals gained version, receipt_hash,
+    receipt_hashed_at, reminded_at and the like fails every query touching
+    them. Nullable columns are added as they are; NOT NULL columns with a
+    scalar default get that default as the server default, which fills the
+    existing rows. Anything else (expenses.amount_minor, which needs a
+    backfill) is skipped and logged. Returns the "table.column" names added.
+    """
+    engine = engine or default_engine
+    Base.metadata.create_all(bind=engine)
+    inspector = inspect(engine)
+    preparer = engine.dialect.identifier_preparer
+
+    added = []
+    for table in Base.metadata.sorted_tables:
+        existing = {column["name"] for column in inspector.get_columns(table.name)}
+        skipped = set()
+        for column in table.columns:
+            if column.name in existing:
+                continue
+            ddl = f"{column.type.compile(dialect=engine.dialect)}"
+            if not column.nullable:
+                default = column.default
+                if default is None or not default.is_scalar:
+                    logger.warning("Skipping %s.%s: NOT NULL without a default", table.name, column.name)
+                    skipped.add(column.name)
+                    continue
+                value = literal(default.arg).compile(
+                    dialect=engine.dialect, compile_kwargs={"literal_binds": True}
+                )
+                ddl += f" DEFAULT {value} NOT NULL"
+            with engine.begin() as connection:
+                connection.execute(text(
+                    f"ALTER TABLE {preparer.format_table(table)} ADD COLUMN {preparer.quote(column.name)} {ddl}"
+                ))
+            added.append(f"{table.name}.{column.name}")
+        for index in table.indexes:
+            if not skipped.intersection(column.name for column in index.columns):
+                index.create(bind=engine, checkfirst=True)
+
+    logger.info("Added columns: %s", ", ".join(added) or "none")
+    return added
+
+def main():
+    parser = argparse.ArgumentParser(description="Bring an existing database up to the current models")
+    parser.add_argument("--batch-size", type=int, default=1000, help="Batch size of the amount_minor backfill")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    # amount_minor first, so the indexes on it can be created afterwards
+    migrate_amounts(batch_size=args.batch_size)
+    add_missing_columns()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+import logging
+import uuid
+from datetime import datetime, timedelta
+from typing import Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from ..core.config import settings
+from ..core.security import generate_refresh_token, hash_refresh_token
+from ..models.token import RefreshToken
+from ..models.user import User
+
+logger = logging.getLogger(__name__)
+
+class RefreshTokenError(Exception):
+    """The refresh token is unknown, expired, revoked or was reused"""
+
+def issue_refresh_token(db: Session, user: User, family_id: Optional[str] = None) -> Tuple[str, RefreshToken]:
+    """Create a refresh token for user; returns the plain token and its row"""
+    token = generate_refresh_token()
+    row = RefreshToken(
+        user_id=user.id,
+        token_hash=hash_refresh_token(token),
+        family_id=family_id or uuid.uuid4().hex,
+        expires_at=datetime.utcnow() + timedelta(days=settings.REFRESH_TOKEN_EXPIRE_DAYS)
+    )
+    db.add(row)
+    db.flush()
+    return token, row
+
+def rotate_refresh_token(db: Session, token: str) -> Tuple[str, User]:
+    """Exchange a refresh token for a new one in the same family.
+
+    Each token can be used once. Presenting a token that was already rotated
+    means it leaked (or the client replayed it), so the whole family is
+    revoked and the user has to log in again.
+    """
+    row = db.query(RefreshToken).filter(
+        RefreshToken.token_hash == hash_refresh_token(token)
+    ).first()
+    if row is None:
+        raise RefreshTokenError("Invalid refresh token")
+
+    now = datetime.utcnow()
+    if row.revoked_at is not None:
+        revoke_family(db, row.family_id)
+        db.commit()
+        logger.warning("Refresh token reuse detected for user %s", row.user_id)
+        raise RefreshTokenError("Refresh token has been revoked")
+    if row.expires_at <= now:
+        raise RefreshTokenError("Refresh token has expired")
+
+    # Conditional revoke so two concurrent refreshes can't both rotate the token
+    claimed = db.query(RefreshToken).filter(
+        RefreshToken.id == row.id,
+        RefreshToken.revoked_at.is_(None)
+    ).update({"revoked_at": now}, synchronize_session=False)
+    if claimed != 1:
+        db.rollback()
+        revoke_family(db, row.family_id)
+        db.commit()
+        raise RefreshTokenError("Refresh token has been revoked")
+
+    user = db.query(User).filter(User.id == row.user_id).first()
+    new_token, new_row = issue_refresh_token(db, user, family_id=row.family_id)
+    db.query(RefreshToken).filter(RefreshToken.id == row.id).update(
+        {"replaced_by_id": new_row.id}, synchronize_session=False
+    )
+    return new_token, user
+
+def revoke_family(db: Session, family_id: str) -> int:
+    """Revoke every live token rotated from the same login"""
+    return db.query(RefreshToken).filter(
+        RefreshToken.family_id == family_id,
+        RefreshToken.revoked_at.is_(None)
+    ).update({"revoked_at": datetime.utcnow()}, synchronize_session=False)
+
+def revoke_user_tokens(db: Session, user_id: int) -> int:
+    """Revoke every live refresh token of a user in one statement"""
+    return db.query(RefreshToken).filter(
+        RefreshToken.user_id == user_id,
+        RefreshToken.revoked_at.is_(None)
+    ).update({"revoked_at": datetime.utcnow()}, synchronize_session=False)
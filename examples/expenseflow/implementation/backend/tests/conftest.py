@@ -1,3 +1,5 @@
+from datetime import datetime
+
 import pytest
 from fastapi.testclient import TestClient
 from sqlalchemy import create_engine
@@ -7,8 +9,11 @@ from sqlalchemy.pool import StaticPool
 from app.main import app
 from app.core.database import get_db, Base
 from app.core.security import get_password_hash
+from app.core.rate_limit import rate_limiter
+from app.core.idempotency import idempotency_store
+from app.services.audit import audit_log
 from app.models.user import User
-from app.models.expense import Category
+from app.models.expense import Approval, Category, Expense
 
 # Test database setup
 SQLALCHEMY_DATABASE_URL = "sqlite:///./test.db"
@@ -34,10 +39,25 @@ def setup_test_db():
     yield
     Base.metadata.drop_all(bind=engine)
 
+@pytest.fixture(autouse=True)
+def clean_state():
+    yield
+    # Each test creates its own users/categories, so start the next one empty
+    with engine.begin() as connection:
+        for table in reversed(Base.metadata.sorted_tables):
+            connection.execute(table.delete())
+    rate_limiter.reset()
+    idempotency_store.memory.reset()
+    audit_log.clear()
+
 @pytest.fixture
 def client():
     return TestClient(app)
 
+@pytest.fixture
+def session_factory():
+    return TestingSessionLocal
+
 @pytest.fixture
 def db_session():
     db = TestingSessionLocal()
@@ -46,6 +66,27 @@ def db_session():
     finally:
         db.close()
 
+@pytest.fixture
+def make_expense(db_session, test_user, test_category):
+    """Factory for committed expenses of test_user; approvals are dicts of Approval fields"""
+    def make_expense(approvals=(), **fields):
+        expense = Expense(**{
+            "amount": 42.00,
+            "description": "Hotel",
+            "expense_date": datetime(2024, 1, 15),
+            "category_id": test_category.id,
+            "employee_id": test_user.id,
+            "status": "draft",
+            **fields
+        })
+        db_session.add(expense)
+        db_session.flush()
+        for approval in approvals:
+            db_session.add(Approval(expense_id=expense.id, **{"status": "pending", **approval}))
+        db_session.commit()
+        return expense
+    return make_expense
+
 @pytest.fixture
 def test_user(db_session):
     user = User(
@@ -0,0 +1,120 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.api.v1 import expenses as expenses_api
+from app.api.v1 import reports as reports_api
+from app.models.expense import Expense, Approval
+from app.models.archive import ArchivedExpense, ArchivedApproval, ArchivedExpenseDuplicate
+from app.models.duplicate import ExpenseDuplicate
+from app.models.policy import PolicyViolation
+from app.services.archive import archive_expenses
+from app.services.fx import FxRateCache
+
+OLD = datetime.utcnow() - timedelta(days=800)
+RECENT = datetime.utcnow() - timedelta(days=10)
+
+@pytest.fixture
+def expenses(make_expense, test_manager):
+    rows = {}
+    for name, expense_date, status in [
+        ("old_approved", OLD, "approved"),
+        ("old_draft", OLD, "draft"),
+        ("recent_approved", RECENT, "approved"),
+    ]:
+        approvals = [{"approver_id": test_manager.id, "status": "approved"}] if status == "approved" else []
+        expense = make_expense(
+            amount=50.00, description=name, expense_date=expense_date, status=status, approvals=approvals
+        )
+        rows[name] = expense.id
+    return rows
+
+def test_archive_moves_only_old_finalized_expenses(expenses, db_session, session_factory):
+    """Test that the mover copies then deletes old finalized rows"""
+    assert archive_expenses(session_factory, older_than_days=365) == 1
+    
+    assert {e.description for e in db_session.query(Expense)} == {"old_draft", "recent_approved"}
+    archived = db_session.query(ArchivedExpense).one()
+    assert archived.id == expenses["old_approved"]
+    assert archived.amount == 50.00
+    assert archived.archived_at is not None
+    assert db_session.query(ArchivedApproval).one().expense_id == archived.id
+    assert db_session.query(Approval).count() == 1
+
+def test_archive_runs_in_batches(make_expense, db_session, session_factory):
+    """Test that a large backlog is moved in bounded batches"""
+    for i in range(5):
+        make_expense(amount=i + 1, description=f"old {i}", expense_date=OLD, status="rejected")
+    
+    assert archive_expenses(session_factory, older_than_days=365, batch_size=2, max_batches=2) == 4
+    assert archive_expenses(session_factory, older_than_days=365, batch_size=2) == 1
+    assert db_session.query(ArchivedExpense).count() == 5
+
+def test_history_includes_archive_when_asked(authenticated_client, expenses, session_factory):
+    """Test that list and detail endpoints union the cold tier on request"""
+    archive_expenses(session_factory, older_than_days=365)
+    archived_id = expenses["old_approved"]
+    
+    response = authenticated_client.get("/api/v1/expenses")
+    assert [e["description"] for e in response.json()] == ["old_draft", "recent_approved"]
+    
+    response = authenticated_client.get("/api/v1/expenses", params={"include_archived": True})
+    assert [e["id"] for e in response.json()] == sorted(expenses.values())
+    
+    assert authenticated_client.get(f"/api/v1/expenses/{archived_id}").status_code == 404
+    response = authenticated_client.get(
+        f"/api/v1/expenses/{archived_id}", params={"include_archived": True}
+    )
+    assert response.status_code == 200
+    assert response.json()["status"] == "approved"
+    assert len(response.json()["approvals"]) == 1
+
+def test_archive_keeps_violations_and_duplicates(authenticated_client, expenses, db_session, session_factory):
+    """Test that compliance and duplicate history moves with the expense"""
+    old_id, recent_id = expenses["old_approved"], expenses["recent_approved"]
+    db_session.add(PolicyViolation(expense_id=old_id, rule="weekend", message="Weekend expense"))
+    db_session.add(ExpenseDuplicate(expense_id=recent_id, duplicate_of_id=old_id, score=0.9))
+    db_session.commit()
+    
+    archive_expenses(session_factory, older_than_days=365)
+    
+    assert db_session.query(PolicyViolation).count() == 0
+    assert db_session.query(ExpenseDuplicate).count() == 0
+    pair = db_session.query(ArchivedExpenseDuplicate).one()
+    assert (pair.expense_id, pair.duplicate_of_id) == (recent_id, old_id)
+    
+    response = authenticated_client.get(f"/api/v1/expenses/{old_id}/violations")
+    assert response.status_code == 404
+    response = authenticated_client.get(f"/api/v1/expenses/{old_id}/violations?include_archived=true")
+    assert [v["rule"] for v in response.json()] == ["weekend"]
+
+def test_list_skips_rows_archived_mid_request(authenticated_client, expenses, session_factory, monkeypatch):
+    """Test that a row archived between the validator query and the row load isn't a 500"""
+    make_etag = expenses_api.make_etag
+    
+    def archive_then_make_etag(*args, **kwargs):
+        # Runs after the (id, updated_at) page query, before the rows are loaded
+        archive_expenses(session_factory, older_than_days=365)
+        return make_etag(*args, **kwargs)
+    
+    monkeypatch.setattr(expenses_api, "make_etag", archive_then_make_etag)
+    response = authenticated_client.get("/api/v1/expenses")
+    
+    assert response.status_code == 200
+    assert {e["description"] for e in response.json()} == {"old_draft", "recent_approved"}
+    assert "ETag" not in response.headers
+
+def test_report_totals_include_archive_when_asked(
+    authenticated_client, expenses, session_factory, tmp_path, monkeypatch
+):
+    """Test that archived expenses count towards report totals on request"""
+    (tmp_path / "rates.csv").write_text("date,currency,rate\n")
+    monkeypatch.setattr(reports_api, "fx_rates", FxRateCache(str(tmp_path), "USD"))
+    archive_expenses(session_factory, older_than_days=365)
+    
+    response = authenticated_client.get("/api/v1/reports/totals")
+    assert response.json()["count"] == 2
+    
+    response = authenticated_client.get("/api/v1/reports/totals", params={"include_archived": "true"})
+    assert response.json()["count"] == 3
+    assert {g["group"]: g["total"] for g in response.json()["groups"]} == {"approved": 100.00, "draft": 50.00}
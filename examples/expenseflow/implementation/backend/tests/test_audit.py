@@ -0,0 +1,108 @@
+from datetime import datetime
+
+import pytest
+
+from app.models.audit import AuditEntry
+from app.services.audit import AuditLog, audit_log
+
+@pytest.fixture
+def flushed_audit_log(monkeypatch, session_factory):
+    monkeypatch.setattr(audit_log, "session_factory", session_factory)
+    return audit_log
+
+def test_expense_actions_are_audited(authenticated_client, test_user, test_category, flushed_audit_log):
+    """Test that handler actions reach the audit log once flushed, queryable by entity"""
+    response = authenticated_client.post("/api/v1/expenses", json={
+        "amount": 12.00,
+        "description": "Parking",
+        "expense_date": datetime(2024, 3, 11).isoformat(),
+        "category_id": test_category.id
+    })
+    expense_id = response.json()["id"]
+    authenticated_client.put(f"/api/v1/expenses/{expense_id}", json={"description": "Airport parking"})
+    authenticated_client.post(f"/api/v1/expenses/{expense_id}/submit")
+    
+    # Nothing is written until the buffer is flushed
+    response = authenticated_client.get("/api/v1/audit", params={"actor_id": test_user.id})
+    assert response.json() == []
+    assert flushed_audit_log.flush() == 3
+    
+    response = authenticated_client.get("/api/v1/audit", params={
+        "actor_id": test_user.id, "entity_type": "expense", "entity_id": expense_id
+    })
+    entries = response.json()
+    assert [e["action"] for e in entries] == ["expense.submitted", "expense.updated", "expense.created"]
+    assert entries[1]["details"] == {"fields": ["description"]}
+    
+    response = authenticated_client.get("/api/v1/audit", params={
+        "actor_id": test_user.id, "before_id": entries[1]["id"]
+    })
+    assert [e["action"] for e in response.json()] == ["expense.created"]
+
+def test_audit_query_requires_admin_for_others(authenticated_client, test_manager):
+    """Test that non-admins can only read their own actions"""
+    response = authenticated_client.get("/api/v1/audit", params={"actor_id": test_manager.id})
+    assert response.status_code == 403
+
+def test_full_buffer_spills_to_disk(tmp_path, test_category, db_session, session_factory):
+    """Test that entries overflowing the buffer are kept on disk and replayed"""
+    log = AuditLog(session_factory, spill_path=str(tmp_path / "spill.jsonl"), buffer_size=2, batch_size=2)
+    for i in range(5):
+        log.record(1, f"action.{i}", test_category)
+    
+    assert log.pending() == 2
+    assert len((tmp_path / "spill.jsonl").read_text().splitlines()) == 3
+    
+    assert log.flush() == 5
+    assert not (tmp_path / "spill.jsonl").exists()
+    entries = db_session.query(AuditEntry).order_by(AuditEntry.occurred_at, AuditEntry.id).all()
+    assert sorted(e.action for e in entries) == [f"action.{i}" for i in range(5)]
+    assert {(e.entity_type, e.entity_id) for e in entries} == {("category", test_category.id)}
+
+def test_failed_flush_spills_batch(tmp_path, test_category, db_session, session_factory):
+    """Test that a batch that can't be written is spilled rather than lost"""
+    def database_down():
+        raise ConnectionError("database unavailable")
+    
+    log = AuditLog(database_down, spill_path=str(tmp_path / "spill.jsonl"))
+    log.record(1, "category.created", test_category, {"name": "Travel"})
+    assert log.flush() == 0
+    assert log.pending() == 0
+    
+    # A torn line from a crash mid-write is skipped on replay
+    with (tmp_path / "spill.jsonl").open("a") as handle:
+        handle.write('{"occurred_at": "2024-')
+    
+    log.session_factory = session_factory
+    assert log.flush() == 1
+    entry = db_session.query(AuditEntry).one()
+    assert entry.action == "category.created"
+    assert entry.details == '{"name": "Travel"}'
+
+def test_workers_sharing_a_spill_file_replay_it_once(tmp_path, test_category, db_session, session_factory):
+    """Test that two workers sharing the spill file neither duplicate nor lose entries"""
+    spill_path = str(tmp_path / "spill.jsonl")
+    first = AuditLog(session_factory, spill_path=spill_path, buffer_size=1)
+    second = AuditLog(session_factory, spill_path=spill_path, buffer_size=1)
+    first.record(1, "buffered.first", test_category)
+    second.record(1, "buffered.second", test_category)
+    first.record(1, "spilled.first", test_category)
+    second.record(1, "spilled.second", test_category)
+    
+    insert = first._insert
+    during_replay = []
+    
+    def insert_while_second_flushes(entries):
+        # The second worker flushes and spills while the first is mid-replay
+        if not during_replay:
+            second.record(1, "spilled.later", test_category)
+            during_replay.append(second.flush())
+        insert(entries)
+    
+    first._insert = insert_while_second_flushes
+    assert first.flush() == 3
+    assert during_replay == [1]
+    assert second.flush() == 1
+    
+    actions = sorted(e.action for e in db_session.query(AuditEntry).all())
+    assert actions == ["buffered.first", "buffered.second", "spilled.first", "spilled.later", "spilled.second"]
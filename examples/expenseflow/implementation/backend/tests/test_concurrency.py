@@ -0,0 +1,138 @@
+import threading
+from datetime import datetime
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.main import app
+from app.core.database import Base, get_db
+from app.core.security import create_access_token
+from app.models.user import User
+from app.models.expense import Expense, Category, Approval
+
+@pytest.fixture
+def file_db(tmp_path, monkeypatch):
+    """A pooled file database so concurrent requests use separate connections"""
+    engine = create_engine(
+        f"sqlite:///{tmp_path / 'concurrency.db'}",
+        connect_args={"check_same_thread": False, "timeout": 30},
+    )
+    Base.metadata.create_all(bind=engine)
+    factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    
+    def override_get_db():
+        db = factory()
+        try:
+            yield db
+        finally:
+            db.close()
+    
+    monkeypatch.setitem(app.dependency_overrides, get_db, override_get_db)
+    return factory
+
+@pytest.fixture
+def pending_approval(file_db):
+    db = file_db()
+    manager = User(email="boss@example.com", username="boss", full_name="Boss",
+                   hashed_password="x")
+    db.add(manager)
+    db.flush()
+    employee = User(email="emp@example.com", username="emp", full_name="Employee",
+                    hashed_password="x", manager_id=manager.id)
+    category = Category(name="Travel")
+    db.add_all([employee, category])
+    db.flush()
+    expense = Expense(amount=120.00, description="Train", expense_date=datetime(2024, 1, 15),
+                      category_id=category.id, employee_id=employee.id, status="submitted")
+    db.add(expense)
+    db.flush()
+    approval = Approval(expense_id=expense.id, approver_id=manager.id, status="pending")
+    db.add(approval)
+    db.commit()
+    approval_id, expense_id = approval.id, expense.id
+    db.close()
+    return approval_id, expense_id
+
+def run_concurrently(requests_to_make):
+    barrier = threading.Barrier(len(requests_to_make))
+    results = [None] * len(requests_to_make)
+    
+    def worker(index, call):
+        client = TestClient(app)
+        barrier.wait()
+        results[index] = call(client)
+    
+    threads = [threading.Thread(target=worker, args=(i, call))
+               for i, call in enumerate(requests_to_make)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+def test_concurrent_approve_and_reject(file_db, pending_approval):
+    """Test that exactly one of many racing approve/reject calls wins"""
+    approval_id, expense_id = pending_approval
+    headers = {"Authorization": f"Bearer {create_access_token({'sub': 'boss@example.com'})}"}
+    
+    def approve(client):
+        return client.post(f"/api/v1/approvals/{approval_id}/approve", headers=headers)
+    
+    def reject(client):
+        return client.post(
+            f"/api/v1/approvals/{approval_id}/reject", params={"comments": "No"}, headers=headers
+        )
+    
+    responses = run_concurrently([approve, reject] * 8)
+    codes = [response.status_code for response in responses]
+    
+    assert codes.count(200) == 1
+    assert set(codes) <= {200, 400, 409}
+    
+    db = file_db()
+    approval = db.query(Approval).get(approval_id)
+    expense = db.query(Expense).get(expense_id)
+    assert approval.version == 2
+    assert expense.version == 2
+    assert approval.status == expense.status
+    db.close()
+
+def test_concurrent_submit(file_db, pending_approval):
+    """Test that a draft is submitted once even when submit races"""
+    db = file_db()
+    employee = db.query(User).filter(User.email == "emp@example.com").one()
+    draft = Expense(amount=30.00, description="Taxi", expense_date=datetime(2024, 1, 16),
+                    category_id=1, employee_id=employee.id, status="draft")
+    db.add(draft)
+    db.commit()
+    draft_id = draft.id
+    db.close()
+    
+    headers = {"Authorization": f"Bearer {create_access_token({'sub': 'emp@example.com'})}"}
+    
+    def submit(client):
+        return client.post(f"/api/v1/expenses/{draft_id}/submit", headers=headers)
+    
+    codes = [response.status_code for response in run_concurrently([submit] * 10)]
+    assert codes.count(200) == 1
+    
+    db = file_db()
+    assert db.query(Approval).filter(Approval.expense_id == draft_id).count() == 1
+    db.close()
+
+def test_update_with_stale_version(authenticated_client, test_category, test_user, db_session):
+    """Test that an update based on an old version is rejected"""
+    expense = Expense(amount=10.00, description="Coffee", expense_date=datetime(2024, 1, 15),
+                      category_id=test_category.id, employee_id=test_user.id, status="draft")
+    db_session.add(expense)
+    db_session.commit()
+    url = f"/api/v1/expenses/{expense.id}"
+    
+    response = authenticated_client.put(url, json={"amount": 11.00, "version": 1})
+    assert response.status_code == 200
+    assert response.json()["version"] == 2
+    
+    response = authenticated_client.put(url, json={"amount": 12.00, "version": 1})
+    assert response.status_code == 409
@@ -0,0 +1,73 @@
+from datetime import datetime
+
+import pytest
+
+@pytest.fixture
+def draft_expense(make_expense):
+    return make_expense(amount=100.00)
+
+def test_get_expense_etag(authenticated_client, draft_expense):
+    """Test that a matching If-None-Match returns 304 with no body"""
+    url = f"/api/v1/expenses/{draft_expense.id}"
+    response = authenticated_client.get(url)
+    assert response.status_code == 200
+    etag = response.headers["ETag"]
+    assert "Last-Modified" in response.headers
+    
+    response = authenticated_client.get(url, headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.content == b""
+    assert response.headers["ETag"] == etag
+
+def test_etag_depends_on_media_type(authenticated_client, draft_expense):
+    """Test that a JSON ETag doesn't revalidate a msgpack request"""
+    url = f"/api/v1/expenses/{draft_expense.id}"
+    etag = authenticated_client.get(url).headers["ETag"]
+    msgpack_headers = {"Accept": "application/msgpack"}
+    
+    response = authenticated_client.get(url, headers={**msgpack_headers, "If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+    
+    response = authenticated_client.get(url, headers={**msgpack_headers, "If-None-Match": response.headers["ETag"]})
+    assert response.status_code == 304
+    assert response.headers["Vary"] == "Accept, Accept-Encoding"
+
+def test_get_expense_etag_changes_on_update(authenticated_client, draft_expense):
+    """Test that updating an expense invalidates its ETag"""
+    url = f"/api/v1/expenses/{draft_expense.id}"
+    etag = authenticated_client.get(url).headers["ETag"]
+    
+    authenticated_client.put(url, json={"description": "Hotel, 2 nights"})
+    
+    response = authenticated_client.get(url, headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+    assert response.json()["description"] == "Hotel, 2 nights"
+
+def test_get_expense_if_modified_since(authenticated_client, draft_expense):
+    """Test Last-Modified based revalidation"""
+    url = f"/api/v1/expenses/{draft_expense.id}"
+    last_modified = authenticated_client.get(url).headers["Last-Modified"]
+    
+    response = authenticated_client.get(url, headers={"If-Modified-Since": last_modified})
+    assert response.status_code == 304
+    
+    response = authenticated_client.get(
+        url, headers={"If-Modified-Since": "Mon, 01 Jan 2001 00:00:00 GMT"}
+    )
+    assert response.status_code == 200
+
+def test_list_etag(authenticated_client, draft_expense, make_expense):
+    """Test that the collection validator changes when the page changes"""
+    response = authenticated_client.get("/api/v1/expenses")
+    etag = response.headers["ETag"]
+    
+    response = authenticated_client.get("/api/v1/expenses", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    
+    make_expense(amount=20.00, description="Lunch", expense_date=datetime(2024, 1, 16))
+    
+    response = authenticated_client.get("/api/v1/expenses", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert len(response.json()) == 2
@@ -0,0 +1,121 @@
+from datetime import date, datetime
+
+import numpy as np
+import pytest
+from sqlalchemy import create_engine, text
+
+from app.api.v1 import reports
+from app.core.money import to_minor_units, from_minor_units
+from app.models.expense import Expense
+from app.services.fx import FxRateCache, FxRateNotFound, FxRateTable, to_days
+from app.services.minor_units import migrate_amounts
+from app.services.reports import convert_minor_units
+
+RATES_CSV = """date,currency,rate
+2024-01-01,EUR,0.90
+2024-02-01,EUR,0.80
+2024-01-01,JPY,150
+"""
+
+@pytest.fixture
+def rates():
+    return FxRateTable.from_rows("USD", [
+        (date(2024, 1, 1), "EUR", 0.90),
+        (date(2024, 2, 1), "EUR", 0.80),
+        (date(2024, 1, 1), "JPY", 150),
+    ])
+
+def test_minor_units():
+    """Test exact conversion to and from minor units"""
+    assert to_minor_units(99.99, "USD") == 9999
+    assert to_minor_units(0.1 + 0.2, "USD") == 30
+    assert to_minor_units(1500, "JPY") == 1500
+    assert to_minor_units("1.2345", "KWD") == 1235
+    assert str(from_minor_units(9999, "USD")) == "99.99"
+
+def test_expense_amount_stored_in_minor_units():
+    """Test that the model keeps amounts as integer minor units"""
+    expense = Expense(amount=12.34, currency="EUR")
+    assert expense.amount_minor == 1234
+    assert expense.amount == 12.34
+    
+    expense = Expense(amount=1500, currency="JPY")
+    assert expense.amount_minor == 1500
+    assert expense.amount == 1500
+
+def test_rate_lookup_uses_latest_effective_rate(rates):
+    """Test date-indexed rate lookup"""
+    assert rates.rate("EUR", date(2024, 1, 15)) == 0.90
+    assert rates.rate("EUR", date(2024, 2, 1)) == 0.80
+    assert rates.rate("EUR", date(2025, 6, 1)) == 0.80
+    assert rates.rate("USD", date(1999, 1, 1)) == 1.0
+    
+    with pytest.raises(FxRateNotFound):
+        rates.rate("EUR", date(2023, 12, 31))
+    with pytest.raises(FxRateNotFound):
+        rates.rate("GBP", date(2024, 1, 15))
+
+def test_vectorized_conversion(rates):
+    """Test that bulk conversion matches row-by-row conversion"""
+    amounts = np.array([1000, 900, 15000, 800], dtype=np.int64)
+    currencies = np.array(["USD", "EUR", "JPY", "EUR"])
+    days = to_days([date(2024, 1, 10), date(2024, 1, 10), date(2024, 1, 10), date(2024, 2, 10)])
+    
+    converted = convert_minor_units(amounts, currencies, days, "USD", rates)
+    assert converted.tolist() == [1000, 1000, 10000, 1000]
+    
+    converted = convert_minor_units(amounts, currencies, days, "JPY", rates)
+    assert converted.tolist() == [1500, 1500, 15000, 1500]
+
+def test_rate_cache_reloads_changed_files(tmp_path):
+    """Test that rate files are cached until they change"""
+    path = tmp_path / "rates.csv"
+    path.write_text(RATES_CSV)
+    cache = FxRateCache(str(tmp_path), "USD")
+    
+    table = cache.get()
+    assert cache.get() is table
+    
+    path.write_text(RATES_CSV + "2024-03-01,EUR,0.95\n")
+    assert cache.get().rate("EUR", date(2024, 3, 2)) == 0.95
+
+def test_report_totals(authenticated_client, make_expense, tmp_path, monkeypatch):
+    """Test converted totals grouped by status"""
+    (tmp_path / "rates.csv").write_text(RATES_CSV)
+    monkeypatch.setattr(reports, "fx_rates", FxRateCache(str(tmp_path), "USD"))
+    
+    for amount, currency, status in [(10, "USD", "draft"), (9, "EUR", "draft"), (1500, "JPY", "approved")]:
+        make_expense(amount=amount, currency=currency, expense_date=datetime(2024, 1, 20), status=status)
+    
+    response = authenticated_client.get("/api/v1/reports/totals", params={"currency": "usd"})
+    assert response.status_code == 200
+    data = response.json()
+    assert data["currency"] == "USD"
+    assert data["total"] == 30.00
+    assert data["count"] == 3
+    assert {g["group"]: g["total"] for g in data["groups"]} == {"approved": 10.00, "draft": 20.00}
+    
+    response = authenticated_client.get("/api/v1/reports/totals", params={"currency": "GBP"})
+    assert response.status_code == 422
+
+def test_migrate_float_amounts(tmp_path):
+    """Test that a pre-minor-units expenses table is converted in batches"""
+    engine = create_engine(f"sqlite:///{tmp_path / 'old.db'}")
+    with engine.begin() as connection:
+        connection.execute(text(
+            "CREATE TABLE expenses (id INTEGER PRIMARY KEY, amount FLOAT NOT NULL, currency VARCHAR(3) NOT NULL)"
+        ))
+        connection.execute(text("INSERT INTO expenses (amount, currency) VALUES (:amount, :currency)"), [
+            {"amount": 0.1 + 0.2, "currency": "USD"},
+            {"amount": 1500.0, "currency": "JPY"},
+            {"amount": 1.2345, "currency": "KWD"},
+        ])
+    
+    assert migrate_amounts(engine, batch_size=2) == 3
+    with engine.connect() as connection:
+        rows = connection.execute(text("SELECT * FROM expenses ORDER BY id")).mappings().all()
+    assert [row["amount_minor"] for row in rows] == [30, 1500, 1235]
+    assert "amount" not in rows[0]
+    
+    # Running it again is a no-op
+    assert migrate_amounts(engine) == 0
@@ -0,0 +1,108 @@
+import pytest
+
+from app.core.security import get_password_hash
+from app.models.user import User
+from app.services import directory
+
+@pytest.fixture
+def admin_client(client, test_manager):
+    response = client.post(
+        "/api/v1/auth/login",
+        data={"username": test_manager.email, "password": "managerpassword"}
+    )
+    client.headers.update({"Authorization": f"Bearer {response.json()['access_token']}"})
+    return client
+
+@pytest.fixture
+def departed_user(db_session):
+    user = User(
+        email="old@example.com",
+        username="old",
+        full_name="Former Employee",
+        hashed_password=get_password_hash("oldpassword")
+    )
+    db_session.add(user)
+    db_session.commit()
+    return user
+
+SNAPSHOT = {"users": [
+    {"email": "test@example.com", "username": "testuser", "full_name": "Test User",
+     "department": "Finance", "manager_email": "lead@example.com"},
+    {"email": "lead@example.com", "username": "lead", "full_name": "Team Lead",
+     "password": "leadpassword", "manager_email": "manager@example.com"},
+    {"email": "new@example.com", "username": "newhire", "full_name": "New Hire",
+     "manager_email": "lead@example.com"},
+]}
+
+def test_sync_applies_snapshot(admin_client, test_user, test_manager, departed_user, db_session, monkeypatch):
+    """Test that a snapshot creates, updates, deactivates and rewires managers"""
+    hashed = []
+    monkeypatch.setattr(directory, "get_password_hash", lambda password: hashed.append(password) or get_password_hash(password))
+    
+    response = admin_client.post("/api/v1/users/sync", json=SNAPSHOT)
+    
+    assert response.status_code == 200
+    assert response.json() == {
+        "created": 2, "updated": 1, "deactivated": 1, "unchanged": 0, "managers_changed": 3
+    }
+    # Only the new accounts were hashed
+    assert len(hashed) == 2
+    
+    users = {user.email: user for user in db_session.query(User)}
+    assert users["test@example.com"].department == "Finance"
+    assert users["test@example.com"].manager_id == users["lead@example.com"].id
+    assert users["new@example.com"].manager_id == users["lead@example.com"].id
+    assert users["lead@example.com"].manager_id == test_manager.id
+    assert not users["old@example.com"].is_active
+    # Admins missing from the snapshot are left alone
+    assert users["manager@example.com"].is_active
+    
+    response = admin_client.post(
+        "/api/v1/auth/login",
+        data={"username": "lead@example.com", "password": "leadpassword"}
+    )
+    assert response.status_code == 200
+
+def test_sync_is_idempotent(admin_client, test_user, test_manager):
+    """Test that replaying the same snapshot changes nothing"""
+    admin_client.post("/api/v1/users/sync", json=SNAPSHOT)
+    
+    response = admin_client.post("/api/v1/users/sync", json=SNAPSHOT)
+    assert response.json() == {
+        "created": 0, "updated": 0, "deactivated": 0, "unchanged": 3, "managers_changed": 0
+    }
+
+def test_sync_rejects_manager_cycles(admin_client, test_user, db_session):
+    """Test that an invalid snapshot is rejected without changing anything"""
+    response = admin_client.post("/api/v1/users/sync", json={"users": [
+        {"email": "a@example.com", "username": "a", "full_name": "A", "manager_email": "b@example.com"},
+        {"email": "b@example.com", "username": "b", "full_name": "B", "manager_email": "a@example.com"},
+    ]})
+    
+    assert response.status_code == 422
+    assert "loops back" in response.json()["detail"][0]
+    assert db_session.query(User).count() == 2
+
+def test_sync_requires_admin(authenticated_client):
+    """Test that only admins can sync the directory"""
+    response = authenticated_client.post("/api/v1/users/sync", json=SNAPSHOT)
+    assert response.status_code == 403
+
+def test_sync_swaps_usernames(admin_client, test_user, test_manager, departed_user, db_session):
+    """Test that usernames can move between users within one snapshot"""
+    response = admin_client.post("/api/v1/users/sync", json={"users": [
+        {"email": "test@example.com", "username": "manager", "full_name": "Test User"},
+        {"email": "manager@example.com", "username": "old", "full_name": "Test Manager"},
+        {"email": "old@example.com", "username": "testuser", "full_name": "Former Employee"},
+        {"email": "new@example.com", "username": "newhire", "full_name": "New Hire"},
+    ]})
+    
+    assert response.status_code == 200
+    assert response.json()["updated"] == 3
+    usernames = {user.email: user.username for user in db_session.query(User)}
+    assert usernames == {
+        "test@example.com": "manager",
+        "manager@example.com": "old",
+        "old@example.com": "testuser",
+        "new@example.com": "newhire",
+    }
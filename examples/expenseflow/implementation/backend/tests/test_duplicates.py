@@ -0,0 +1,77 @@
+from datetime import datetime, timedelta
+
+from app.models.duplicate import ExpenseDuplicate
+from app.services.duplicates import (
+    normalize_description, record_duplicates, scan_duplicates, shingle_hashes, similarity
+)
+
+# The date make_expense gives expenses by default
+DAY = datetime(2024, 1, 15)
+
+def test_similarity_ignores_case_and_punctuation():
+    """Test that normalization makes cosmetic edits score as identical"""
+    assert normalize_description("  Taxi -- Café to JFK! ") == "taxi cafe to jfk"
+    assert similarity(shingle_hashes("Taxi to JFK"), shingle_hashes("taxi to jfk.")) == 1.0
+    assert similarity(shingle_hashes("Taxi to JFK"), shingle_hashes("Hotel in Boston")) < 0.2
+
+def test_create_expense_reports_possible_duplicates(authenticated_client, make_expense, test_category):
+    """Test that creating a near-identical expense returns the original as a candidate"""
+    original_id = make_expense(description="Taxi to JFK airport", status="submitted").id
+    make_expense(description="Taxi to JFK airport", amount=43.00)
+    make_expense(description="Team lunch")
+    
+    response = authenticated_client.post("/api/v1/expenses", json={
+        "amount": 42.00,
+        "description": "taxi to JFK Airport.",
+        "expense_date": (DAY + timedelta(days=1)).isoformat(),
+        "category_id": test_category.id
+    })
+    
+    assert response.status_code == 200
+    candidates = response.json()["possible_duplicates"]
+    assert [c["expense_id"] for c in candidates] == [original_id]
+    assert candidates[0]["score"] == 1.0
+
+def test_submit_records_duplicates(authenticated_client, make_expense, db_session):
+    """Test that submitting a duplicate stores the pair for review"""
+    original_id = make_expense(description="Hotel Marriott Boston", status="approved").id
+    repeat_id = make_expense(description="Marriott hotel Boston", expense_date=DAY + timedelta(days=2)).id
+    
+    response = authenticated_client.post(f"/api/v1/expenses/{repeat_id}/submit")
+    
+    assert response.status_code == 200
+    assert [c["expense_id"] for c in response.json()["possible_duplicates"]] == [original_id]
+    pair = db_session.query(ExpenseDuplicate).one()
+    assert (pair.expense_id, pair.duplicate_of_id) == (repeat_id, original_id)
+
+def test_scan_duplicates_is_incremental(make_expense, db_session, session_factory):
+    """Test that the batch scan finds historical pairs and resumes from its checkpoint"""
+    first = make_expense(description="Dinner with client").id
+    second = make_expense(description="Dinner with client", expense_date=DAY + timedelta(days=1)).id
+    make_expense(description="Dinner with client", expense_date=DAY + timedelta(days=30))
+    make_expense(description="Dinner with client", status="rejected")
+    
+    assert scan_duplicates(session_factory, batch_size=2) == 1
+    assert scan_duplicates(session_factory, batch_size=2) == 0
+    
+    third = make_expense(description="dinner w/ client", expense_date=DAY + timedelta(days=2)).id
+    assert scan_duplicates(session_factory, batch_size=2) == 2
+    
+    pairs = {(p.expense_id, p.duplicate_of_id) for p in db_session.query(ExpenseDuplicate)}
+    assert pairs == {(second, first), (third, first), (third, second)}
+
+def test_record_duplicates_skips_pairs_stored_concurrently(make_expense, db_session, session_factory):
+    """Test that a pair another transaction already stored is skipped, not an IntegrityError"""
+    first = make_expense(description="Taxi to airport").id
+    second = make_expense(description="Taxi to airport").id
+    db_session.add(ExpenseDuplicate(expense_id=second, duplicate_of_id=first, score=1.0))
+    db_session.commit()
+    
+    db = session_factory()
+    try:
+        assert record_duplicates(db, [(first, second, 1.0)]) == 0
+        assert record_duplicates(db, [(first, second, 1.0)], reason="receipt") == 1
+        db.commit()
+    finally:
+        db.close()
+    assert db_session.query(ExpenseDuplicate).count() == 2
@@ -0,0 +1,103 @@
+import gzip
+import zlib
+
+import anyio
+import msgpack
+import pytest
+from fastapi import FastAPI
+from fastapi.responses import StreamingResponse
+from fastapi.testclient import TestClient
+
+from app.core.encoding import ContentNegotiationMiddleware, negotiate_encoding
+
+@pytest.fixture
+def many_expenses(make_expense):
+    for i in range(30):
+        make_expense(amount=10.00 + i, description=f"Team lunch {i}")
+
+def test_negotiate_encoding():
+    """Test encoding preference order and q-values"""
+    assert negotiate_encoding("gzip, deflate, br") == "br"
+    assert negotiate_encoding("gzip") == "gzip"
+    assert negotiate_encoding("br;q=0, gzip") == "gzip"
+    assert negotiate_encoding("identity") is None
+    assert negotiate_encoding(None) is None
+
+@pytest.mark.parametrize("encoding", ["gzip", "br"])
+def test_large_list_is_compressed(authenticated_client, many_expenses, encoding):
+    """Test that large list responses are compressed"""
+    response = authenticated_client.get(
+        "/api/v1/expenses", headers={"Accept-Encoding": encoding}
+    )
+    assert response.status_code == 200
+    assert response.headers["Content-Encoding"] == encoding
+    assert "Accept-Encoding" in response.headers["Vary"]
+    assert response.headers["ETag"].startswith("W/")
+    assert len(response.json()) == 30
+
+def test_small_response_is_not_compressed(authenticated_client):
+    """Test that responses below the size threshold are sent as-is"""
+    response = authenticated_client.get(
+        "/api/v1/categories", headers={"Accept-Encoding": "gzip"}
+    )
+    assert response.status_code == 200
+    assert "Content-Encoding" not in response.headers
+
+def test_msgpack_representation(authenticated_client, many_expenses):
+    """Test that clients can negotiate msgpack instead of JSON"""
+    json_body = authenticated_client.get("/api/v1/expenses").json()
+    
+    response = authenticated_client.get(
+        "/api/v1/expenses", headers={"Accept": "application/msgpack"}
+    )
+    assert response.status_code == 200
+    assert response.headers["Content-Type"] == "application/msgpack"
+    assert msgpack.unpackb(response.content) == json_body
+
+def test_streaming_response_compressed_incrementally():
+    """Test that streamed chunks are compressed and flushed one by one"""
+    chunks = [b"x" * 2048, b"y" * 2048, b"z" * 2048]
+    sent = []
+    
+    app = FastAPI()
+    app.add_middleware(ContentNegotiationMiddleware)
+    
+    @app.get("/stream")
+    def stream():
+        return StreamingResponse(iter(chunks), media_type="text/plain")
+    
+    async def receive():
+        await anyio.sleep_forever()
+    
+    async def send(message):
+        sent.append(message)
+    
+    scope = {
+        "type": "http", "method": "GET", "path": "/stream", "raw_path": b"/stream",
+        "root_path": "", "scheme": "http", "query_string": b"", "http_version": "1.1",
+        "headers": [(b"accept-encoding", b"gzip")], "client": ("test", 1), "server": ("test", 80),
+    }
+    anyio.run(app, scope, receive, send)
+    
+    start = sent[0]
+    bodies = [message for message in sent[1:] if message["type"] == "http.response.body"]
+    assert (b"content-encoding", b"gzip") in start["headers"]
+    assert all(message["body"] for message in bodies[:3])
+    assert gzip.decompress(b"".join(message["body"] for message in bodies)) == b"".join(chunks)
+    
+    # The first chunk decodes on its own, so it was flushed rather than buffered
+    decoder = zlib.decompressobj(zlib.MAX_WBITS | 16)
+    assert decoder.decompress(bodies[0]["body"]) == chunks[0]
+
+def test_event_stream_is_not_compressed():
+    """Test that server-sent events are passed through uncompressed"""
+    app = FastAPI()
+    app.add_middleware(ContentNegotiationMiddleware, minimum_size=0)
+    
+    @app.get("/events")
+    def events():
+        return StreamingResponse(iter([b"data: 1\n\n", b"data: 2\n\n"]), media_type="text/event-stream")
+    
+    response = TestClient(app).get("/events", headers={"Accept-Encoding": "gzip"})
+    assert "Content-Encoding" not in response.headers
+    assert response.text == "data: 1\n\ndata: 2\n\n"
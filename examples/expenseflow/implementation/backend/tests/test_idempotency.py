@@ -0,0 +1,127 @@
+import threading
+import time
+
+import pytest
+
+from app.api.v1 import expenses
+from app.core.config import settings
+from app.core import idempotency
+from app.core.idempotency import IdempotencyStore, MemoryIdempotencyStore, idempotency_store
+from app.models.expense import Expense
+
+@pytest.fixture
+def expense_data(test_category):
+    return {
+        "amount": 42.00,
+        "description": "Taxi",
+        "expense_date": "2024-01-15T00:00:00",
+        "category_id": test_category.id
+    }
+
+def test_retry_replays_first_response(authenticated_client, expense_data, db_session):
+    """Test that a retried POST returns the stored response without a duplicate"""
+    headers = {"Idempotency-Key": "create-taxi-1"}
+    
+    first = authenticated_client.post("/api/v1/expenses", json=expense_data, headers=headers)
+    second = authenticated_client.post("/api/v1/expenses", json=expense_data, headers=headers)
+    
+    assert first.status_code == 200
+    assert second.status_code == 200
+    assert second.json() == first.json()
+    assert second.headers["Idempotent-Replayed"] == "true"
+    assert db_session.query(Expense).count() == 1
+
+def test_requests_without_key_are_not_deduplicated(authenticated_client, expense_data, db_session):
+    """Test that requests without the header behave as before"""
+    authenticated_client.post("/api/v1/expenses", json=expense_data)
+    authenticated_client.post("/api/v1/expenses", json=expense_data)
+    
+    assert db_session.query(Expense).count() == 2
+
+def test_key_reused_for_different_body(authenticated_client, expense_data):
+    """Test that a key cannot be reused for a different request"""
+    headers = {"Idempotency-Key": "create-taxi-2"}
+    authenticated_client.post("/api/v1/expenses", json=expense_data, headers=headers)
+    
+    expense_data["amount"] = 43.00
+    response = authenticated_client.post("/api/v1/expenses", json=expense_data, headers=headers)
+    assert response.status_code == 422
+
+def test_concurrent_duplicates_wait_for_first(authenticated_client, expense_data, db_session, monkeypatch):
+    """Test that an in-flight duplicate waits and replays instead of racing"""
+    original = expenses.create_expense
+    
+    def slow_create_expense(*args, **kwargs):
+        time.sleep(0.3)
+        return original(*args, **kwargs)
+    
+    route = next(r for r in authenticated_client.app.routes
+                 if getattr(r, "path", None) == "/api/v1/expenses" and "POST" in r.methods)
+    monkeypatch.setattr(route.dependant, "call", slow_create_expense)
+    
+    headers = {"Idempotency-Key": "create-taxi-3"}
+    responses = []
+    
+    def post():
+        responses.append(
+            authenticated_client.post("/api/v1/expenses", json=expense_data, headers=headers)
+        )
+    
+    threads = [threading.Thread(target=post) for _ in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    
+    assert [r.status_code for r in responses] == [200, 200]
+    assert responses[0].json() == responses[1].json()
+    assert sum("Idempotent-Replayed" in r.headers for r in responses) == 1
+    assert db_session.query(Expense).count() == 1
+
+def test_memory_store_evicts_least_recently_used():
+    """Test that the in-process fallback is bounded"""
+    store = MemoryIdempotencyStore(max_keys=2)
+    store.set("a", {"state": "done"}, 60)
+    store.set("b", {"state": "done"}, 60)
+    store.get("a")
+    store.set("c", {"state": "done"}, 60)
+    
+    assert store.get("a") is not None
+    assert store.get("b") is None
+    assert store.get("c") is not None
+
+def test_oversized_body_is_rejected(authenticated_client, expense_data, monkeypatch):
+    """Test that bodies over the cap are refused instead of buffered"""
+    monkeypatch.setattr(settings, "IDEMPOTENCY_MAX_BODY_BYTES", 64)
+    expense_data["description"] = "Taxi" * 50
+    
+    response = authenticated_client.post(
+        "/api/v1/expenses", json=expense_data, headers={"Idempotency-Key": "too-big"}
+    )
+    assert response.status_code == 413
+
+def test_auth_responses_are_not_stored(client, test_user):
+    """Test that tokens from auth routes never end up in the idempotency store"""
+    headers = {"Idempotency-Key": "login-1"}
+    data = {"username": test_user.email, "password": "testpassword"}
+    
+    first = client.post("/api/v1/auth/login", data=data, headers=headers)
+    second = client.post("/api/v1/auth/login", data=data, headers=headers)
+    
+    assert "Idempotent-Replayed" not in second.headers
+    assert second.json()["refresh_token"] != first.json()["refresh_token"]
+    assert idempotency_store.memory.get("ip:testclient:login-1") is None
+
+@pytest.mark.asyncio
+async def test_memory_fallback_is_logged(caplog, monkeypatch):
+    """Test that falling back to per-process records is reported, once per interval"""
+    async def redis_down():
+        return None
+    
+    monkeypatch.setattr(idempotency, "get_async_redis", redis_down)
+    store = IdempotencyStore()
+    
+    assert await store.reserve("user:1:key", "abc") is None
+    assert (await store.reserve("user:1:key", "abc"))["state"] == "pending"
+    warnings = [r for r in caplog.records if "not deduplicated" in r.getMessage()]
+    assert len(warnings) == 1
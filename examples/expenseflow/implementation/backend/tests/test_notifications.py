@@ -0,0 +1,73 @@
+import asyncio
+
+import pytest
+
+from app.api.v1.notifications import event_stream
+from app.services.notifications import NotificationHub
+
+def make_message(event_type="expense.submitted", employee_id=1, approver_id=2):
+    return {
+        "id": 7,
+        "type": event_type,
+        "aggregate_type": "expense",
+        "aggregate_id": 42,
+        "payload": {"expense_id": 42, "employee_id": employee_id, "approver_id": approver_id}
+    }
+
+class FakeRequest:
+    def __init__(self):
+        self.disconnected = False
+    
+    async def is_disconnected(self):
+        return self.disconnected
+
+@pytest.mark.asyncio
+async def test_hub_delivers_to_employee_and_approver():
+    """Test that events reach only the users they concern"""
+    hub = NotificationHub()
+    employee, approver, bystander = hub.connect(1), hub.connect(2), hub.connect(3)
+    
+    hub.handle_event(make_message())
+    await asyncio.sleep(0)
+    
+    assert (await employee.get())["type"] == "expense.submitted"
+    assert (await approver.get())["aggregate_id"] == 42
+    assert bystander.empty()
+
+@pytest.mark.asyncio
+async def test_hub_disconnect():
+    """Test that disconnected clients stop receiving events"""
+    hub = NotificationHub()
+    queue = hub.connect(1)
+    hub.disconnect(1, queue)
+    
+    hub.handle_event(make_message())
+    await asyncio.sleep(0)
+    
+    assert queue.empty()
+    assert hub.connection_count() == 0
+
+@pytest.mark.asyncio
+async def test_event_stream_formats_sse():
+    """Test that queued events are written as server-sent events"""
+    hub = NotificationHub()
+    request = FakeRequest()
+    stream = event_stream(request, hub, user_id=2)
+    
+    assert (await stream.__anext__()).startswith("retry:")
+    
+    hub.deliver([2], make_message("expense.approved"))
+    chunk = await stream.__anext__()
+    assert chunk.startswith("id: 7\nevent: expense.approved\ndata: ")
+    assert chunk.endswith("\n\n")
+    
+    request.disconnected = True
+    with pytest.raises(StopAsyncIteration):
+        await stream.__anext__()
+    assert hub.connection_count() == 0
+
+def test_stream_requires_authentication(client):
+    """Test that the stream rejects anonymous and invalid tokens"""
+    assert client.get("/api/v1/notifications/stream").status_code == 401
+    response = client.get("/api/v1/notifications/stream", params={"access_token": "invalid"})
+    assert response.status_code == 401
@@ -0,0 +1,147 @@
+from datetime import datetime, timedelta
+
+import pytest
+import redis
+
+from app.core.config import settings
+from app.models.expense import Approval
+from app.models.outbox import OutboxEvent
+from app.services import outbox
+from app.services.outbox import OutboxRelay, prune_published, subscribe, unsubscribe
+
+@pytest.fixture(autouse=True)
+def without_stream(monkeypatch):
+    # No Redis here: relay to in-process subscribers only unless a test opts in
+    monkeypatch.setattr(settings, "OUTBOX_STREAM", "")
+
+@pytest.fixture
+def received():
+    events = []
+    subscribe(events.append)
+    yield events
+    unsubscribe(events.append)
+
+@pytest.fixture
+def draft_expense(make_expense, test_user, test_manager):
+    test_user.manager_id = test_manager.id
+    return make_expense(amount=75.00, description="Conference ticket")
+
+def test_submit_writes_outbox_event(authenticated_client, draft_expense, db_session):
+    """Test that submitting records an event in the same transaction"""
+    response = authenticated_client.post(f"/api/v1/expenses/{draft_expense.id}/submit")
+    assert response.status_code == 200
+    
+    event = db_session.query(OutboxEvent).one()
+    assert event.event_type == "expense.submitted"
+    assert event.aggregate_id == draft_expense.id
+    assert event.published_at is None
+
+def test_failed_transition_writes_no_event(authenticated_client, draft_expense, db_session):
+    """Test that a rejected state change leaves no event behind"""
+    draft_expense.status = "submitted"
+    db_session.commit()
+    
+    response = authenticated_client.post(f"/api/v1/expenses/{draft_expense.id}/submit")
+    assert response.status_code == 400
+    assert db_session.query(OutboxEvent).count() == 0
+
+def test_relay_publishes_in_batches(authenticated_client, draft_expense, db_session, session_factory, received):
+    """Test that the relay delivers pending events and marks them published"""
+    authenticated_client.post(f"/api/v1/expenses/{draft_expense.id}/submit")
+    approval = db_session.query(Approval).one()
+    
+    relay = OutboxRelay(session_factory, batch_size=10)
+    assert relay.relay_once() == 1
+    assert relay.relay_once() == 0
+    
+    assert len(received) == 1
+    message = received[0]
+    assert message["type"] == "expense.submitted"
+    assert message["payload"]["approver_id"] == approval.approver_id
+    
+    db_session.expire_all()
+    assert db_session.query(OutboxEvent).one().published_at is not None
+
+def test_relay_respects_batch_size(db_session, session_factory, received):
+    """Test that a backlog is drained one batch at a time"""
+    for i in range(5):
+        db_session.add(OutboxEvent(
+            event_type="expense.approved",
+            aggregate_type="expense",
+            aggregate_id=i,
+            payload="{}"
+        ))
+    db_session.commit()
+    
+    relay = OutboxRelay(session_factory, batch_size=2)
+    assert [relay.relay_once() for _ in range(4)] == [2, 2, 1, 0]
+    assert [message["aggregate_id"] for message in received] == [0, 1, 2, 3, 4]
+
+def test_relays_never_claim_the_same_events(db_session, session_factory, received):
+    """Test that a batch claimed by one relay is skipped by another"""
+    for i in range(3):
+        db_session.add(OutboxEvent(
+            event_type="expense.approved",
+            aggregate_type="expense",
+            aggregate_id=i,
+            payload="{}"
+        ))
+    db_session.commit()
+    
+    first = OutboxRelay(session_factory, batch_size=2)
+    second = OutboxRelay(session_factory, batch_size=2)
+    db = session_factory()
+    try:
+        assert len(first.claim(db)) == 2
+    finally:
+        db.close()
+    
+    assert second.relay_once() == 1
+    assert [message["aggregate_id"] for message in received] == [2]
+
+def test_prune_published_events(db_session, session_factory):
+    """Test that only events published before the retention window are deleted"""
+    now = datetime.utcnow()
+    for published_at in (now - timedelta(days=30), now, None):
+        db_session.add(OutboxEvent(
+            event_type="expense.approved", aggregate_type="expense", aggregate_id=1,
+            payload="{}", published_at=published_at
+        ))
+    db_session.commit()
+    
+    assert prune_published(session_factory, batch_size=1) == 1
+    assert db_session.query(OutboxEvent).count() == 2
+
+class FailingPipeline:
+    def xadd(self, *args, **kwargs):
+        pass
+    
+    def execute(self):
+        raise redis.ConnectionError("connection reset")
+
+class FailingRedis:
+    def pipeline(self, transaction=True):
+        return FailingPipeline()
+
+def test_relay_holds_events_until_streamed(db_session, session_factory, received, monkeypatch):
+    """Test that events are not marked published while the configured stream can't take them"""
+    monkeypatch.setattr(settings, "OUTBOX_STREAM", "expenseflow:events")
+    db_session.add(OutboxEvent(event_type="expense.approved", aggregate_type="expense", aggregate_id=1, payload="{}"))
+    db_session.commit()
+    relay = OutboxRelay(session_factory)
+    
+    # Redis is in its reconnect back-off
+    monkeypatch.setattr(outbox, "get_redis", lambda: None)
+    assert relay.relay_once() == 0
+    
+    # XADD fails: the batch is released for the next attempt, not published
+    monkeypatch.setattr(outbox, "get_redis", lambda: FailingRedis())
+    monkeypatch.setattr(outbox, "mark_redis_failed", lambda: None)
+    with pytest.raises(redis.ConnectionError):
+        relay.relay_once()
+    
+    assert received == []
+    db_session.expire_all()
+    event = db_session.query(OutboxEvent).one()
+    assert event.published_at is None
+    assert event.claimed_by is None
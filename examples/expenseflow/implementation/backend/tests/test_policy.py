@@ -0,0 +1,67 @@
+from datetime import date, datetime
+
+import pytest
+
+from app.models.policy import CategoryPolicy, Holiday, PolicyViolation
+from app.services.policy import sweep
+
+MONDAY = datetime(2024, 3, 11, 9, 0)
+SATURDAY = datetime(2024, 3, 16, 9, 0)
+
+@pytest.fixture
+def travel_policy(test_category, db_session):
+    db_session.add(CategoryPolicy(
+        category_id=test_category.id,
+        max_amount_minor=20000,
+        daily_cap_minor=30000,
+        allow_weekends=False,
+        allow_holidays=False
+    ))
+    db_session.add(Holiday(day=date(2024, 3, 12), name="Founders Day"))
+    db_session.commit()
+
+def violations(db_session):
+    return sorted((v.expense_id, v.rule) for v in db_session.query(PolicyViolation))
+
+def test_submit_reports_violations(authenticated_client, make_expense, travel_policy):
+    """Test that submit checks the category limit, per-diem cap and weekend rule in-line"""
+    make_expense(amount=150.00, expense_date=MONDAY, status="approved")
+    expense_id = make_expense(amount=250.00, expense_date=MONDAY, status="draft").id
+    weekend_id = make_expense(amount=10.00, expense_date=SATURDAY, status="draft").id
+    
+    response = authenticated_client.post(f"/api/v1/expenses/{expense_id}/submit")
+    assert response.status_code == 200
+    assert [v["rule"] for v in response.json()["policy_violations"]] == ["category_limit", "per_diem"]
+    assert "250.00 USD" in response.json()["policy_violations"][0]["message"]
+    
+    response = authenticated_client.post(f"/api/v1/expenses/{weekend_id}/submit")
+    assert [v["rule"] for v in response.json()["policy_violations"]] == ["weekend"]
+    
+    response = authenticated_client.get(f"/api/v1/expenses/{expense_id}/violations")
+    assert [v["rule"] for v in response.json()] == ["category_limit", "per_diem"]
+
+def test_sweep_evaluates_in_chunks(make_expense, test_manager, travel_policy, db_session, session_factory):
+    """Test that the sweep keeps per-diem days whole across chunk boundaries"""
+    ids = [make_expense(amount=100.00, expense_date=MONDAY, status="submitted").id for _ in range(4)]
+    holiday_id = make_expense(amount=50.00, expense_date=datetime(2024, 3, 12, 18, 0), status="submitted").id
+    draft_id = make_expense(amount=500.00, expense_date=MONDAY, status="draft").id
+    manager_id = make_expense(
+        amount=120.00, expense_date=MONDAY, status="submitted", employee_id=test_manager.id
+    ).id
+    # Stale violation from an earlier run is replaced
+    db_session.add(PolicyViolation(expense_id=manager_id, rule="weekend", message="stale"))
+    db_session.commit()
+    
+    assert sweep(session_factory, chunk_size=3) == 5
+    
+    expected = [(expense_id, "per_diem") for expense_id in ids] + [(holiday_id, "holiday")]
+    assert violations(db_session) == sorted(expected)
+    assert draft_id not in {v.expense_id for v in db_session.query(PolicyViolation)}
+
+def test_policy_admin_endpoints(authenticated_client, test_category):
+    """Test that only admins can change policies"""
+    response = authenticated_client.put(
+        f"/api/v1/policies/categories/{test_category.id}",
+        json={"max_amount": 100.0}
+    )
+    assert response.status_code == 403
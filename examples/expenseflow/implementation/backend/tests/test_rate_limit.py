@@ -0,0 +1,104 @@
+import pytest
+
+from app.core.config import settings
+from app.core import rate_limit
+from app.core.rate_limit import RateLimiter, get_route_class, rate_limiter
+
+def test_route_classes():
+    """Test that requests are classified into route classes"""
+    assert get_route_class("POST", "/api/v1/auth/login") == "auth"
+    assert get_route_class("GET", "/api/v1/expenses") == "read"
+    assert get_route_class("POST", "/api/v1/expenses") == "write"
+
+@pytest.mark.asyncio
+async def test_token_bucket_in_memory():
+    """Test that the in-process bucket allows a burst then reports a retry delay"""
+    limiter = RateLimiter()
+    results = [await limiter.hit("ip:1.2.3.4", 3) for _ in range(4)]
+    
+    assert [allowed for allowed, _ in results] == [True, True, True, False]
+    assert results[-1][1] > 0
+    assert (await limiter.hit("ip:5.6.7.8", 3))[0]
+
+def test_login_rate_limited(client, monkeypatch):
+    """Test that repeated logins from one IP get 429 with Retry-After"""
+    monkeypatch.setattr(settings, "RATE_LIMIT_AUTH_PER_MINUTE", 2)
+    form_data = {"username": "nobody@example.com", "password": "wrong"}
+    
+    assert client.post("/api/v1/auth/login", data=form_data).status_code == 401
+    assert client.post("/api/v1/auth/login", data=form_data).status_code == 401
+    
+    response = client.post("/api/v1/auth/login", data=form_data)
+    assert response.status_code == 429
+    assert int(response.headers["Retry-After"]) >= 1
+    assert rate_limiter.stats["limited_auth"] == 1
+
+def test_per_user_limit(authenticated_client, monkeypatch):
+    """Test that authenticated reads are limited per user"""
+    monkeypatch.setattr(settings, "RATE_LIMIT_READ_PER_MINUTE", 2)
+    
+    assert authenticated_client.get("/api/v1/expenses").status_code == 200
+    assert authenticated_client.get("/api/v1/expenses").status_code == 200
+    assert authenticated_client.get("/api/v1/expenses").status_code == 429
+
+def test_load_shedding(client, monkeypatch):
+    """Test that requests over the concurrency limit get 503"""
+    monkeypatch.setattr(settings, "MAX_CONCURRENT_REQUESTS", 0)
+    
+    response = client.get("/api/v1/categories")
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == str(settings.LOAD_SHED_RETRY_AFTER)
+    
+    # Health checks are never shed
+    assert client.get("/health").status_code == 200
+
+def test_metrics(client, test_manager, test_user):
+    """Test that limiter counters are exposed to admins only"""
+    assert client.get("/metrics").status_code == 403
+    
+    token = client.post(
+        "/api/v1/auth/login",
+        data={"username": test_user.email, "password": "testpassword"}
+    ).json()["access_token"]
+    assert client.get("/metrics", headers={"Authorization": f"Bearer {token}"}).status_code == 403
+    
+    token = client.post(
+        "/api/v1/auth/login",
+        data={"username": test_manager.email, "password": "managerpassword"}
+    ).json()["access_token"]
+    response = client.get("/metrics", headers={"Authorization": f"Bearer {token}"})
+    assert response.status_code == 200
+    assert response.json()["rate_limit"]["allowed"] == 2
+
+class FakeAsyncRedis:
+    """Stands in for a redis.asyncio client; the script reply is awaited"""
+    
+    def __init__(self):
+        self.calls = []
+    
+    def register_script(self, script):
+        client = self
+        
+        class Script:
+            registered_client = client
+            
+            async def __call__(self, keys, args):
+                client.calls.append(keys[0])
+                return [1, "0"]
+        
+        return Script()
+
+@pytest.mark.asyncio
+async def test_token_bucket_uses_async_redis(monkeypatch):
+    """Test that the limiter awaits Redis instead of blocking the event loop"""
+    fake = FakeAsyncRedis()
+    
+    async def get_async_redis():
+        return fake
+    
+    monkeypatch.setattr(rate_limit, "get_async_redis", get_async_redis)
+    limiter = RateLimiter()
+    
+    assert await limiter.hit("ip:1.2.3.4", 3) == (True, 0.0)
+    assert fake.calls == ["ratelimit:ip:1.2.3.4"]
+    assert limiter.stats["backend_redis"] == 1
@@ -0,0 +1,125 @@
+import pytest
+from sqlalchemy import create_engine, update
+from sqlalchemy.orm import sessionmaker
+
+from app.main import app
+from app.core import database
+from app.core.config import settings
+from app.core.database import Base, DatabaseRouter, get_db
+from app.core.security import get_password_hash
+from app.models.user import User
+from app.models.expense import Category
+
+@pytest.fixture
+def router(tmp_path):
+    """Primary and replica stand-ins backed by two SQLite files"""
+    factories = []
+    for name in ("primary", "replica"):
+        engine = create_engine(
+            f"sqlite:///{tmp_path / name}.db", connect_args={"check_same_thread": False}
+        )
+        Base.metadata.create_all(bind=engine)
+        factories.append(sessionmaker(autocommit=False, autoflush=False, bind=engine))
+    primary, replica = factories
+    
+    # Same admin user on both, but only the replica knows this category
+    for factory in factories:
+        db = factory()
+        db.add(User(
+            email="admin@example.com",
+            username="admin",
+            full_name="Admin",
+            hashed_password=get_password_hash("adminpassword"),
+            is_admin=True
+        ))
+        db.commit()
+        db.close()
+    db = replica()
+    db.add(Category(name="Replica Only"))
+    db.commit()
+    db.close()
+    
+    return DatabaseRouter(primary, [replica], sticky_seconds=60)
+
+def test_reads_go_to_replica(router):
+    """Test that read-only sessions are bound to the replica"""
+    db = router.session(read_only=True, subject="someone@example.com")
+    assert db.query(Category).filter(Category.name == "Replica Only").count() == 1
+    db.close()
+    
+    db = router.session(read_only=False, subject="someone@example.com")
+    assert db.query(Category).filter(Category.name == "Replica Only").count() == 0
+    db.close()
+
+def test_writer_sticks_to_primary(router):
+    """Test read-your-writes stickiness after a write"""
+    db = router.session(read_only=False, subject="writer@example.com")
+    db.add(Category(name="Primary Only"))
+    db.commit()
+    db.close()
+    
+    assert router.is_sticky("writer@example.com")
+    assert not router.is_sticky("other@example.com")
+    
+    db = router.session(read_only=True, subject="writer@example.com")
+    assert db.query(Category).filter(Category.name == "Primary Only").count() == 1
+    db.close()
+    
+    db = router.session(read_only=True, subject="other@example.com")
+    assert db.query(Category).filter(Category.name == "Primary Only").count() == 0
+    db.close()
+
+def test_no_replicas_uses_primary(router):
+    """Test that without replicas every session goes to the primary"""
+    primary_only = DatabaseRouter(router.primary, [])
+    db = primary_only.session(read_only=True)
+    assert db.query(Category).filter(Category.name == "Replica Only").count() == 0
+    db.close()
+
+def test_request_routing(client, router, monkeypatch):
+    """Test that GET requests hit the replica until the user writes"""
+    monkeypatch.setattr(database, "db_router", router)
+    monkeypatch.delitem(app.dependency_overrides, get_db)
+    
+    login = client.post(
+        "/api/v1/auth/login",
+        data={"username": "admin@example.com", "password": "adminpassword"}
+    )
+    client.headers.update({"Authorization": f"Bearer {login.json()['access_token']}"})
+    
+    names = [c["name"] for c in client.get("/api/v1/categories").json()]
+    assert names == ["Replica Only"]
+    
+    response = client.post("/api/v1/categories", json={"name": "Written"})
+    assert response.status_code == 200
+    
+    names = [c["name"] for c in client.get("/api/v1/categories").json()]
+    assert names == ["Written"]
+
+def test_rolled_back_write_does_not_pin(router):
+    """Test that only committed writes pin a user to the primary"""
+    db = router.session(read_only=False, subject="writer@example.com")
+    db.add(Category(name="Never Committed"))
+    db.flush()
+    db.rollback()
+    db.close()
+    
+    assert not router.is_sticky("writer@example.com")
+
+def test_bulk_update_pins_writer(router):
+    """Test that UPDATE statements pin the writer like flushed changes do"""
+    db = router.session(read_only=False, subject="writer@example.com")
+    db.execute(update(User).where(User.email == "admin@example.com").values(full_name="Boss"))
+    db.commit()
+    db.close()
+    
+    assert router.is_sticky("writer@example.com")
+
+def test_sticky_subjects_are_bounded(router, monkeypatch):
+    """Test that the in-process pins forget the least recently written users"""
+    monkeypatch.setattr(settings, "READ_YOUR_WRITES_MAX_SUBJECTS", 2)
+    for subject in ("a", "b", "c"):
+        router.mark_write(subject)
+    
+    assert not router.is_sticky("a")
+    assert router.is_sticky("b") and router.is_sticky("c")
@@ -0,0 +1,184 @@
+import io
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+from fastapi import HTTPException
+from PIL import Image, ImageDraw
+
+from app.api.v1 import expenses
+from app.core.config import settings
+from app.models.archive import ArchivedReceiptDuplicate
+from app.models.duplicate import ExpenseDuplicate
+from app.models.expense import Expense
+from app.services.archive import archive_expenses
+from app.services.receipt_index import MultiIndexHashIndex
+from app.services.receipts import ReceiptHasher, perceptual_hash, rebuild_index, store_receipt
+
+def receipt_image(seed: int, size=(400, 600)) -> Image.Image:
+    rng = np.random.default_rng(seed)
+    image = Image.new("RGB", size, "white")
+    draw = ImageDraw.Draw(image)
+    for _ in range(12):
+        x, y = rng.integers(0, size[0] - 60), rng.integers(0, size[1] - 40)
+        draw.rectangle([x, y, x + 60, y + 40], fill=tuple(int(v) for v in rng.integers(0, 255, 3)))
+    return image
+
+def to_jpeg(image: Image.Image, quality=90) -> bytes:
+    buffer = io.BytesIO()
+    image.save(buffer, format="JPEG", quality=quality)
+    return buffer.getvalue()
+
+@pytest.fixture
+def receipt_storage(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "RECEIPT_STORAGE_DIR", str(tmp_path / "receipts"))
+    return tmp_path
+
+def test_perceptual_hash_survives_reencoding():
+    """Test that a resized, recompressed copy hashes close to the original"""
+    original = receipt_image(1)
+    copy = Image.open(io.BytesIO(to_jpeg(original.resize((300, 450)), quality=40)))
+    other = receipt_image(2)
+    
+    assert bin(perceptual_hash(original) ^ perceptual_hash(copy)).count("1") <= 4
+    assert bin(perceptual_hash(original) ^ perceptual_hash(other)).count("1") > 10
+
+def test_index_matches_brute_force(tmp_path):
+    """Test that multi-index lookups find exactly the hashes a linear scan would"""
+    rng = np.random.default_rng(0)
+    hashes = [int(h) for h in rng.integers(0, 2 ** 63, 2000, dtype=np.int64)]
+    # Plant near neighbours of the first hash
+    for bits in ([0], [5, 17], [1, 20, 40], [2, 3, 33, 50, 63]):
+        hashes.append(hashes[0] ^ sum(1 << bit for bit in bits))
+    index = MultiIndexHashIndex(str(tmp_path / "index.bin"), resort_threshold=100)
+    index.add_many((h, i) for i, h in enumerate(hashes))
+    
+    for query in (hashes[0], hashes[7]):
+        expected = sorted(
+            (bin(query ^ h).count("1"), i) for i, h in enumerate(hashes)
+            if bin(query ^ h).count("1") <= 6
+        )
+        assert [(d, i) for i, d in index.search(query, 6)] == expected
+    
+    # A fresh instance (another worker) loads the same index from disk
+    assert len(MultiIndexHashIndex(str(tmp_path / "index.bin"))) == len(hashes)
+
+def test_uploaded_receipt_reuse_is_flagged(authenticated_client, make_expense, db_session, session_factory, receipt_storage):
+    """Test that the hasher flags the same photo attached to two expenses"""
+    ids = [make_expense(description=description).id for description in ("Dinner", "Taxi", "Hotel")]
+    
+    photo = receipt_image(3)
+    uploads = [to_jpeg(photo), to_jpeg(photo.resize((350, 525)), quality=50), to_jpeg(receipt_image(4))]
+    for expense_id, content in zip(ids, uploads):
+        response = authenticated_client.post(
+            f"/api/v1/expenses/{expense_id}/receipt",
+            files={"file": ("receipt.jpg", content, "image/jpeg")}
+        )
+        assert response.status_code == 200
+        assert response.json()["receipt_filename"] == "receipt.jpg"
+    
+    hasher = ReceiptHasher(session_factory, MultiIndexHashIndex(str(receipt_storage / "index.bin")), batch_size=1)
+    assert hasher.hash_once() == 1
+    assert hasher.hash_once() == 1
+    assert hasher.hash_once() == 1
+    assert hasher.hash_once() == 0
+    
+    pair = db_session.query(ExpenseDuplicate).filter(ExpenseDuplicate.reason == "receipt").one()
+    assert (pair.expense_id, pair.duplicate_of_id) == (ids[1], ids[0])
+
+def test_upload_rejects_non_images(authenticated_client, make_expense, receipt_storage):
+    """Test that only images can be attached as receipts"""
+    expense = make_expense()
+    
+    response = authenticated_client.post(
+        f"/api/v1/expenses/{expense.id}/receipt",
+        files={"file": ("receipt.txt", b"hello", "text/plain")}
+    )
+    assert response.status_code == 400
+
+def test_upload_leaves_no_orphaned_files(authenticated_client, make_expense, db_session, receipt_storage, monkeypatch):
+    """Test that a replaced receipt is deleted and a conflicting upload leaves no file"""
+    expense = make_expense()
+    url = f"/api/v1/expenses/{expense.id}/receipt"
+    stored = lambda: sorted(path.name for path in (receipt_storage / "receipts").iterdir())
+    
+    def upload(seed):
+        return authenticated_client.post(
+            url, files={"file": ("receipt.jpg", to_jpeg(receipt_image(seed)), "image/jpeg")}
+        )
+    
+    assert upload(1).status_code == 200
+    assert upload(2).status_code == 200
+    db_session.refresh(expense)
+    assert stored() == [expense.receipt_url]
+    
+    def conflict(*args, **kwargs):
+        raise HTTPException(status_code=409, detail="Expense was modified concurrently")
+    
+    monkeypatch.setattr(expenses, "conditional_update", conflict)
+    assert upload(3).status_code == 409
+    assert stored() == [expense.receipt_url]
+
+def test_reuse_of_archived_receipt_is_flagged(make_expense, test_manager, db_session, session_factory, receipt_storage):
+    """Test that a photo from an archived expense is matched and kept in a rebuilt index"""
+    photo = receipt_image(5)
+    old = make_expense(
+        expense_date=datetime.utcnow() - timedelta(days=800),
+        status="approved",
+        approvals=[{"approver_id": test_manager.id, "status": "approved"}]
+    )
+    old.receipt_url = store_receipt(old.id, "receipt.jpg", to_jpeg(photo))
+    db_session.commit()
+    old_id = old.id
+    index_path = str(receipt_storage / "index.bin")
+    hasher = ReceiptHasher(session_factory, MultiIndexHashIndex(index_path))
+    assert hasher.hash_once() == 1
+    assert archive_expenses(session_factory, older_than_days=365) == 1
+    
+    new = make_expense()
+    new.receipt_url = store_receipt(new.id, "receipt.jpg", to_jpeg(photo, quality=50))
+    db_session.commit()
+    assert hasher.hash_once() == 1
+    
+    pair = db_session.query(ArchivedReceiptDuplicate).one()
+    assert (pair.expense_id, pair.duplicate_of_id, pair.reason) == (new.id, old_id, "receipt")
+    assert db_session.query(ExpenseDuplicate).count() == 0
+    
+    assert rebuild_index(session_factory, index_path) == 2
+    assert sorted(expense_id for expense_id, _ in hasher.find_similar(perceptual_hash(photo))) == [old_id, new.id]
+
+def test_index_reloads_a_rebuilt_file(tmp_path):
+    """Test that a worker's index notices the file was replaced rather than appended to"""
+    path = tmp_path / "index.bin"
+    worker = MultiIndexHashIndex(str(path))
+    worker.add_many([(1, 1), (2, 2), (3, 3)])
+    assert len(worker) == 3
+    
+    rebuilt = MultiIndexHashIndex(str(tmp_path / "index.tmp"))
+    rebuilt.add_many([(10, 10), (40, 40)])
+    (tmp_path / "index.tmp").replace(path)
+    
+    assert len(worker) == 2
+    assert worker.search(40, 0) == [(40, 0)]
+    assert worker.search(1, 0) == []
+
+def test_hasher_skips_receipts_claimed_by_another(make_expense, db_session, session_factory, receipt_storage):
+    """Test that claimed receipts are left alone until the claim expires"""
+    expense = make_expense()
+    expense.receipt_url = store_receipt(expense.id, "receipt.jpg", to_jpeg(receipt_image(6)))
+    expense.receipt_claimed_until = datetime.utcnow() + timedelta(minutes=5)
+    db_session.commit()
+    hasher = ReceiptHasher(session_factory, MultiIndexHashIndex(str(receipt_storage / "index.bin")))
+    assert hasher.hash_once() == 0
+    
+    # A hasher that died holding the claim doesn't keep the receipt from being hashed
+    expense.receipt_claimed_until = datetime.utcnow() - timedelta(seconds=1)
+    db_session.commit()
+    updated_at = expense.updated_at
+    assert hasher.hash_once() == 1
+    
+    db_session.expire_all()
+    expense = db_session.get(Expense, expense.id)
+    assert expense.receipt_hash is not None
+    assert expense.receipt_claimed_until is None
+    assert expense.updated_at == updated_at
@@ -0,0 +1,86 @@
+from datetime import datetime, timedelta
+
+from app.core.idempotency import idempotency_store
+from app.models.token import RefreshToken
+
+def login(client, user):
+    response = client.post(
+        "/api/v1/auth/login",
+        data={"username": user.email, "password": "testpassword"}
+    )
+    assert response.status_code == 200
+    return response.json()
+
+def test_login_returns_refresh_token(client, test_user, db_session):
+    """Test that login issues a refresh token stored only as a hash"""
+    tokens = login(client, test_user)
+    
+    assert tokens["refresh_token"]
+    row = db_session.query(RefreshToken).one()
+    assert row.user_id == test_user.id
+    assert row.token_hash != tokens["refresh_token"]
+
+def test_refresh_rotates_token(client, test_user):
+    """Test that a refresh token is exchanged for a new pair"""
+    tokens = login(client, test_user)
+    
+    response = client.post("/api/v1/auth/refresh", json={"refresh_token": tokens["refresh_token"]})
+    assert response.status_code == 200
+    rotated = response.json()
+    assert rotated["refresh_token"] != tokens["refresh_token"]
+    
+    response = client.get(
+        "/api/v1/expenses/",
+        headers={"Authorization": f"Bearer {rotated['access_token']}"}
+    )
+    assert response.status_code == 200
+
+def test_refresh_token_reuse_revokes_family(client, test_user):
+    """Test that replaying a rotated token revokes every token from that login"""
+    tokens = login(client, test_user)
+    rotated = client.post("/api/v1/auth/refresh", json={"refresh_token": tokens["refresh_token"]}).json()
+    
+    response = client.post("/api/v1/auth/refresh", json={"refresh_token": tokens["refresh_token"]})
+    assert response.status_code == 401
+    
+    response = client.post("/api/v1/auth/refresh", json={"refresh_token": rotated["refresh_token"]})
+    assert response.status_code == 401
+
+def test_expired_refresh_token_rejected(client, test_user, db_session):
+    """Test that an expired refresh token can't be used"""
+    tokens = login(client, test_user)
+    db_session.query(RefreshToken).update({"expires_at": datetime.utcnow() - timedelta(seconds=1)})
+    db_session.commit()
+    
+    response = client.post("/api/v1/auth/refresh", json={"refresh_token": tokens["refresh_token"]})
+    assert response.status_code == 401
+
+def test_logout_all_revokes_every_token(client, test_user, db_session):
+    """Test that logout-all revokes refresh tokens from every login"""
+    first = login(client, test_user)
+    second = login(client, test_user)
+    
+    response = client.post(
+        "/api/v1/auth/logout-all",
+        headers={"Authorization": f"Bearer {second['access_token']}"}
+    )
+    assert response.status_code == 204
+    
+    for tokens in (first, second):
+        response = client.post("/api/v1/auth/refresh", json={"refresh_token": tokens["refresh_token"]})
+        assert response.status_code == 401
+    assert db_session.query(RefreshToken).filter(RefreshToken.revoked_at.is_(None)).count() == 0
+
+def test_refresh_is_not_replayed_for_idempotency_keys(client, test_user):
+    """Test that a retried refresh never gets a cached copy of an already rotated token"""
+    tokens = login(client, test_user)
+    headers = {"Idempotency-Key": "refresh-1"}
+    
+    first = client.post("/api/v1/auth/refresh", json={"refresh_token": tokens["refresh_token"]}, headers=headers)
+    assert first.status_code == 200
+    
+    # The retry runs the handler again and is treated as reuse of the old token
+    retry = client.post("/api/v1/auth/refresh", json={"refresh_token": tokens["refresh_token"]}, headers=headers)
+    assert retry.status_code == 401
+    assert "Idempotent-Replayed" not in retry.headers
+    assert idempotency_store.memory.get("ip:testclient:refresh-1") is None
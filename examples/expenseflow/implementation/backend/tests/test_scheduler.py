@@ -0,0 +1,150 @@
+import json
+from datetime import datetime, timedelta
+
+from sqlalchemy import event
+
+from app.core.security import get_password_hash
+from app.models.audit import AuditEntry
+from app.models.expense import Approval
+from app.models.outbox import OutboxEvent
+from app.models.user import User
+from app.services.audit import audit_log
+from app.services.escalation import escalate_stale_approvals
+from app.services.scheduler import Scheduler
+
+NOW = datetime(2024, 3, 20, 9, 0)
+
+def add_user(db_session, name, manager_id=None, is_active=True):
+    user = User(
+        email=f"{name}@example.com",
+        username=name,
+        full_name=name.title(),
+        hashed_password=get_password_hash("password"),
+        manager_id=manager_id,
+        is_active=is_active
+    )
+    db_session.add(user)
+    db_session.commit()
+    return user.id
+
+def add_pending(make_expense, approver_id, created_at):
+    expense = make_expense(
+        expense_date=created_at,
+        status="submitted",
+        approvals=[{"approver_id": approver_id, "created_at": created_at}]
+    )
+    return expense.approvals[0].id
+
+def events(db_session, event_type):
+    return [
+        json.loads(event.payload)
+        for event in db_session.query(OutboxEvent).filter(OutboxEvent.event_type == event_type).order_by(OutboxEvent.id)
+    ]
+
+def test_escalates_stale_approvals_up_the_chain(make_expense, db_session, session_factory):
+    """Test that stale approvals move to the next active manager and top approvers get reminders"""
+    director = add_user(db_session, "director")
+    departed = add_user(db_session, "departed", manager_id=director, is_active=False)
+    lead = add_user(db_session, "lead", manager_id=departed)
+    stale = add_pending(make_expense, lead, NOW - timedelta(hours=72))
+    fresh = add_pending(make_expense, lead, NOW - timedelta(hours=2))
+    top = add_pending(make_expense, director, NOW - timedelta(hours=72))
+
+    result = escalate_stale_approvals(session_factory, now=NOW, chunk_size=1, pause=0)
+    assert result == {"escalated": 1, "reminded": 1}
+
+    db_session.expire_all()
+    assert db_session.get(Approval, stale).status == "escalated"
+    assert db_session.get(Approval, fresh).status == "pending"
+    assert db_session.get(Approval, top).reminded_at == NOW
+    # The inactive manager is skipped
+    new = db_session.query(Approval).filter(Approval.approver_id == director, Approval.id != top).one()
+    assert new.status == "pending"
+    assert new.expense_id == db_session.get(Approval, stale).expense_id
+
+    escalated = events(db_session, "approval.escalated")
+    assert [(e["approval_id"], e["approver_id"], e["previous_approval_id"]) for e in escalated] == [(new.id, director, stale)]
+    reminders = events(db_session, "approval.reminder")
+    assert [(e["approval_id"], e["approver_id"]) for e in reminders] == [(top, director)]
+
+    # Nothing more to do until the reminder interval has passed
+    assert escalate_stale_approvals(session_factory, now=NOW + timedelta(hours=1), pause=0) == {"escalated": 0, "reminded": 0}
+    result = escalate_stale_approvals(session_factory, now=NOW + timedelta(hours=25), pause=0)
+    assert result == {"escalated": 0, "reminded": 1}
+
+def test_escalation_changes_the_expense_etag(authenticated_client, make_expense, db_session, session_factory):
+    """Test that a cached expense is not revalidated after its approvals were escalated"""
+    director = add_user(db_session, "director")
+    lead = add_user(db_session, "lead", manager_id=director)
+    stale = add_pending(make_expense, lead, NOW - timedelta(hours=72))
+    expense_id = db_session.get(Approval, stale).expense_id
+
+    response = authenticated_client.get(f"/api/v1/expenses/{expense_id}")
+    etag = response.headers["ETag"]
+    assert authenticated_client.get(
+        f"/api/v1/expenses/{expense_id}", headers={"If-None-Match": etag}
+    ).status_code == 304
+
+    assert escalate_stale_approvals(session_factory, pause=0) == {"escalated": 1, "reminded": 0}
+
+    response = authenticated_client.get(f"/api/v1/expenses/{expense_id}", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert sorted(a["status"] for a in response.json()["approvals"]) == ["escalated", "pending"]
+
+def test_escalation_stops_when_leadership_is_lost(make_expense, db_session, session_factory):
+    """Test that the job checks should_continue between chunks"""
+    manager = add_user(db_session, "boss")
+    lead = add_user(db_session, "lead", manager_id=manager)
+    for hours in (50, 60, 70):
+        add_pending(make_expense, lead, NOW - timedelta(hours=hours))
+
+    checks = iter([True, False])
+    result = escalate_stale_approvals(session_factory, lambda: next(checks), now=NOW, chunk_size=1, pause=0)
+    assert result == {"escalated": 1, "reminded": 0}
+
+def test_escalation_audit_does_not_reload_approvals(make_expense, db_session, session_factory, monkeypatch):
+    """Test that audit entries are built from the flushed approvals, not reloaded after commit"""
+    manager = add_user(db_session, "boss")
+    lead = add_user(db_session, "lead", manager_id=manager)
+    stale = [
+        add_pending(make_expense, lead, NOW - timedelta(hours=hours))
+        for hours in (50, 60, 70)
+    ]
+    refreshed = []
+
+    def on_refresh(target, context, attrs):
+        refreshed.append(target)
+
+    event.listen(Approval, "refresh", on_refresh)
+    try:
+        assert escalate_stale_approvals(session_factory, now=NOW, pause=0) == {"escalated": 3, "reminded": 0}
+    finally:
+        event.remove(Approval, "refresh", on_refresh)
+    assert refreshed == []
+
+    monkeypatch.setattr(audit_log, "session_factory", session_factory)
+    assert audit_log.flush() == 3
+    entries = db_session.query(AuditEntry).filter(AuditEntry.action == "approval.escalated").all()
+    assert sorted(json.loads(entry.details)["escalated_from"] for entry in entries) == sorted(stale)
+
+def test_only_one_scheduler_runs_jobs(session_factory):
+    """Test that the lease elects one leader and jobs don't rerun within their interval"""
+    runs = []
+    first = Scheduler(session_factory, lease_seconds=60)
+    second = Scheduler(session_factory, lease_seconds=60)
+    for scheduler in (first, second):
+        scheduler.register("job", 3600, lambda factory, should_continue: runs.append(should_continue()))
+
+    assert first.run_pending() == ["job"]
+    assert second.run_pending() == []
+    assert first.is_leader() and not second.is_leader()
+    assert runs == [True]
+
+    # Still leader, but the job isn't due again yet
+    assert first.run_pending() == []
+
+    # A released lease is picked up by the other worker; the job history is shared
+    first.stop()
+    assert second.acquire_lease()
+    assert second.run_pending() == []
+    assert runs == [True]
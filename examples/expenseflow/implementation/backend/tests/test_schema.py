@@ -0,0 +1,39 @@
+from sqlalchemy import create_engine, inspect, text
+
+from app.services.schema import add_missing_columns
+
+DROPPED = [
+    ("expenses", "version"),
+    ("expenses", "receipt_hash"),
+    ("expenses", "receipt_hashed_at"),
+    ("expenses", "receipt_claimed_until"),
+    ("approvals", "version"),
+    ("approvals", "reminded_at"),
+]
+
+def test_add_missing_columns(tmp_path):
+    """Test that columns added to the models are added to existing tables, keeping the rows"""
+    engine = create_engine(f"sqlite:///{tmp_path / 'old.db'}")
+    add_missing_columns(engine)
+    with engine.begin() as connection:
+        connection.execute(text(
+            "INSERT INTO users (email, username, full_name, hashed_password, is_active, is_admin, "
+            "created_at, updated_at) VALUES ('a@example.com', 'a', 'A', 'x', 1, 0, '2024-01-01', '2024-01-01')"
+        ))
+        connection.execute(text(
+            "INSERT INTO categories (name, is_active, created_at) VALUES ('Travel', 1, '2024-01-01')"
+        ))
+        connection.execute(text(
+            "INSERT INTO expenses (amount_minor, currency, description, expense_date, status, version, "
+            "created_at, updated_at, employee_id, category_id) "
+            "VALUES (100, 'USD', 'Taxi', '2024-01-01', 'draft', 1, '2024-01-01', '2024-01-01', 1, 1)"
+        ))
+        for table, column in DROPPED:
+            connection.execute(text(f"ALTER TABLE {table} DROP COLUMN {column}"))
+    
+    assert sorted(add_missing_columns(engine)) == sorted(f"{table}.{column}" for table, column in DROPPED)
+    assert add_missing_columns(engine) == []
+    columns = {column["name"] for column in inspect(engine).get_columns("approvals")}
+    assert {"version", "reminded_at"} <= columns
+    with engine.connect() as connection:
+        assert connection.execute(text("SELECT version, receipt_hash FROM expenses")).one() == (1, None)
@@ -0,0 +1,72 @@
+from contextlib import contextmanager
+from datetime import datetime
+
+import pytest
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+@contextmanager
+def captured_sql():
+    statements = []
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+    event.listen(Engine, "before_cursor_execute", capture)
+    try:
+        yield statements
+    finally:
+        event.remove(Engine, "before_cursor_execute", capture)
+
+@pytest.fixture
+def expense(make_expense, test_manager):
+    return make_expense(
+        amount=80.25,
+        description="Client lunch",
+        expense_date=datetime(2024, 3, 11),
+        status="submitted",
+        approvals=[{"approver_id": test_manager.id}]
+    )
+
+def test_list_returns_only_requested_fields(authenticated_client, expense):
+    """Test that fields= trims both the SELECT and the payload"""
+    full = authenticated_client.get("/api/v1/expenses")
+    
+    with captured_sql() as statements:
+        response = authenticated_client.get("/api/v1/expenses", params={"fields": "amount,status,description"})
+    
+    assert response.status_code == 200
+    assert response.json() == [{"id": expense.id, "amount": 80.25, "status": "submitted", "description": "Client lunch"}]
+    row_query = [s for s in statements if "expenses.description" in s][0]
+    assert "rejection_reason" not in row_query and "receipt_url" not in row_query
+    assert not any("FROM categories" in s for s in statements)
+    # Each field set is its own representation
+    assert response.headers["etag"] != full.headers["etag"]
+
+def test_unknown_field_is_rejected(authenticated_client, expense):
+    """Test that a typo in fields= is an error rather than silently ignored"""
+    response = authenticated_client.get("/api/v1/expenses", params={"fields": "amount,colour"})
+    assert response.status_code == 400
+    assert "colour" in response.json()["detail"]
+
+def test_single_expense_with_relationships(authenticated_client, expense):
+    """Test that relationships can be requested by name"""
+    response = authenticated_client.get(f"/api/v1/expenses/{expense.id}", params={"fields": "status,category,approvals"})
+    
+    body = response.json()
+    assert set(body) == {"id", "status", "category", "approvals"}
+    assert body["category"]["name"] == "Travel"
+    assert [a["status"] for a in body["approvals"]] == ["pending"]
+
+def test_pending_approvals_fields(client, test_manager, expense):
+    """Test that approvers can fetch a reduced pending list"""
+    token = client.post(
+        "/api/v1/auth/login",
+        data={"username": test_manager.email, "password": "managerpassword"}
+    ).json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+    
+    response = client.get("/api/v1/approvals/pending", params={"fields": "amount,employee_id"}, headers=headers)
+    assert response.json() == [{"id": expense.id, "amount": 80.25, "employee_id": expense.employee_id}]
+    
+    response = client.get("/api/v1/approvals/pending", headers=headers)
+    assert response.json()[0]["category"]["name"] == "Travel"
+    assert len(response.json()[0]["approvals"]) == 1